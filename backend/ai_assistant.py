@@ -3,113 +3,420 @@ AI Assistant for Notepad (Professional implementation)
 Supports OpenAI, Groq, OpenRouter, and Free fallbacks.
 """
 
-import requests
+import asyncio
+import httpx
 import json
 import re
-import traceback
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, AsyncIterator
 from datetime import datetime
-from config import AI_API_KEY, AI_BASE_URL, AI_MODEL
+from config import (
+    AI_API_KEY,
+    AI_BASE_URL,
+    AI_MODEL,
+    AI_HTTP2,
+    AI_MAX_CONNECTIONS,
+    AI_MAX_CONCURRENCY,
+    AI_FREE_MAX_CONCURRENCY,
+    AI_DRAFT_LOCAL_MIN_CONFIDENCE,
+    AI_DEADLINE_SECONDS,
+    AI_API_TIMEOUT_SECONDS,
+    AI_FREE_TIMEOUT_SECONDS,
+    AI_HEDGE_AFTER_SECONDS,
+    AI_RETRIES,
+    AI_RETRY_BACKOFF_SECONDS,
+    AI_BREAKER_FAILURES,
+    AI_BREAKER_RESET_SECONDS
+)
+from ai_cache import response_key, get_response, store_response
+from task_context import TaskContext
+from prompt_context import build_task_context, estimate_tokens
+from metrics import LLM_TOKENS, LLM_CALLS, callback
+from llm_router import ProviderRouter, ProviderError
+from single_flight import SingleFlight
+from task_draft_parser import parse_draft_locally
 
 # Fallback free endpoint
 FREE_AI_URL = "https://text.pollinations.ai/"
 
-def _call_llm(prompt: str, system_message: str = "You are a helpful assistant for a Notepad app.") -> str:
+# Replies returned when no provider answered (never cached)
+BASIC_MODE_REPLY = "I'm in basic mode. I can see your notes but my AI connection is quiet. Add an API key in the backend for full chat!"
+PROVIDER_ERROR_REPLY = "I'm having trouble connecting to your AI provider. Check your API key or internet!"
+
+# HTTP/2 needs the optional `h2` package (installed via httpx[http2])
+try:
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+# Shared keep-alive client and per-provider concurrency limits.
+# Both are bound to the event loop they were created on, so they are
+# rebuilt if the running loop changes (e.g. between test runs).
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_provider_limits: Dict[str, asyncio.Semaphore] = {}
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Return the pooled HTTP client for the running event loop."""
+    global _client, _client_loop
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            http2=AI_HTTP2 and _HTTP2_AVAILABLE,
+            verify=False,
+            limits=httpx.Limits(
+                max_connections=AI_MAX_CONNECTIONS,
+                max_keepalive_connections=AI_MAX_CONNECTIONS,
+                keepalive_expiry=30
+            )
+        )
+        _client_loop = loop
+        _provider_limits.clear()
+    return _client
+
+
+def _provider_limit(provider: str) -> asyncio.Semaphore:
+    """Semaphore capping in-flight requests to a single provider."""
+    if provider not in _provider_limits:
+        limit = AI_MAX_CONCURRENCY if provider == "api" else AI_FREE_MAX_CONCURRENCY
+        _provider_limits[provider] = asyncio.Semaphore(limit)
+    return _provider_limits[provider]
+
+
+async def close_llm_client():
+    """Close the pooled HTTP client (called on application shutdown)."""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+    _provider_limits.clear()
+
+
+def _api_request(prompt: str, system_message: str, stream: bool = False):
+    """Build the OpenAI-compatible chat/completions request."""
+    url = f"{AI_BASE_URL.rstrip('/')}/chat/completions"
+    headers = {
+        "Authorization": f"Bearer {AI_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": AI_MODEL,
+        "messages": [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7
+    }
+    if stream:
+        payload["stream"] = True
+    return url, headers, payload
+
+
+def _free_prompt(prompt: str, system_message: str) -> bytes:
+    # Prompt engineering for free API: Combine system and user more naturally
+    return f"### System: {system_message}\n\n### User: {prompt}".encode("utf-8")
+
+
+def _count_tokens(provider: str, prompt: str, system_message: str, reply: str, usage: Optional[dict] = None):
+    """Token counters for /metrics: the provider's usage report, else a local estimate."""
+    usage = usage or {}
+    prompt_tokens = usage.get("prompt_tokens") or estimate_tokens(system_message) + estimate_tokens(prompt)
+    completion_tokens = usage.get("completion_tokens") or estimate_tokens(reply)
+    LLM_TOKENS.inc(provider, "prompt", amount=prompt_tokens)
+    LLM_TOKENS.inc(provider, "completion", amount=completion_tokens)
+
+
+def _fallback_reply() -> str:
+    if not AI_API_KEY:
+        return BASIC_MODE_REPLY
+    return PROVIDER_ERROR_REPLY
+
+
+async def _send_api(request, timeout: float) -> str:
+    """Keyed API (OpenAI/Groq/etc) provider for the router."""
+    prompt, system_message = request
+    url, headers, payload = _api_request(prompt, system_message)
+    try:
+        async with _provider_limit("api"):
+            response = await _get_client().post(url, headers=headers, json=payload, timeout=timeout)
+    except httpx.TimeoutException as e:
+        raise asyncio.TimeoutError() from e
+    if response.status_code != 200:
+        raise ProviderError.from_status(response.status_code, response.text)
+    body = response.json()
+    reply = body['choices'][0]['message']['content'].strip()
+    _count_tokens("api", prompt, system_message, reply, body.get("usage"))
+    return reply
+
+
+async def _send_free(request, timeout: float) -> str:
+    """Free Pollinations provider for the router."""
+    prompt, system_message = request
+    try:
+        async with _provider_limit("free"):
+            response = await _get_client().post(
+                FREE_AI_URL,
+                content=_free_prompt(prompt, system_message),
+                headers={"Content-Type": "text/plain"},
+                timeout=timeout
+            )
+    except httpx.TimeoutException as e:
+        raise asyncio.TimeoutError() from e
+    if response.status_code != 200:
+        raise ProviderError.from_status(response.status_code, response.text)
+    reply = response.text.strip()
+    if not reply:
+        raise ProviderError("empty reply")
+    _count_tokens("free", prompt, system_message, reply)
+    return reply
+
+
+def _build_router(
+    api_timeout: float = AI_API_TIMEOUT_SECONDS,
+    free_timeout: float = AI_FREE_TIMEOUT_SECONDS,
+    **settings
+) -> ProviderRouter:
+    options = dict(
+        deadline=AI_DEADLINE_SECONDS,
+        hedge_after=AI_HEDGE_AFTER_SECONDS,
+        retries=AI_RETRIES,
+        retry_backoff=AI_RETRY_BACKOFF_SECONDS,
+        failure_threshold=AI_BREAKER_FAILURES,
+        reset_timeout=AI_BREAKER_RESET_SECONDS
+    )
+    options.update(settings)
+    router = ProviderRouter(**options)
+    router.register("api", _send_api, timeout=api_timeout)
+    router.register("free", _send_free, timeout=free_timeout)
+    return router
+
+
+_router = _build_router()
+_llm_flights = SingleFlight()
+
+
+def _provider_order() -> List[str]:
+    # Keyed API first when configured, the free API as fallback
+    return (["api"] if AI_API_KEY else []) + ["free"]
+
+
+def provider_stats() -> Dict[str, dict]:
+    """Breaker state and request/latency stats per provider."""
+    return _router.stats()
+
+
+def coalescing_stats() -> Dict[str, int]:
+    """How many _call_llm calls shared an upstream call already in flight."""
+    return _llm_flights.stats()
+
+
+@callback("llm_coalesced_calls_total", "LLM calls that joined an identical call already in flight.", type="counter")
+def _coalesced_metric():
+    yield (), _llm_flights.coalesced
+
+
+async def _call_llm(prompt: str, system_message: str = "You are a helpful assistant for a Notepad app.") -> str:
     """
-    Core function to call AI. Prioritizes Keyed API, falls back to Free API.
+    Core function to call AI. Prioritizes Keyed API, falls back to Free API,
+    through the provider router (breakers, deadline, retries, hedging).
+    Concurrent calls with the same model, system message and prompt share
+    one upstream call.
     """
-    
-    # 1. Try Professional API (OpenAI/Groq/etc) if key is present
-    if AI_API_KEY:
+    key = response_key(AI_MODEL, system_message, prompt)
+    return await _llm_flights.do(key, lambda: _call_providers(prompt, system_message))
+
+
+async def _call_providers(prompt: str, system_message: str) -> str:
+    reply = await _router.call((prompt, system_message), _provider_order())
+    if reply is None:
+        return _fallback_reply()
+    return reply
+
+
+async def _stream_llm(prompt: str, system_message: str = "You are a helpful assistant for a Notepad app.") -> AsyncIterator[str]:
+    """
+    Streaming variant of _call_llm. Yields text fragments as the provider
+    produces them: token deltas from the keyed API's SSE stream, or raw
+    chunks of the free API's body. Falls back only if nothing was yielded.
+    """
+    client = _get_client()
+    loop = asyncio.get_running_loop()
+    names = _provider_order()
+
+    # 1. Keyed API with "stream": true (OpenAI-compatible SSE)
+    if AI_API_KEY and _router.allow("api"):
+        yielded = False
+        started = loop.time()
+        first_chunk = None
+        parts = []
+        error = "empty reply"
         try:
-            url = f"{AI_BASE_URL.rstrip('/')}/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {AI_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "model": AI_MODEL,
-                "messages": [
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7
-            }
-            
-            response = requests.post(url, headers=headers, json=payload, timeout=20, verify=False)
-            if response.status_code == 200:
-                data = response.json()
-                return data['choices'][0]['message']['content'].strip()
-            else:
-                print(f"Professional API Error ({response.status_code}): {response.text}")
-                # Log to traceback for debugging
-                import traceback
-                traceback.print_exc()
+            url, headers, payload = _api_request(prompt, system_message, stream=True)
+
+            async with _provider_limit("api"):
+                async with client.stream("POST", url, headers=headers, json=payload, timeout=AI_API_TIMEOUT_SECONDS) as response:
+                    if response.status_code == 200:
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                break
+                            choices = json.loads(data).get("choices") or [{}]
+                            delta = choices[0].get("delta", {}).get("content")
+                            if delta:
+                                if not yielded:
+                                    first_chunk = loop.time() - started
+                                yielded = True
+                                parts.append(delta)
+                                yield delta
+                    else:
+                        body = await response.aread()
+                        error = str(ProviderError.from_status(response.status_code, body.decode(errors="replace")))
         except Exception as e:
-            print(f"Professional API Exception: {e}")
+            error = f"{type(e).__name__}: {e}"
+        # Logged by the router, like failures on the non-streaming path
+        _router.record("api", yielded, first_chunk or 0.0, error)
+        if yielded:
+            _router.record_path(names, "api")
+            _count_tokens("api", prompt, system_message, "".join(parts))
+            return
+
+    # 2. Free API: forward the chunked body as it arrives
+    if not _router.allow("free"):
+        _router.record_path(names, None)
+        yield _fallback_reply()
+        return
 
-    # 2. Fallback to Free Pollinations API
+    yielded = False
+    started = loop.time()
+    first_chunk = None
+    parts = []
+    error = "empty reply"
     try:
-        # Prompt engineering for free API: Combine system and user more naturally
-        combined_prompt = f"### System: {system_message}\n\n### User: {prompt}"
-        
-        response = requests.post(
-            FREE_AI_URL,
-            data=combined_prompt.encode("utf-8"),
-            headers={"Content-Type": "text/plain"},
-            timeout=15,
-            verify=False
-        )
-        if response.status_code == 200 and response.text.strip():
-            return response.text.strip()
+        async with _provider_limit("free"):
+            async with client.stream(
+                "POST",
+                FREE_AI_URL,
+                content=_free_prompt(prompt, system_message),
+                headers={"Content-Type": "text/plain"},
+                timeout=AI_FREE_TIMEOUT_SECONDS
+            ) as response:
+                if response.status_code == 200:
+                    async for chunk in response.aiter_text():
+                        if chunk:
+                            if not yielded:
+                                first_chunk = loop.time() - started
+                            yielded = True
+                            parts.append(chunk)
+                            yield chunk
+                else:
+                    body = await response.aread()
+                    error = str(ProviderError.from_status(response.status_code, body.decode(errors="replace")))
     except Exception as e:
-        print(f"Free API Error: {e}")
+        error = f"{type(e).__name__}: {e}"
+    _router.record("free", yielded, first_chunk or 0.0, error)
+    _router.record_path(names, "free" if yielded else None)
 
-    if not AI_API_KEY:
-        return "I'm in basic mode. I can see your notes but my AI connection is quiet. Add an API key in the backend for full chat!"
-    return "I'm having trouble connecting to your AI provider. Check your API key or internet!"
+    if yielded:
+        _count_tokens("free", prompt, system_message, "".join(parts))
+    else:
+        yield _fallback_reply()
+
+
+async def _cached_call_llm(prompt: str, system_message: str, cache_scope=None) -> str:
+    """
+    _call_llm behind the response cache. Identical (model, system message,
+    prompt) inputs within the TTL reuse the stored answer; cache_scope ties
+    the entry to a user so their task writes invalidate it.
+    """
+    key = response_key(AI_MODEL, system_message, prompt, cache_scope)
+    cached = get_response(key)
+    if cached is not None:
+        LLM_CALLS.inc("cache")
+        return cached
+
+    reply = await _call_llm(prompt, system_message)
+    if reply not in (BASIC_MODE_REPLY, PROVIDER_ERROR_REPLY):
+        store_response(key, reply)
+    return reply
+
+
+async def _cached_stream_llm(prompt: str, system_message: str, cache_scope=None) -> AsyncIterator[str]:
+    """Streaming counterpart of _cached_call_llm; the full reply is cached once complete."""
+    key = response_key(AI_MODEL, system_message, prompt, cache_scope)
+    cached = get_response(key)
+    if cached is not None:
+        LLM_CALLS.inc("cache")
+        yield cached
+        return
+
+    parts = []
+    async for chunk in _stream_llm(prompt, system_message):
+        parts.append(chunk)
+        yield chunk
+    reply = "".join(parts).strip()
+    if reply and reply not in (BASIC_MODE_REPLY, PROVIDER_ERROR_REPLY):
+        store_response(key, reply)
 
 # ============================================
 # USE CASES
 # ============================================
 
-def generate_task_summary(tasks: List[Dict]) -> str:
+async def generate_task_summary(tasks: List[TaskContext], cache_scope=None) -> str:
     if not tasks:
         return "Your notepad is clear! Start adding some notes."
     
-    task_list = "\n".join([f"- {t['title']} ({t['status']})" for t in tasks[:15]])
-    prompt = f"Summarize these notes for me in a friendly, concise way:\n{task_list}"
+    prompt = f"Summarize these notes for me in a friendly, concise way:\n{build_task_context(tasks)}"
     
-    return _call_llm(prompt, "You are a helpful and encouraging notepad assistant.")
+    return await _cached_call_llm(prompt, "You are a helpful and encouraging notepad assistant.", cache_scope)
 
-def suggest_priorities(tasks: List[Dict]) -> Dict[str, any]:
-    pending = [t for t in tasks if t['status'] == 'pending']
+async def suggest_priorities(tasks: List[TaskContext], cache_scope=None, total_pending: Optional[int] = None) -> Dict[str, any]:
+    """
+    tasks may be a pre-filtered, limited slice of the pending tasks; pass
+    total_pending when the full count is known separately.
+    """
+    pending = [t for t in tasks if t.status == 'pending']
+    if total_pending is None:
+        total_pending = len(pending)
     if not pending:
-        return {"suggestions": [], "reasoning": "You've finished everything! Time for a break?"}
+        return {"suggestions": [], "reasoning": "You've finished everything! Time for a break?", "total_pending": 0}
     
-    task_list = "\n".join([f"- {t['title']} (Due: {t.get('due_date', 'None')})" for t in pending[:10]])
+    task_list = "\n".join([f"- {t.title} (Due: {t.due_date.isoformat() if t.due_date else None})" for t in pending[:10]])
     prompt = f"Which 3 notes from this list should I focus on? Explain why briefly:\n{task_list}"
     
-    ans = _call_llm(prompt, "You are a productivity expert.")
+    ans = await _cached_call_llm(prompt, "You are a productivity expert.", cache_scope)
     
     # Try to extract the first 3 lines/bullet points as suggestions
-    suggestions = [t['title'] for t in pending[:3]]
+    suggestions = [t.title for t in pending[:3]]
     
     return {
         "suggestions": suggestions,
         "reasoning": ans,
-        "total_pending": len(pending)
+        "total_pending": total_pending
     }
 
-def parse_task_draft(text: str) -> Dict[str, any]:
-    """Parse natural language into a note draft."""
+async def parse_task_draft(text: str) -> Dict[str, any]:
+    """
+    Parse natural language into a note draft.
+    Simple phrases are handled by the local rule-based parser; the LLM is
+    only asked when that parser is not confident enough.
+    """
+    local_draft = parse_draft_locally(text)
+    if local_draft["confidence"] >= AI_DRAFT_LOCAL_MIN_CONFIDENCE:
+        return local_draft
+
     today = datetime.now().strftime("%Y-%m-%d (%A)")
     prompt = f"Today is {today}. Convert this text into a JSON object for a note. Text: \"{text}\". Return ONLY JSON with keys: title, description, due_date (YYYY-MM-DD or null)."
     
     # We want a more deterministic response for parsing
-    res = _call_llm(prompt, "You are a data extractor. Return only valid JSON.")
+    res = await _call_llm(prompt, "You are a data extractor. Return only valid JSON.")
     
-    draft = {"title": text[:50], "description": None, "due_date": None, "confidence": 0.5}
+    # If the reply is unusable, the local draft is still the best guess
+    draft = dict(local_draft)
     try:
         # Improved JSON extraction logic
         match = re.search(r'\{.*\}', res.replace('\n', ''), re.DOTALL)
@@ -126,13 +433,29 @@ def parse_task_draft(text: str) -> Dict[str, any]:
         pass
     return draft
 
-def chat_with_task_context(user_message: str, tasks: List[Dict]) -> str:
+CHAT_SYSTEM_MESSAGE = "You are a helpful companion for this notepad app. You know all the user's notes and you're here to help them brainstorm, organize, or just chat."
+DAILY_PLAN_PROMPT = "Look at my notes and give me a quick plan for today."
+DAILY_PLAN_SYSTEM_MESSAGE = "You are a daily planner."
+
+def _chat_prompt(user_message: str, tasks: List[TaskContext]) -> str:
+    # Notes most related to the question (and the most urgent) come first
+    task_context = "USER NOTES:\n" + build_task_context(tasks, query=user_message)
+    return f"{task_context}\n\nUser Question: {user_message}"
+
+def _daily_plan_prompt(tasks: List[TaskContext]) -> str:
+    return f"{DAILY_PLAN_PROMPT}\n\nMY PENDING NOTES:\n{build_task_context(tasks)}"
+
+async def chat_with_task_context(user_message: str, tasks: List[TaskContext]) -> str:
     """Conversational chat with context of all notes."""
-    task_context = "USER NOTES:\n" + "\n".join([f"- {t['title']} ({t['status']})" for t in tasks[:20]])
-    
-    full_prompt = f"{task_context}\n\nUser Question: {user_message}"
-    
-    return _call_llm(full_prompt, "You are a helpful companion for this notepad app. You know all the user's notes and you're here to help them brainstorm, organize, or just chat.")
+    return await _call_llm(_chat_prompt(user_message, tasks), CHAT_SYSTEM_MESSAGE)
+
+def stream_chat_with_task_context(user_message: str, tasks: List[TaskContext]) -> AsyncIterator[str]:
+    """Same as chat_with_task_context, yielding the reply as it is generated."""
+    return _stream_llm(_chat_prompt(user_message, tasks), CHAT_SYSTEM_MESSAGE)
+
+async def generate_daily_plan(tasks: List[TaskContext], cache_scope=None) -> str:
+    return await _cached_call_llm(_daily_plan_prompt(tasks), DAILY_PLAN_SYSTEM_MESSAGE, cache_scope)
 
-def generate_daily_plan(tasks: List[Dict]) -> str:
-    return _call_llm("Look at my notes and give me a quick plan for today.", "You are a daily planner.")
+def stream_daily_plan(tasks: List[TaskContext], cache_scope=None) -> AsyncIterator[str]:
+    """Same as generate_daily_plan, yielding the plan as it is generated."""
+    return _cached_stream_llm(_daily_plan_prompt(tasks), DAILY_PLAN_SYSTEM_MESSAGE, cache_scope)
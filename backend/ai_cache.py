@@ -0,0 +1,194 @@
+"""
+Response Cache for AI Use Cases.
+Stores LLM answers keyed on a hash of the prompt inputs (model, system
+message and the prompt built from the user's tasks), so repeated identical
+prompts are served without calling the provider again.
+"""
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from itertools import chain
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import TaskDB
+from config import AI_CACHE_TTL_SECONDS, AI_CACHE_MAX_ENTRIES, AI_CACHE_URL
+
+
+class CacheBackend:
+    """
+    Interface for cache storage. Entries expire after their TTL; counters
+    (used for per-user invalidation) never expire.
+    """
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: int):
+        raise NotImplementedError
+
+    def get_counter(self, key: str) -> int:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class InMemoryCache(CacheBackend):
+    """In-process LRU cache with per-entry TTL."""
+
+    def __init__(self, max_entries: int = AI_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+
+class RedisCache(CacheBackend):
+    """
+    Shared cache for multi-worker deployments.
+    Requires the optional `redis` package.
+    """
+
+    def __init__(self, url: str, prefix: str = "notepad:ai:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("AI_CACHE_URL is set but the 'redis' package is not installed") from e
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._redis.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: int):
+        self._redis.set(self.prefix + key, value, ex=ttl)
+
+    def get_counter(self, key: str) -> int:
+        return int(self._redis.get(self.prefix + key) or 0)
+
+    def incr(self, key: str) -> int:
+        return self._redis.incr(self.prefix + key)
+
+    def clear(self):
+        for key in self._redis.scan_iter(self.prefix + "*"):
+            self._redis.delete(key)
+
+
+def _build_backend() -> CacheBackend:
+    if AI_CACHE_URL:
+        return RedisCache(AI_CACHE_URL)
+    return InMemoryCache()
+
+
+_backend: CacheBackend = _build_backend()
+
+
+def get_cache_backend() -> CacheBackend:
+    return _backend
+
+
+def set_cache_backend(backend: CacheBackend):
+    """Swap the cache storage (e.g. to a shared backend)."""
+    global _backend
+    _backend = backend
+
+
+# ============================================
+# KEYS & INVALIDATION
+# ============================================
+
+def _generation_key(scope) -> str:
+    return f"gen:{scope}"
+
+
+def response_key(model: str, system_message: str, prompt: str, scope=None) -> str:
+    """
+    Content-addressed key for an LLM response. The scope (user id) and its
+    generation are part of the key so task writes retire old entries.
+    """
+    digest = hashlib.sha256(
+        json.dumps([model, system_message, prompt]).encode("utf-8")
+    ).hexdigest()
+    if scope is None:
+        return f"resp:{digest}"
+    generation = _backend.get_counter(_generation_key(scope))
+    return f"resp:{scope}:{generation}:{digest}"
+
+
+def get_response(key: str) -> Optional[str]:
+    return _backend.get(key)
+
+
+def store_response(key: str, value: str, ttl: int = AI_CACHE_TTL_SECONDS):
+    _backend.set(key, value, ttl)
+
+
+def invalidate_scope(scope):
+    """Retire every cached response for a scope (user id)."""
+    _backend.incr(_generation_key(scope))
+
+
+def invalidate_on_commit(session: Session, scope):
+    """
+    Retire a scope's responses once the session commits. ORM writes are
+    picked up automatically; Core INSERT/UPDATE/DELETE must call this.
+    """
+    session.info.setdefault("ai_cache_scopes", set()).add(scope)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_task_writes(session, flush_context):
+    # new/dirty/deleted still hold the pre-flush state here
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, TaskDB) and obj.user_id is not None:
+            invalidate_on_commit(session, obj.user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    for scope in session.info.pop("ai_cache_scopes", ()):
+        invalidate_scope(scope)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("ai_cache_scopes", None)
@@ -0,0 +1,435 @@
+"""
+Background AI Jobs.
+Slow AI use cases can run outside the request: the endpoint submits a job
+and answers with its id, a pool of worker tasks runs it, and the client
+polls GET /ai/jobs/{id} (optionally long-polling with ?wait=) or listens
+for a "job.finished" event on /ws/tasks.
+
+Jobs are deduplicated by an input hash (use case, user, task data
+version, day): submitting work that is already queued, running or
+recently done returns the existing job, and the synchronous endpoints
+answer from a finished job's result when there is one. That is what the
+nightly precomputation of daily plans feeds.
+
+Two stores: in-process (default; lost on restart) and SQLite, a durable
+file that several workers or processes can share. A running job's claim
+is a lease, so jobs held by a crashed worker are picked up again.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from collections import deque
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from config import (
+    AI_JOBS_BACKEND,
+    AI_JOBS_DB_PATH,
+    AI_JOB_WORKERS,
+    AI_JOB_RESULT_TTL_SECONDS,
+    AI_JOB_LEASE_SECONDS
+)
+from task_events import publish_task_event
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+# How often idle workers look for jobs another process has queued
+POLL_INTERVAL_SECONDS = 1.0
+
+
+class AIJob(NamedTuple):
+    id: str
+    kind: str
+    user_id: int
+    input_hash: str
+    status: str
+    result: Optional[dict]
+    error: Optional[str]
+    created_at: float
+    finished_at: Optional[float]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+
+def job_input_hash(kind: str, user_id: int, *inputs) -> str:
+    return hashlib.sha256(json.dumps([kind, user_id, *inputs]).encode("utf-8")).hexdigest()
+
+
+class JobStore:
+    """Interface for job storage."""
+
+    async def enqueue(self, kind: str, user_id: int, input_hash: str) -> Tuple[AIJob, bool]:
+        """(job, created): an equivalent live or recently done job is returned instead of a new one."""
+        raise NotImplementedError
+
+    async def lookup(self, input_hash: str) -> Optional[AIJob]:
+        """Latest job for these inputs, if any."""
+        raise NotImplementedError
+
+    async def claim(self) -> Optional[AIJob]:
+        """Oldest queued job (or one whose lease ran out), now marked running."""
+        raise NotImplementedError
+
+    async def finish(self, job_id: str, result: Optional[dict] = None, error: Optional[str] = None):
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[AIJob]:
+        raise NotImplementedError
+
+    async def purge(self, finished_before: float):
+        raise NotImplementedError
+
+
+def _reusable(job: AIJob, now: float) -> bool:
+    if job.status in (QUEUED, RUNNING):
+        return True
+    return job.status == DONE and job.finished_at > now - AI_JOB_RESULT_TTL_SECONDS
+
+
+class InMemoryJobStore(JobStore):
+    """Jobs in this process only (single-worker deployments, tests)."""
+
+    def __init__(self):
+        self._jobs: Dict[str, AIJob] = {}
+        self._by_hash: Dict[str, str] = {}
+        self._queue: deque = deque()
+
+    async def lookup(self, input_hash: str) -> Optional[AIJob]:
+        return self._jobs.get(self._by_hash.get(input_hash))
+
+    async def enqueue(self, kind: str, user_id: int, input_hash: str) -> Tuple[AIJob, bool]:
+        now = time.time()
+        existing = await self.lookup(input_hash)
+        if existing is not None and _reusable(existing, now):
+            return existing, False
+
+        job = AIJob(uuid.uuid4().hex, kind, user_id, input_hash, QUEUED, None, None, now, None)
+        self._jobs[job.id] = job
+        self._by_hash[input_hash] = job.id
+        self._queue.append(job.id)
+        return job, True
+
+    async def claim(self) -> Optional[AIJob]:
+        while self._queue:
+            job = self._jobs.get(self._queue.popleft())
+            if job is not None and job.status == QUEUED:
+                job = self._jobs[job.id] = job._replace(status=RUNNING)
+                return job
+        return None
+
+    async def finish(self, job_id: str, result: Optional[dict] = None, error: Optional[str] = None):
+        self._jobs[job_id] = self._jobs[job_id]._replace(
+            status=FAILED if error else DONE, result=result, error=error, finished_at=time.time()
+        )
+
+    async def get(self, job_id: str) -> Optional[AIJob]:
+        return self._jobs.get(job_id)
+
+    async def purge(self, finished_before: float):
+        for job in list(self._jobs.values()):
+            if job.finished and job.finished_at < finished_before:
+                del self._jobs[job.id]
+                if self._by_hash.get(job.input_hash) == job.id:
+                    del self._by_hash[job.input_hash]
+
+
+class SqliteJobStore(JobStore):
+    """
+    Durable jobs in a SQLite file, shared by every worker process that
+    points at it. Calls run on the thread pool.
+    """
+
+    COLUMNS = "id, kind, user_id, input_hash, status, result, error, created_at, finished_at"
+
+    def __init__(self, path: str = AI_JOBS_DB_PATH):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ai_jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    input_hash TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    claimed_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_ai_jobs_input_hash ON ai_jobs (input_hash, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_ai_jobs_status ON ai_jobs (status, created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; writes that must be atomic use BEGIN IMMEDIATE
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    @staticmethod
+    def _job(row) -> Optional[AIJob]:
+        if row is None:
+            return None
+        result = json.loads(row[5]) if row[5] is not None else None
+        return AIJob(*row[:5], result, *row[6:])
+
+    def _lookup(self, conn: sqlite3.Connection, input_hash: str) -> Optional[AIJob]:
+        return self._job(conn.execute(
+            f"SELECT {self.COLUMNS} FROM ai_jobs WHERE input_hash = ? ORDER BY created_at DESC LIMIT 1",
+            (input_hash,)
+        ).fetchone())
+
+    def _enqueue(self, kind: str, user_id: int, input_hash: str) -> Tuple[AIJob, bool]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = self._lookup(conn, input_hash)
+            if existing is not None and _reusable(existing, now):
+                conn.execute("COMMIT")
+                return existing, False
+
+            job = AIJob(uuid.uuid4().hex, kind, user_id, input_hash, QUEUED, None, None, now, None)
+            conn.execute(
+                "INSERT INTO ai_jobs (id, kind, user_id, input_hash, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, kind, user_id, input_hash, QUEUED, now)
+            )
+            conn.execute("COMMIT")
+            return job, True
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _claim(self) -> Optional[AIJob]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                f"""
+                UPDATE ai_jobs SET status = ?, claimed_at = ?
+                WHERE id = (
+                    SELECT id FROM ai_jobs
+                    WHERE status = ? OR (status = ? AND claimed_at < ?)
+                    ORDER BY created_at LIMIT 1
+                )
+                RETURNING {self.COLUMNS}
+                """,
+                (RUNNING, now, QUEUED, RUNNING, now - AI_JOB_LEASE_SECONDS)
+            ).fetchone()
+            return self._job(row)
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: str, result: Optional[dict], error: Optional[str]):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE ai_jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (FAILED if error else DONE, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def _lookup_one(self, input_hash: str) -> Optional[AIJob]:
+        with closing(self._connect()) as conn:
+            return self._lookup(conn, input_hash)
+
+    def _get(self, job_id: str) -> Optional[AIJob]:
+        with closing(self._connect()) as conn:
+            return self._job(conn.execute(f"SELECT {self.COLUMNS} FROM ai_jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def _purge(self, finished_before: float):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM ai_jobs WHERE finished_at < ?", (finished_before,))
+
+    async def enqueue(self, kind: str, user_id: int, input_hash: str) -> Tuple[AIJob, bool]:
+        return await run_in_threadpool(self._enqueue, kind, user_id, input_hash)
+
+    async def lookup(self, input_hash: str) -> Optional[AIJob]:
+        return await run_in_threadpool(self._lookup_one, input_hash)
+
+    async def claim(self) -> Optional[AIJob]:
+        return await run_in_threadpool(self._claim)
+
+    async def finish(self, job_id: str, result: Optional[dict] = None, error: Optional[str] = None):
+        await run_in_threadpool(self._finish, job_id, result, error)
+
+    async def get(self, job_id: str) -> Optional[AIJob]:
+        return await run_in_threadpool(self._get, job_id)
+
+    async def purge(self, finished_before: float):
+        await run_in_threadpool(self._purge, finished_before)
+
+
+# handler(user_id) -> JSON-serializable result
+JobHandler = Callable[[int], Awaitable[dict]]
+
+
+class JobQueue:
+    """Runs submitted jobs on a pool of worker tasks."""
+
+    def __init__(self, store: JobStore, workers: int = AI_JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self.handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._loop = None
+        self._wake: Optional[asyncio.Event] = None
+        self._finished: Optional[asyncio.Event] = None
+        self._last_purge = 0.0
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    def start(self):
+        """Start the workers on the running event loop (idempotent)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        # Workers of another (closed) event loop are gone with it
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, user_id: int, input_hash: str) -> AIJob:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        self.start()
+        job, created = await self.store.enqueue(kind, user_id, input_hash)
+        if created:
+            self._wake.set()
+        return job
+
+    async def precomputed(self, input_hash: str) -> Optional[AIJob]:
+        """A finished, still reusable result for these inputs, if there is one."""
+        job = await self.store.lookup(input_hash)
+        if job is not None and job.status == DONE and _reusable(job, time.time()):
+            return job
+        return None
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[AIJob]:
+        """The job once finished, or as it is after `timeout` seconds."""
+        self.start()
+        deadline = time.monotonic() + timeout
+        while True:
+            finished = self._finished
+            job = await self.store.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.finished or remaining <= 0:
+                return job
+            try:
+                # Woken by local completions; polled for other processes'
+                await asyncio.wait_for(finished.wait(), min(remaining, POLL_INTERVAL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _work(self):
+        while True:
+            try:
+                job = await self.store.claim()
+            except Exception as e:
+                logger.warning("AI job claim failed: %s", e)
+                job = None
+
+            if job is None:
+                await self._idle()
+                continue
+
+            result, error = None, None
+            try:
+                result = await self.handlers[job.kind](job.user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                logger.warning("AI job %s (%s) failed: %s", job.id, job.kind, error, exc_info=True)
+
+            try:
+                await self.store.finish(job.id, result, error)
+            except Exception as e:
+                # Left running: another worker retries it once the lease runs out
+                logger.warning("AI job %s could not be stored: %s", job.id, e)
+                continue
+            self._notify_finished()
+            await publish_task_event(job.user_id, "job.finished", job_id=job.id, kind=job.kind, status=FAILED if error else DONE)
+
+    async def _idle(self):
+        if time.monotonic() - self._last_purge > AI_JOB_RESULT_TTL_SECONDS / 4:
+            self._last_purge = time.monotonic()
+            try:
+                await self.store.purge(time.time() - AI_JOB_RESULT_TTL_SECONDS)
+            except Exception as e:
+                logger.warning("AI job purge failed: %s", e)
+        try:
+            await asyncio.wait_for(self._wake.wait(), POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    def _notify_finished(self):
+        # Wake every waiter; each re-checks its own job
+        finished, self._finished = self._finished, asyncio.Event()
+        finished.set()
+
+
+def _build_store() -> JobStore:
+    if AI_JOBS_BACKEND == "sqlite":
+        return SqliteJobStore(AI_JOBS_DB_PATH)
+    return InMemoryJobStore()
+
+
+_queue = JobQueue(_build_store())
+
+
+def get_job_queue() -> JobQueue:
+    return _queue
+
+
+def set_job_queue(queue: JobQueue):
+    """Swap the queue (e.g. to a different store)."""
+    global _queue
+    _queue = queue
+
+
+# ============================================
+# NIGHTLY PRECOMPUTATION
+# ============================================
+
+def seconds_until(hour: int, now: Optional[datetime] = None) -> float:
+    """Seconds from `now` (local time) to the next time the clock reads hour:00."""
+    now = now or datetime.now()
+    target = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+async def run_nightly(hour: int, job: Callable[[], Awaitable[None]]):
+    """Run `job` every day at hour:00 local time, until cancelled."""
+    while True:
+        await asyncio.sleep(seconds_until(hour))
+        try:
+            await job()
+        except Exception as e:
+            logger.warning("Nightly job %s failed: %s", job.__name__, e, exc_info=True)
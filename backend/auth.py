@@ -2,40 +2,161 @@ from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
 from jose import jwt, JWTError
 from models import UserDB
-from database import get_db
+from database import run_in_session
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from config import SECRET_KEY, ALGORITHM
+from collections import OrderedDict
+from itertools import chain
+from typing import NamedTuple, Optional
+import threading
+import time
+from config import SECRET_KEY, ALGORITHM, AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_MAX_ENTRIES
+from profiling import span
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
-def get_current_user_id(token:str = Depends(oauth2_scheme)):
+
+class UserPrincipal(NamedTuple):
+    """The authenticated user as seen by request handlers (no ORM state)."""
+    id: int
+    username: str
+    email: str
+
+
+class PrincipalCache:
+    """
+    Bounded LRU of token -> principal. Entries live for the configured TTL
+    but never past the token's own expiry, and are dropped when the user
+    row is changed or deleted.
+    """
+
+    def __init__(self, max_entries: int = AUTH_CACHE_MAX_ENTRIES, ttl: int = AUTH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tokens_by_user = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[UserPrincipal]:
+        with self._lock:
+            item = self._entries.get(token)
+            if item is None:
+                return None
+            principal, expires_at = item
+            if expires_at <= time.time():
+                self._remove(token)
+                return None
+            self._entries.move_to_end(token)
+            return principal
+
+    def set(self, token: str, principal: UserPrincipal, token_exp: Optional[float] = None):
+        if self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._entries[token] = (principal, expires_at)
+            self._entries.move_to_end(token)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for token in self._tokens_by_user.pop(user_id, ()):
+                self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _remove(self, token: str):
+        principal, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(principal.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[principal.id]
+
+
+principal_cache = PrincipalCache()
+
+
+def _decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(
             token,
             SECRET_KEY,
             algorithms=[ALGORITHM]
         )
-        user_id = payload.get("sub")
-
-        if user_id is None:
-            raise HTTPException(
-                status_code = status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token payload"
-            )
-        return int(user_id)
     except JWTError:
         raise HTTPException(
             status_code = status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token"
         )
-def get_current_user(
-        user_id:int = Depends(get_current_user_id),
-        db:Session = Depends(get_db)
-):
-    user = db.query(UserDB).filter(UserDB.id == user_id).first()
-    if user is None:
+    if payload.get("sub") is None:
         raise HTTPException(
             status_code = status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
+            detail="Invalid token payload"
         )
-    return user
+    return payload
+
+
+def get_current_user_id(token:str = Depends(oauth2_scheme)):
+    return int(_decode_token(token)["sub"])
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """The token's `exp` as a Unix timestamp, or None if it has none."""
+    return _decode_token(token).get("exp")
+
+
+def _load_principal(db: Session, user_id: int):
+    return db.query(UserDB.id, UserDB.username, UserDB.email).filter(
+        UserDB.id == user_id
+    ).first()
+
+
+async def get_current_user(token:str = Depends(oauth2_scheme)) -> UserPrincipal:
+    with span("auth"):
+        principal = principal_cache.get(token)
+        if principal is not None:
+            return principal
+
+        payload = _decode_token(token)
+
+        # Short-lived session of our own: cache hits never touch the database
+        user = await run_in_session(_load_principal, int(payload["sub"]))
+
+        if user is None:
+            raise HTTPException(
+                status_code = status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        principal = UserPrincipal(*user)
+        principal_cache.set(token, principal, payload.get("exp"))
+        return principal
+
+
+async def get_active_user_id(current_user: UserPrincipal = Depends(get_current_user)) -> int:
+    """Id-only dependency for handlers that just scope queries to the user."""
+    return current_user.id
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_user_writes(session, flush_context):
+    for obj in chain(session.dirty, session.deleted):
+        if isinstance(obj, UserDB):
+            session.info.setdefault("auth_cache_users", set()).add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    for user_id in session.info.pop("auth_cache_users", ()):
+        principal_cache.invalidate_user(user_id)
+
 
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("auth_cache_users", None)
@@ -0,0 +1,138 @@
+"""
+Benchmark: CRUD latency while AI calls are in flight.
+
+Starts a local stub LLM server that answers every chat/completions request
+after a fixed delay, fires a burst of concurrent /ai/chat requests and
+measures GET /tasks latency at the same time. With the async LLM client the
+CRUD latency should stay close to the idle baseline.
+
+Usage:
+    python bench_ai_concurrency.py [ai_requests] [stub_delay_seconds]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+AI_REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+STUB_DELAY = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+CRUD_SAMPLES = 50
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible chat/completions endpoint."""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        time.sleep(STUB_DELAY)
+        body = json.dumps({
+            "choices": [{"message": {"role": "assistant", "content": "stub reply"}}]
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLMHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def measure_crud(client, headers, samples=CRUD_SAMPLES):
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        r = await client.get("/tasks", headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert r.status_code == 200
+    return latencies
+
+
+def report(label, latencies):
+    print(
+        f"{label:<26} p50={statistics.median(latencies):7.2f}ms "
+        f"p95={percentile(latencies, 95):7.2f}ms max={max(latencies):7.2f}ms"
+    )
+
+
+async def run_benchmark():
+    from httpx import AsyncClient, ASGITransport
+    from main import app
+    from database import Base, engine
+    from ai_assistant import close_llm_client
+
+    Base.metadata.create_all(bind=engine)
+    transport = ASGITransport(app=app)
+
+    async with AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        await client.post("/register", json={
+            "username": "bench",
+            "email": "bench@test.com",
+            "password": "BenchPass123"
+        })
+        r = await client.post("/login", json={"username": "bench", "password": "BenchPass123"})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        for i in range(20):
+            await client.post("/tasks/", json={"title": f"Task {i}"}, headers=headers)
+
+        idle = await measure_crud(client, headers)
+
+        ai_start = time.perf_counter()
+        ai_calls = [
+            # Distinct messages, so identical calls are not coalesced into one
+            asyncio.create_task(client.post("/ai/chat", json={"message": f"hi {i}"}, headers=headers))
+            for i in range(AI_REQUESTS)
+        ]
+        await asyncio.sleep(0.1)
+        loaded = await measure_crud(client, headers)
+        responses = await asyncio.gather(*ai_calls)
+        ai_elapsed = time.perf_counter() - ai_start
+
+    await close_llm_client()
+
+    print("--- CRUD LATENCY WITH AI CALLS IN FLIGHT ---")
+    print(f"AI requests: {AI_REQUESTS}, stub delay: {STUB_DELAY}s")
+    report("GET /tasks (idle)", idle)
+    report("GET /tasks (AI in flight)", loaded)
+    ok = sum(1 for r in responses if r.status_code == 200)
+    print(f"AI calls: {ok}/{AI_REQUESTS} succeeded in {ai_elapsed:.2f}s")
+
+
+def main():
+    server = start_stub_server()
+    db_dir = tempfile.mkdtemp()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    os.environ["AI_API_KEY"] = "bench"
+    os.environ["AI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1/"
+    os.environ.setdefault("AI_MAX_CONCURRENCY", str(AI_REQUESTS))
+    os.environ.setdefault("AI_MAX_CONNECTIONS", str(AI_REQUESTS))
+
+    try:
+        asyncio.run(run_benchmark())
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
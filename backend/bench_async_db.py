@@ -0,0 +1,109 @@
+"""
+Benchmark: sync vs async data layer under many concurrent clients.
+
+Runs the same mixed workload (create, list, complete, progress) against a
+fresh database once per DB_MODE, each in its own process so the engine is
+built from scratch, and prints requests/sec and latency side by side.
+
+Usage:
+    python bench_async_db.py [clients] [requests_per_client]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import subprocess
+
+CLIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+REQUESTS_PER_CLIENT = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+USERS = 50
+MODES = ("sync", "async")
+
+
+async def client_workload(client, headers, count, latencies, errors):
+    task_id = None
+    for i in range(count):
+        step = i % 4
+        start = time.perf_counter()
+        if step == 0:
+            r = await client.post("/tasks/", json={"title": f"Task {i}"}, headers=headers)
+            task_id = r.json().get("id") if r.status_code == 200 else None
+        elif step == 1:
+            r = await client.get("/tasks", params={"limit": 50}, headers=headers)
+        elif step == 2 and task_id is not None:
+            r = await client.patch(f"/tasks/{task_id}/complete", headers=headers)
+        else:
+            r = await client.get("/tasks/progress", headers=headers)
+        latencies.append(time.perf_counter() - start)
+        if r.status_code != 200:
+            errors.append(r.status_code)
+
+
+async def run_mode():
+    from httpx import AsyncClient, ASGITransport
+    from main import app
+    from database import Base, engine
+    from security import shutdown_hash_pool
+
+    Base.metadata.create_all(bind=engine)
+    transport = ASGITransport(app=app)
+    latencies, errors = [], []
+
+    async with AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        users = []
+        for n in range(USERS):
+            credentials = {"username": f"bench{n}", "password": "BenchPass123"}
+            await client.post("/register", json={**credentials, "email": f"bench{n}@test.com"})
+            r = await client.post("/login", json=credentials)
+            users.append({"Authorization": f"Bearer {r.json()['access_token']}"})
+
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            client_workload(client, users[n % USERS], REQUESTS_PER_CLIENT, latencies, errors)
+            for n in range(CLIENTS)
+        ])
+        elapsed = time.perf_counter() - start
+
+    shutdown_hash_pool()
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    if "--mode" in sys.argv:
+        # Child process: the environment already selects mode and database
+        print(json.dumps(asyncio.run(run_mode())))
+        return
+
+    print("--- SYNC VS ASYNC DATA LAYER ---")
+    print(f"Clients: {CLIENTS}, requests per client: {REQUESTS_PER_CLIENT}")
+    for mode in MODES:
+        db_dir = tempfile.mkdtemp()
+        env = dict(
+            os.environ,
+            DB_MODE=mode,
+            DATABASE_URL=f"sqlite:///{os.path.join(db_dir, 'bench.db')}",
+            BCRYPT_ROUNDS="4"
+        )
+        out = subprocess.run(
+            [sys.executable, __file__, str(CLIENTS), str(REQUESTS_PER_CLIENT), "--mode"],
+            env=env, capture_output=True, text=True, check=True
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(
+            f"{mode:<6} {result['rps']:8.1f} req/s  "
+            f"p50={result['p50_ms']:8.2f}ms p99={result['p99_ms']:8.2f}ms  "
+            f"({result['requests']} requests, {result['errors']} errors)"
+        )
+
+
+if __name__ == "__main__":
+    main()
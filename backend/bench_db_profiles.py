@@ -0,0 +1,106 @@
+"""
+Benchmark: endpoint throughput per database engine profile.
+
+Runs the same mixed workload (create, list, complete, progress) against a
+fresh database once per DB_PROFILE, each in its own process so the engine
+is built from scratch, and prints requests/sec side by side.
+
+Usage:
+    python bench_db_profiles.py [clients] [requests_per_client]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import subprocess
+
+CLIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+REQUESTS_PER_CLIENT = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+
+async def client_workload(client, headers, count, latencies):
+    task_id = None
+    for i in range(count):
+        step = i % 4
+        start = time.perf_counter()
+        if step == 0:
+            r = await client.post("/tasks/", json={"title": f"Task {i}"}, headers=headers)
+            task_id = r.json()["id"]
+        elif step == 1:
+            r = await client.get("/tasks", params={"limit": 50}, headers=headers)
+        elif step == 2:
+            r = await client.patch(f"/tasks/{task_id}/complete", headers=headers)
+        else:
+            r = await client.get("/tasks/progress", headers=headers)
+        latencies.append(time.perf_counter() - start)
+        assert r.status_code == 200, r.text
+
+
+async def run_profile():
+    from httpx import AsyncClient, ASGITransport
+    from main import app
+    from database import Base, engine
+    from security import shutdown_hash_pool
+
+    Base.metadata.create_all(bind=engine)
+    transport = ASGITransport(app=app)
+    latencies = []
+
+    async with AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        users = []
+        for n in range(CLIENTS):
+            credentials = {"username": f"bench{n}", "password": "BenchPass123"}
+            await client.post("/register", json={**credentials, "email": f"bench{n}@test.com"})
+            r = await client.post("/login", json=credentials)
+            users.append({"Authorization": f"Bearer {r.json()['access_token']}"})
+
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            client_workload(client, headers, REQUESTS_PER_CLIENT, latencies)
+            for headers in users
+        ])
+        elapsed = time.perf_counter() - start
+
+    shutdown_hash_pool()
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    if "--profile" in sys.argv:
+        # Child process: the environment already selects profile and database
+        print(json.dumps(asyncio.run(run_profile())))
+        return
+
+    from config import DB_PROFILES
+
+    print("--- ENGINE PROFILE THROUGHPUT ---")
+    print(f"Clients: {CLIENTS}, requests per client: {REQUESTS_PER_CLIENT}")
+    for profile in DB_PROFILES:
+        db_dir = tempfile.mkdtemp()
+        env = dict(
+            os.environ,
+            DB_PROFILE=profile,
+            DATABASE_URL=f"sqlite:///{os.path.join(db_dir, 'bench.db')}",
+            BCRYPT_ROUNDS="4"
+        )
+        out = subprocess.run(
+            [sys.executable, __file__, str(CLIENTS), str(REQUESTS_PER_CLIENT), "--profile"],
+            env=env, capture_output=True, text=True, check=True
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(
+            f"{profile:<10} {result['rps']:8.1f} req/s  "
+            f"p50={result['p50_ms']:7.2f}ms p99={result['p99_ms']:7.2f}ms  ({result['requests']} requests)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: CRUD latency during a login storm.
+
+Fires a burst of concurrent /login requests (bcrypt verification) while
+measuring GET /tasks latency, and reports login throughput and how many
+logins were shed with 429. Run it once per executor to compare:
+
+Usage:
+    PASSWORD_HASH_EXECUTOR=process python bench_login_load.py [logins]
+    PASSWORD_HASH_EXECUTOR=thread python bench_login_load.py [logins]
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import statistics
+
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+CRUD_SAMPLES = 100
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, latencies):
+    print(
+        f"{label:<26} p50={statistics.median(latencies):7.2f}ms "
+        f"p95={percentile(latencies, 95):7.2f}ms max={max(latencies):7.2f}ms"
+    )
+
+
+async def measure_crud(client, headers, samples=CRUD_SAMPLES):
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        r = await client.get("/tasks", headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert r.status_code == 200
+    return latencies
+
+
+async def run_benchmark():
+    from httpx import AsyncClient, ASGITransport
+    from main import app
+    from database import Base, engine
+    from security import shutdown_hash_pool
+    from config import PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING
+
+    Base.metadata.create_all(bind=engine)
+    transport = ASGITransport(app=app)
+    credentials = {"username": "bench", "password": "BenchPass123"}
+
+    async with AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        await client.post("/register", json={**credentials, "email": "bench@test.com"})
+        r = await client.post("/login", json=credentials)
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        for i in range(20):
+            await client.post("/tasks/", json={"title": f"Task {i}"}, headers=headers)
+
+        idle = await measure_crud(client, headers)
+
+        login_start = time.perf_counter()
+        logins = [
+            asyncio.create_task(client.post("/login", json=credentials))
+            for _ in range(LOGINS)
+        ]
+        await asyncio.sleep(0.05)
+        loaded = await measure_crud(client, headers)
+        responses = await asyncio.gather(*logins)
+        login_elapsed = time.perf_counter() - login_start
+
+    shutdown_hash_pool()
+
+    ok = sum(1 for r in responses if r.status_code == 200)
+    shed = sum(1 for r in responses if r.status_code == 429)
+    print("--- CRUD LATENCY DURING LOGIN STORM ---")
+    print(
+        f"Executor: {PASSWORD_HASH_EXECUTOR} x{PASSWORD_HASH_WORKERS}, "
+        f"max pending: {PASSWORD_HASH_MAX_PENDING}, logins: {LOGINS}"
+    )
+    report("GET /tasks (idle)", idle)
+    report("GET /tasks (login storm)", loaded)
+    print(f"Logins: {ok} ok, {shed} shed (429) in {login_elapsed:.2f}s ({ok / login_elapsed:.1f}/s)")
+
+
+def main():
+    db_dir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    asyncio.run(run_benchmark())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark: /tasks/search on a large synthetic task table.
+
+Loads synthetic tasks (through the FTS sync triggers) into a temporary
+SQLite database, then times the indexed search (task_search.py) against
+the LIKE '%word%' scan it replaces, for rare and common words, with and
+without a date filter. The LIKE query returns the first 20 matches in id
+order and can stop early; the indexed search ranks every match, so common
+words cost it more than rare ones.
+
+Usage:
+    python bench_search.py [tasks] [users] [queries]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import statistics
+from datetime import datetime, timedelta, timezone
+
+TASKS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+USERS = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+QUERIES = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+BATCH = 10_000
+
+COMMON_WORDS = ["review", "call", "email", "meeting", "report", "update", "plan", "check", "send", "fix"]
+
+
+def synthetic_words(rng, count=5000):
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(4, 9))) for _ in range(count)]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, latencies, hits):
+    print(
+        f"{label:<34} p50={statistics.median(latencies):8.2f}ms "
+        f"p95={percentile(latencies, 95):8.2f}ms avg hits={statistics.mean(hits):7.1f}"
+    )
+
+
+def load(engine, rng, vocabulary):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.executemany(
+            "INSERT INTO users (id, username, email, password_hash, created_at, task_change_seq) "
+            "VALUES (?, ?, ?, 'x', ?, 0)",
+            [(u, f"user{u}", f"user{u}@bench", now) for u in range(1, USERS + 1)]
+        )
+        for start in range(0, TASKS, BATCH):
+            rows = []
+            for _ in range(min(BATCH, TASKS - start)):
+                title = " ".join([rng.choice(COMMON_WORDS)] + rng.sample(vocabulary, 2))
+                description = " ".join(rng.sample(vocabulary, 8)) if rng.random() < 0.6 else None
+                due = now + timedelta(days=rng.randint(-30, 30)) if rng.random() < 0.5 else None
+                rows.append((rng.randint(1, USERS), title, description, "pending", due, now, now))
+            cursor.executemany(
+                "INSERT INTO tasks (user_id, title, description, status, due_date, created_at, updated_at, change_seq) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                rows
+            )
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def like_search(db, user_id, word, filters):
+    from sqlalchemy import select, or_
+    from models import TaskDB
+    pattern = f"%{word}%"
+    return db.execute(
+        select(TaskDB.__table__)
+        .where(TaskDB.user_id == user_id, or_(TaskDB.title.like(pattern), TaskDB.description.like(pattern)), *filters)
+        .order_by(TaskDB.id)
+        .limit(20)
+    ).all()
+
+
+def time_queries(fn, samples):
+    latencies, hits = [], []
+    for args in samples:
+        start = time.perf_counter()
+        rows = fn(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits.append(len(rows))
+    return latencies, hits
+
+
+def run_benchmark():
+    from sqlalchemy import text
+    from database import Base, engine, SessionLocal
+    from task_search import search_tasks
+    from main import _date_filters
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    vocabulary = synthetic_words(rng)
+
+    start = time.perf_counter()
+    load(engine, rng, vocabulary)
+    load_seconds = time.perf_counter() - start
+
+    with engine.connect() as conn:
+        conn.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('optimize')"))
+        conn.commit()
+
+    db_path = engine.url.database
+    index_mb = None
+    with engine.connect() as conn:
+        try:
+            index_mb = conn.execute(text(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'tasks_fts%'"
+            )).scalar() / 1e6
+        except Exception:
+            pass
+
+    print("--- FULL-TEXT SEARCH ---")
+    print(f"Tasks: {TASKS}, users: {USERS}, queries per case: {QUERIES}")
+    print(f"Load with FTS triggers: {load_seconds:.1f}s ({TASKS / load_seconds:,.0f} tasks/s)")
+    print(f"Database file: {os.path.getsize(db_path) / 1e6:.0f} MB" +
+          (f", FTS index: {index_mb:.0f} MB" if index_mb is not None else ""))
+
+    overdue = _date_filters(True, None, None)
+    cases = [
+        ("rare word", lambda: rng.choice(vocabulary), []),
+        ("rare word prefix (3 chars)", lambda: rng.choice(vocabulary)[:3], []),
+        ("common word", lambda: rng.choice(COMMON_WORDS), []),
+        ("common word + overdue", lambda: rng.choice(COMMON_WORDS), overdue),
+    ]
+
+    db = SessionLocal()
+    try:
+        for label, pick_word, filters in cases:
+            samples = [(rng.randint(1, USERS), pick_word()) for _ in range(QUERIES)]
+            fts, fts_hits = time_queries(
+                lambda user_id, word: search_tasks(db, user_id, word, filters, 20)[0], samples
+            )
+            like, like_hits = time_queries(
+                lambda user_id, word: like_search(db, user_id, word, filters), samples
+            )
+            report(f"FTS  {label}", fts, fts_hits)
+            report(f"LIKE {label}", like, like_hits)
+    finally:
+        db.close()
+
+
+def main():
+    db_dir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    run_benchmark()
+
+
+if __name__ == "__main__":
+    main()
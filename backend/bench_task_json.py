@@ -0,0 +1,187 @@
+"""
+Benchmark: JSON serialization of large GET /tasks responses.
+
+Fills a temporary SQLite database with one user's tasks, then compares the
+previous path (ORM objects validated through response_model=TaskResponse,
+dumped to Python and encoded with the stdlib json module) against
+task_json.py (column rows encoded straight to JSON by pydantic-core,
+streamed in chunks for long lists):
+
+1. serialization only, rows already loaded
+2. load + serialization
+3. end-to-end through FastAPI (in-process ASGI transport)
+
+Usage:
+    python bench_task_json.py [tasks] [iterations]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import tempfile
+import statistics
+from datetime import datetime, timedelta, timezone
+
+TASKS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+ITERATIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+
+def load(engine, rng):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(
+            "INSERT INTO users (id, username, email, password_hash, created_at, task_change_seq) "
+            "VALUES (1, 'bench', 'bench@bench', 'x', ?, 0)",
+            (now,)
+        )
+        rows = []
+        for i in range(TASKS):
+            description = f"Details for task {i}: " + "lorem ipsum " * rng.randint(0, 8) if rng.random() < 0.6 else None
+            due = now + timedelta(days=rng.randint(-30, 30), minutes=rng.randint(0, 1440)) if rng.random() < 0.5 else None
+            status = "completed" if rng.random() < 0.3 else "pending"
+            rows.append((1, f"Task {i} {rng.choice(['call', 'email', 'review', 'plan'])}", description, status, due, now, now))
+        cursor.executemany(
+            "INSERT INTO tasks (user_id, title, description, status, due_date, created_at, updated_at, change_seq) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+            rows
+        )
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def timed(fn, iterations=ITERATIONS):
+    fn()  # warm-up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples, baseline=None):
+    p50 = statistics.median(samples)
+    speedup = f"  {baseline / p50:5.1f}x" if baseline else ""
+    print(f"{label:<44} p50={p50:8.2f}ms  min={min(samples):8.2f}ms{speedup}")
+    return p50
+
+
+def build_app():
+    from fastapi import FastAPI
+    from database import SessionLocal
+    from models import TaskDB
+    from schema import TaskResponse
+    from task_json import TASK_COLUMNS, TASK_FIELDS, task_list_response, encode_rows
+    from fastapi import Response
+
+    app = FastAPI()
+
+    @app.get("/before", response_model=list[TaskResponse])
+    def before():
+        db = SessionLocal()
+        try:
+            return db.query(TaskDB).filter(TaskDB.user_id == 1).order_by(TaskDB.id).all()
+        finally:
+            db.close()
+
+    def column_rows():
+        db = SessionLocal()
+        try:
+            return db.query(*TASK_COLUMNS).filter(TaskDB.user_id == 1).order_by(TaskDB.id).all()
+        finally:
+            db.close()
+
+    @app.get("/after")
+    def after():
+        return task_list_response(column_rows(), TASK_FIELDS, {})
+
+    @app.get("/after-single-body")
+    def after_single_body():
+        return Response(encode_rows(column_rows(), TASK_FIELDS), media_type="application/json")
+
+    return app
+
+
+async def time_requests(app, path):
+    from httpx import AsyncClient, ASGITransport
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        body = (await client.get(path)).content
+        samples = []
+        for _ in range(ITERATIONS):
+            start = time.perf_counter()
+            r = await client.get(path)
+            samples.append((time.perf_counter() - start) * 1000)
+            assert r.status_code == 200
+    return samples, body
+
+
+def run_benchmark():
+    from pydantic import TypeAdapter
+    from database import Base, engine, SessionLocal
+    from models import TaskDB
+    from schema import TaskResponse
+    from task_json import TASK_COLUMNS, TASK_FIELDS, encode_rows, _stream_rows
+    from config import TASK_STREAM_MIN_ROWS, TASK_STREAM_CHUNK_ROWS
+
+    Base.metadata.create_all(bind=engine)
+    load(engine, random.Random(42))
+    adapter = TypeAdapter(list[TaskResponse])
+
+    def before_encode(orm_rows):
+        # What FastAPI does for response_model + the default JSONResponse
+        content = adapter.dump_python(adapter.validate_python(orm_rows, from_attributes=True), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+    db = SessionLocal()
+    try:
+        orm_rows = db.query(TaskDB).filter(TaskDB.user_id == 1).order_by(TaskDB.id).all()
+        column_rows = db.query(*TASK_COLUMNS).filter(TaskDB.user_id == 1).order_by(TaskDB.id).all()
+        assert json.loads(before_encode(orm_rows)) == json.loads(encode_rows(column_rows, TASK_FIELDS))
+        body_bytes = len(encode_rows(column_rows, TASK_FIELDS))
+        largest_chunk = max(len(chunk) for chunk in _stream_rows(column_rows, TASK_FIELDS))
+
+        print("--- TASK LIST SERIALIZATION ---")
+        print(f"Tasks: {TASKS}, iterations: {ITERATIONS}, body: {body_bytes / 1e6:.2f} MB")
+        print(f"Streaming from {TASK_STREAM_MIN_ROWS} rows, {TASK_STREAM_CHUNK_ROWS} rows per chunk "
+              f"(largest chunk {largest_chunk / 1e3:.0f} kB)")
+
+        print("\n1. Serialization only")
+        base = report("before: validate + dump_python + json.dumps", timed(lambda: before_encode(orm_rows)))
+        report("after:  pydantic-core to_json of rows", timed(lambda: encode_rows(column_rows, TASK_FIELDS)), base)
+        report("after:  streamed chunks (joined)", timed(lambda: b"".join(_stream_rows(column_rows, TASK_FIELDS))), base)
+
+        print("\n2. Load + serialization")
+        base = report("before: ORM objects", timed(lambda: before_encode(
+            db.query(TaskDB).filter(TaskDB.user_id == 1).order_by(TaskDB.id).all()
+        )))
+        report("after:  column rows", timed(lambda: encode_rows(
+            db.query(*TASK_COLUMNS).filter(TaskDB.user_id == 1).order_by(TaskDB.id).all(), TASK_FIELDS
+        )), base)
+    finally:
+        db.close()
+
+    print("\n3. End-to-end request (FastAPI, in-process)")
+    app = build_app()
+    results = {}
+    for path in ("/before", "/after-single-body", "/after"):
+        results[path] = asyncio.run(time_requests(app, path))
+    assert all(json.loads(body) == json.loads(results["/before"][1]) for _, body in results.values())
+    base = report("before: response_model=list[TaskResponse]", results["/before"][0])
+    report("after:  single body", results["/after-single-body"][0], base)
+    report("after:  streamed", results["/after"][0], base)
+
+
+def main():
+    db_dir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    run_benchmark()
+
+
+if __name__ == "__main__":
+    main()
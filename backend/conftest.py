@@ -0,0 +1,69 @@
+"""
+Shared test fixtures: every test starts from empty tables and an empty AI
+cache, and tests sign users in through the real /register and /login
+endpoints.
+"""
+import asyncio
+import pytest
+import ai_assistant
+import task_counters
+from ai_cache import get_cache_backend
+from database import Base, engine
+
+PASSWORD = "StrongPass123"
+
+
+@pytest.fixture(autouse=True)
+def reset_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(autouse=True)
+def clear_ai_cache():
+    get_cache_backend().clear()
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Replace the LLM providers with a slow-ish fake; returns the prompts it was sent."""
+    calls = []
+
+    async def fake_providers(prompt, system_message):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return f"reply #{len(calls)}"
+
+    monkeypatch.setattr(ai_assistant, "_call_providers", fake_providers)
+    return calls
+
+
+@pytest.fixture
+def enable_counters(monkeypatch):
+    monkeypatch.setattr(task_counters, "TASK_COUNTERS_ENABLED", True)
+
+
+def _registration(username: str) -> dict:
+    return {"username": username, "email": f"{username}@test.com", "password": PASSWORD}
+
+
+@pytest.fixture
+def login():
+    """`await login(client, username)`: register and log in over an AsyncClient, returning auth headers."""
+    async def login(client, username: str = "u1") -> dict:
+        await client.post("/register", json=_registration(username))
+        r = await client.post("/login", json={"username": username, "password": PASSWORD})
+        return {"Authorization": f"Bearer {r.json()['access_token']}"}
+    return login
+
+
+@pytest.fixture
+def access_token():
+    """`access_token(client, username)`: the same over a (sync) TestClient, returning the token."""
+    def access_token(client, username: str = "u1") -> str:
+        client.post("/register", json=_registration(username))
+        r = client.post("/login", json={"username": username, "password": PASSWORD})
+        return r.json()["access_token"]
+    return access_token
@@ -1,16 +1,78 @@
 """
 Database Configuration and Session Management.
 Uses SQLAlchemy to connect to SQLite and manage database sessions.
+The engine is configured from the DB_PROFILE settings in config.py.
+
+DB_MODE selects how request handlers reach the database: "sync" runs ORM
+work on the thread pool with a regular Session, "async" runs the same code
+through an AsyncSession (aiosqlite / asyncpg) without using threads.
 """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from config import DATABASE_URL
-
-engine = create_engine(
-    DATABASE_URL,
-    echo=True,
-    connect_args={"check_same_thread": False}
-)
+from typing import Callable
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from config import DATABASE_URL, DB_PROFILE, DB_MODE, engine_settings
+
+
+def _apply_sqlite_pragmas(pragmas: dict):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+    return on_connect
+
+
+def _engine_kwargs(url: str, settings: dict):
+    is_sqlite = url.startswith("sqlite")
+    in_memory = is_sqlite and (url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url)
+
+    kwargs = {"echo": settings["echo"]}
+    if is_sqlite:
+        kwargs["connect_args"] = {"check_same_thread": False}
+    if not in_memory:
+        kwargs.update(
+            pool_size=settings["pool_size"],
+            max_overflow=settings["max_overflow"],
+            pool_timeout=settings["pool_timeout"],
+            pool_pre_ping=settings["pool_pre_ping"] and not is_sqlite,
+            pool_recycle=settings["pool_recycle"]
+        )
+
+    pragmas = dict(settings["sqlite_pragmas"]) if is_sqlite else {}
+    if in_memory:
+        pragmas.pop("journal_mode", None)
+        pragmas.pop("mmap_size", None)
+    return kwargs, pragmas
+
+
+def create_db_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    kwargs, pragmas = _engine_kwargs(url, engine_settings(profile))
+    engine = create_engine(url, **kwargs)
+    if pragmas:
+        event.listen(engine, "connect", _apply_sqlite_pragmas(pragmas))
+    return engine
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver."""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+")[0]
+    drivers = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+    return f"{drivers.get(dialect, scheme)}{sep}{rest}"
+
+
+def create_async_db_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    kwargs, pragmas = _engine_kwargs(url, engine_settings(profile))
+    kwargs.pop("connect_args", None)
+    async_engine = create_async_engine(async_database_url(url), **kwargs)
+    if pragmas:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas(pragmas))
+    return async_engine
+
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -22,3 +84,91 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Built only in async mode so sync deployments don't need the async drivers.
+# Objects stay loaded after commit: they are serialized outside the session.
+async_engine = create_async_db_engine() if DB_MODE == "async" else None
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, expire_on_commit=False) if async_engine is not None else None
+)
+
+# The sync Engine behind request handlers' connections, for engine events
+request_engine = async_engine.sync_engine if async_engine is not None else engine
+
+
+class DBHandle:
+    """
+    Request-scoped database access. Handlers pass plain sync ORM functions,
+    fn(session, *args, **kwargs), so the same code serves both DB modes.
+    """
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        raise NotImplementedError
+
+    async def release(self):
+        """End the transaction and return the connection to the pool."""
+        raise NotImplementedError
+
+    async def read(self, fn: Callable, *args, **kwargs):
+        """run() followed by release(), for reads before slow non-DB work."""
+        try:
+            return await self.run(fn, *args, **kwargs)
+        finally:
+            await self.release()
+
+
+class ThreadPoolDB(DBHandle):
+    """Sync mode: ORM work runs on the thread pool."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+    async def release(self):
+        # Inline on purpose: a request holding a connection must be able to
+        # give it back even while every pool thread waits for a connection.
+        self.session.close()
+
+    async def read(self, fn: Callable, *args, **kwargs):
+        def run_and_close(session: Session):
+            try:
+                return fn(session, *args, **kwargs)
+            finally:
+                session.close()
+        return await run_in_threadpool(run_and_close, self.session)
+
+
+class AsyncSessionDB(DBHandle):
+    """Async mode: ORM work runs through AsyncSession.run_sync, no threads."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        return await self.session.run_sync(fn, *args, **kwargs)
+
+    async def release(self):
+        await self.session.close()
+
+
+def _open_handle() -> DBHandle:
+    if DB_MODE == "async":
+        return AsyncSessionDB(AsyncSessionLocal())
+    return ThreadPoolDB(SessionLocal())
+
+
+async def get_db_handle():
+    """FastAPI dependency yielding the DBHandle for the configured DB_MODE."""
+    handle = _open_handle()
+    try:
+        yield handle
+    finally:
+        await handle.release()
+
+
+async def run_in_session(fn: Callable, *args, **kwargs):
+    """Run fn(session, ...) in a short-lived session outside a request."""
+    return await _open_handle().read(fn, *args, **kwargs)
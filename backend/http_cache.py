@@ -0,0 +1,55 @@
+"""
+Conditional GET Helpers.
+ETags are derived from the user's task change sequence (see task_changes.py),
+which every task write advances, so a request whose If-None-Match still
+matches is answered 304 after one primary-key lookup, before any rows are
+loaded or serialized.
+
+Responses that depend on the current date (date filters, AI advice) also
+key on today's date. AI responses get weak ETags: the same data version
+may be phrased differently once the AI cache entry expires.
+"""
+import hashlib
+import json
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from fastapi import Request, Response
+
+from config import HTTP_CACHE_CONTROL
+
+
+def utc_today() -> date:
+    """The current day for everything keyed by date: ETags, AI jobs, date filters."""
+    return datetime.now(timezone.utc).date()
+
+
+def make_etag(request: Request, user_id: int, version: int, daily: bool = False, weak: bool = False) -> str:
+    parts = [request.url.path, sorted(request.query_params.multi_items()), user_id, version]
+    if daily:
+        parts.append(utc_today().isoformat())
+    digest = hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()[:32]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    return tag.strip().removeprefix("W/")
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 specifies for it)."""
+    header: Optional[str] = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in header.split(",")}
+
+
+def cache_headers(etag: str) -> dict:
+    # Per-user data: caches must revalidate and must not share across tokens
+    return {"ETag": etag, "Cache-Control": HTTP_CACHE_CONTROL, "Vary": "Authorization"}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
@@ -0,0 +1,301 @@
+"""
+LLM Provider Router.
+Sends a request to the first healthy provider in priority order, within
+one overall deadline:
+
+- Circuit breaker per provider: after a run of failures the provider is
+  skipped until a cool-down passes, then a single failure re-opens it.
+- Retries: transient failures (connection errors, 429, 5xx) are retried
+  on the same provider after a jittered backoff. Timeouts are not: the
+  rest of the budget goes to the next provider instead.
+- Hedging (optional): if a provider has not answered after
+  `hedge_after` seconds, the next one is started too and the first
+  answer wins.
+
+Per-provider health and latency stats are kept for /ai/providers.
+"""
+import asyncio
+import logging
+import random
+import statistics
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+from metrics import LLM_ATTEMPTS, LLM_LATENCY, LLM_CALLS
+from profiling import span
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# Samples kept per provider for the latency percentiles
+LATENCY_WINDOW = 200
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """A provider answered, but not usefully."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+    @classmethod
+    def from_status(cls, status_code: int, body: str = "") -> "ProviderError":
+        return cls(f"HTTP {status_code}: {body[:200]}", retryable=status_code in RETRYABLE_STATUS)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        # When the half-open trial request was let through
+        self._trial_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self.clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state != self.HALF_OPEN:
+            return state == self.CLOSED
+        # One trial at a time; one that never reports back (cancelled) stops
+        # blocking after another reset_timeout
+        now = self.clock()
+        if self._trial_at is not None and now - self._trial_at < self.reset_timeout:
+            return False
+        self._trial_at = now
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self._opened_at = None
+        self._trial_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        # While half-open one failure is enough to open again
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._opened_at = self.clock()
+        self._trial_at = None
+
+
+class ProviderStats:
+    def __init__(self):
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.hedges = 0
+        # Requests not sent because the breaker was open
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self) -> dict:
+        latency = None
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            latency = {
+                "p50": round(statistics.median(ordered) * 1000, 1),
+                "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 1),
+                "max": round(ordered[-1] * 1000, 1),
+            }
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+            "latency_ms": latency,
+        }
+
+
+# send(request, timeout) -> reply text; raises on failure
+SendFn = Callable[[object, float], Awaitable[str]]
+
+
+class Provider:
+    def __init__(self, name: str, send: SendFn, timeout: float, breaker: CircuitBreaker):
+        self.name = name
+        self.send = send
+        self.timeout = timeout
+        self.breaker = breaker
+        self.stats = ProviderStats()
+
+    def record_success(self, latency: float):
+        self.breaker.record_success()
+        self.stats.successes += 1
+        self.stats.latencies.append(latency)
+        LLM_ATTEMPTS.inc(self.name, "success")
+        LLM_LATENCY.observe(latency, self.name)
+
+    def record_failure(self, error: str, outcome: str = "error"):
+        self.breaker.record_failure()
+        self.stats.failures += 1
+        self.stats.last_error = error
+        LLM_ATTEMPTS.inc(self.name, outcome)
+        logger.warning("LLM provider '%s' failed: %s", self.name, error)
+
+    def record_rejected(self):
+        self.stats.rejected += 1
+        LLM_ATTEMPTS.inc(self.name, "rejected")
+
+
+class ProviderRouter:
+    def __init__(
+        self,
+        deadline: float,
+        hedge_after: float = 0,
+        retries: int = 0,
+        retry_backoff: float = 0.25,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30
+    ):
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.providers: Dict[str, Provider] = {}
+
+    def register(self, name: str, send: SendFn, timeout: float):
+        breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        self.providers[name] = Provider(name, send, timeout, breaker)
+
+    def allow(self, name: str) -> bool:
+        """Breaker check for callers that talk to a provider themselves (streaming)."""
+        provider = self.providers[name]
+        if provider.breaker.allow():
+            return True
+        provider.record_rejected()
+        return False
+
+    def record(self, name: str, ok: bool, latency: float = 0.0, error: str = "no reply"):
+        provider = self.providers[name]
+        provider.stats.requests += 1
+        if ok:
+            provider.record_success(latency)
+        else:
+            provider.record_failure(error)
+
+    @staticmethod
+    def record_path(names: List[str], answered: Optional[str]):
+        """Count a finished call by whether the first choice, a fallback, or nobody answered."""
+        if answered is None:
+            LLM_CALLS.inc("none")
+        else:
+            LLM_CALLS.inc("primary" if answered == names[0] else "fallback")
+
+    def stats(self) -> dict:
+        return {
+            name: {"state": provider.breaker.state, **provider.stats.snapshot()}
+            for name, provider in self.providers.items()
+        }
+
+    async def call(self, request, names: List[str]) -> Optional[str]:
+        """First successful reply from the named providers (in order), or None."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        queue = [self.providers[name] for name in names]
+        running: Dict[asyncio.Task, Provider] = {}
+
+        answered = None
+        try:
+            while True:
+                if not running and self._start_next(queue, running, request, deadline) is None:
+                    return None
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+                hedging = self.hedge_after > 0 and queue
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=min(remaining, self.hedge_after) if hedging else remaining,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    if hedging:
+                        hedge = self._start_next(queue, running, request, deadline)
+                        if hedge is not None:
+                            hedge.stats.hedges += 1
+                    continue
+
+                for task in done:
+                    provider = running.pop(task)
+                    reply = task.result()
+                    if reply is not None:
+                        answered = provider.name
+                        return reply
+        finally:
+            self.record_path(names, answered)
+            # Losing hedges and anything past the deadline
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    def _start_next(self, queue: List[Provider], running: dict, request, deadline: float) -> Optional[Provider]:
+        while queue:
+            provider = queue.pop(0)
+            if provider.breaker.allow():
+                running[asyncio.create_task(self._attempt(provider, request, deadline))] = provider
+                return provider
+            provider.record_rejected()
+        return None
+
+    async def _attempt(self, provider: Provider, request, deadline: float) -> Optional[str]:
+        """Send with retries; the reply, or None once the provider has failed."""
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(self.retries + 1):
+            timeout = min(provider.timeout, deadline - loop.time())
+            if timeout <= 0 or (attempt and not provider.breaker.allow()):
+                return None
+
+            provider.stats.requests += 1
+            if attempt:
+                provider.stats.retries += 1
+            started = loop.time()
+            try:
+                with span("upstream", provider.name):
+                    reply = await asyncio.wait_for(provider.send(request, timeout), timeout)
+            except asyncio.TimeoutError:
+                provider.stats.timeouts += 1
+                provider.record_failure(f"timed out after {timeout:.1f}s", outcome="timeout")
+                return None
+            except ProviderError as e:
+                provider.record_failure(str(e))
+                if not e.retryable:
+                    return None
+            except Exception as e:
+                provider.record_failure(f"{type(e).__name__}: {e}")
+            else:
+                provider.record_success(loop.time() - started)
+                return reply
+
+            if attempt < self.retries:
+                # Full jitter, so clients that failed together do not retry together
+                backoff = random.uniform(0, self.retry_backoff * 2 ** attempt)
+                if loop.time() + backoff >= deadline:
+                    return None
+                await asyncio.sleep(backoff)
+        return None
@@ -1,11 +1,21 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, WebSocket
+from starlette.status import WS_1008_POLICY_VIOLATION
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone, timedelta
-from typing import Optional
+from typing import Optional, AsyncIterator, Callable, Literal
+import json
+import asyncio
+import logging
+import secrets
+import time
 from contextlib import asynccontextmanager
 
-from database import Base, engine, get_db
+from database import engine, request_engine, get_db_handle, DBHandle, run_in_session
+from migrations import upgrade
 from schema import (
     TaskCreate,
     TaskResponse,
@@ -17,27 +27,84 @@ from schema import (
     PrioritySuggestion,
     ChatRequest,
     ChatResponse,
+    ChatStreamChunk,
     AIParseRequest,
-    AIParseResponse
+    AIParseResponse,
+    BulkTaskRequest,
+    BulkTaskResponse,
+    TaskChangesResponse,
+    TaskSearchResult,
+    AIJobResponse
 )
-from security import hash_password, verify_password, create_access_token
-from auth import get_current_user
+from security import (
+    hash_password_async,
+    verify_and_update_password_async,
+    create_access_token,
+    shutdown_hash_pool,
+    PasswordHashingBusy
+)
+from auth import get_active_user_id, get_current_user, token_expiry
 from models import TaskDB, UserDB, TaskStatus
+from task_context import load_task_context, load_prompt_candidates, count_pending
+from pagination import apply_keyset, encode_cursor, MAX_PAGE_SIZE
+from task_counters import get_counts, record_change, counters_enabled
+from task_writes import insert_task_row, update_task_row, update_task_row_with_status, delete_task_row
+from task_bulk import apply_bulk
+from task_changes import load_changes, change_version, prune_expired_tombstones
+from task_search import search_tasks
+from task_json import TASK_FIELDS, task_list_response
+from task_events import publish_task_event, get_broker
+from http_cache import make_etag, is_not_modified, not_modified, cache_headers, utc_today
 from sqlalchemy.exc import IntegrityError
-from config import CORS_ORIGINS
+from config import (
+    CORS_ORIGINS,
+    AI_PRECOMPUTE_HOUR,
+    AI_PRECOMPUTE_ACTIVE_DAYS,
+    TASK_TOMBSTONE_RETENTION_DAYS,
+    TASK_TOMBSTONE_PRUNE_HOUR,
+    METRICS_ENABLED,
+    METRICS_TOKEN,
+    METRICS_PUBLIC,
+    PROFILING_ENABLED
+)
+from metrics import MetricsMiddleware, instrument_engine, render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+import profiling
+from profiling import ProfilingMiddleware, is_admin_token, list_profiles, get_profile
+from ai_jobs import AIJob, JobQueue, get_job_queue, job_input_hash, run_nightly
 from ai_assistant import (
     generate_task_summary,
     suggest_priorities,
     generate_daily_plan,
     chat_with_task_context,
-    parse_task_draft
+    stream_chat_with_task_context,
+    stream_daily_plan,
+    parse_task_draft,
+    provider_stats,
+    coalescing_stats,
+    close_llm_client
 )
 
 
+logger = logging.getLogger(__name__)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Base.metadata.create_all(bind=engine)
+    upgrade(engine)
+    job_queue = get_job_queue()
+    job_queue.start()
+    nightly = []
+    if AI_PRECOMPUTE_HOUR >= 0:
+        nightly.append(asyncio.create_task(run_nightly(AI_PRECOMPUTE_HOUR, precompute_daily_plans)))
+    if TASK_TOMBSTONE_RETENTION_DAYS > 0 and TASK_TOMBSTONE_PRUNE_HOUR >= 0:
+        nightly.append(asyncio.create_task(run_nightly(TASK_TOMBSTONE_PRUNE_HOUR, prune_task_tombstones)))
     yield
+    for task in nightly:
+        task.cancel()
+    await job_queue.stop()
+    await close_llm_client()
+    await get_broker().close()
+    shutdown_hash_pool()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -51,49 +118,142 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+    profiling.instrument_engine(request_engine)
+    profiling.instrument_engine(engine)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(request_engine)
+    instrument_engine(engine)
+
 
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
 
+def require_metrics_access(authorization: Optional[str] = Header(default=None)):
+    # Without a token the endpoints only exist when explicitly made public
+    if METRICS_TOKEN:
+        if authorization is None or not secrets.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    elif not METRICS_PUBLIC:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_access)], include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint (async: the thread pool gauges are read on the event loop)."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+def require_profile_admin(x_admin_token: Optional[str] = Header(default=None)):
+    # Without a configured token the admin endpoints don't exist
+    if not PROFILING_ENABLED or not profiling.PROFILE_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.get("/admin/profiles", dependencies=[Depends(require_profile_admin)], include_in_schema=False)
+def read_profiles():
+    """Profiled requests in the ring buffer, newest first (summaries)."""
+    return list_profiles()
+
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_profile_admin)], include_in_schema=False)
+def read_profile(profile_id: int, format: Literal["json", "folded"] = Query(default="json")):
+    """
+    One profile with all its spans. `format=folded` returns the sampled
+    stacks (PROFILE_FLAMEGRAPH) as text for flamegraph.pl or speedscope.
+    """
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        if profile["flamegraph"] is None:
+            raise HTTPException(status_code=404, detail="No flamegraph was sampled for this request")
+        return PlainTextResponse(profile["flamegraph"])
+    return profile
+
+
 # ---------------- AI ASSISTANT (READ-ONLY, ADVISORY) ----------------
 
+def _sse_response(chunks: AsyncIterator[str], final_payload: Callable[[str], str]) -> StreamingResponse:
+    """
+    Forward LLM output as Server-Sent Events: one `data:` event per chunk,
+    then a `done` event carrying the complete response body.
+    """
+    async def event_stream():
+        parts = []
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield f"data: {ChatStreamChunk(delta=chunk).model_dump_json()}\n\n"
+        yield f"event: done\ndata: {final_payload(''.join(parts).strip())}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _load_priority_context(db: Session, user_id: int):
+    return (
+        load_task_context(db, user_id, limit=10, pending_only=True),
+        count_pending(db, user_id)
+    )
+
+
+# AI handlers load their context with db.read(), which hands the connection
+# back to the pool before the (slow) LLM call.
+
+async def _task_summary_result(read: Callable, user_id: int) -> dict:
+    # Fetch only the columns the prompt needs
+    tasks = await read(load_prompt_candidates, user_id)
+    return {"summary": await generate_task_summary(tasks, cache_scope=user_id)}
+
+
 @app.get("/ai/task-summary")
-def get_task_summary(
-    current_user: UserDB = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_task_summary(
+    request: Request,
+    response: Response,
+    job: bool = Query(default=False),
+    user_id: int = Depends(get_active_user_id),
+    db: DBHandle = Depends(get_db_handle)
 ):
     """
     Generate a human-readable summary of user's tasks.
     
     This is READ-ONLY - it only summarizes, never modifies data.
     LLM is used as an assistive layer for user understanding.
+    Pass ?job=true to get a background job id instead of waiting.
     """
-    # Fetch user's tasks
-    tasks = db.query(TaskDB).filter(TaskDB.user_id == current_user.id).all()
-    
-    # Convert to dict format
-    task_dicts = [
-        {
-            "title": task.title,
-            "status": task.status,
-            "due_date": task.due_date.isoformat() if task.due_date else None,
-            "description": task.description
-        }
-        for task in tasks
-    ]
-    
-    # Generate summary
-    summary = generate_task_summary(task_dicts)
+    version = await db.run(change_version, user_id)
+    if job:
+        return await _submit_ai_job("task_summary", user_id, version)
+
+    etag = make_etag(request, user_id, version, daily=True, weak=True)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    precomputed = await get_job_queue().precomputed(_ai_job_hash("task_summary", user_id, version))
+    body = precomputed.result if precomputed else await _task_summary_result(db.read, user_id)
     
-    return {"summary": summary}
+    response.headers.update(cache_headers(etag))
+    return body
 
 
 @app.get("/ai/priorities", response_model=PrioritySuggestion)
-def get_priority_suggestions(
-    current_user: UserDB = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_priority_suggestions(
+    request: Request,
+    response: Response,
+    user_id: int = Depends(get_active_user_id),
+    db: DBHandle = Depends(get_db_handle)
 ):
     """
     Suggest task priorities based on due dates and status.
@@ -101,43 +261,37 @@ def get_priority_suggestions(
     This is ADVISORY - backend still controls actual priority.
     LLM suggests, user decides, backend enforces.
     """
-    # Fetch user's tasks
-    tasks = db.query(TaskDB).filter(TaskDB.user_id == current_user.id).all()
-    
-    # Convert to dict format
-    task_dicts = [
-        {
-            "title": task.title,
-            "status": task.status,
-            "due_date": task.due_date.isoformat() if task.due_date else None,
-            "description": task.description
-        }
-        for task in tasks
-    ]
-    
+    etag = make_etag(request, user_id, await db.run(change_version, user_id), daily=True, weak=True)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    # Fetch only the columns the prompt needs
+    tasks, total_pending = await db.read(_load_priority_context, user_id)
+
     # Get suggestions
-    suggestions = suggest_priorities(task_dicts)
+    suggestions = await suggest_priorities(tasks, cache_scope=user_id, total_pending=total_pending)
     
+    response.headers.update(cache_headers(etag))
     return PrioritySuggestion(**suggestions)
 
 
 @app.post("/ai/task-draft", response_model=AIParseResponse)
-def create_task_draft(
+async def create_task_draft(
     request: AIParseRequest,
-    current_user: UserDB = Depends(get_current_user)
+    user_id: int = Depends(get_active_user_id)
 ):
     """
     Parse natural language into a task DRAFT. (Use Case 3)
     """
-    draft = parse_task_draft(request.text)
+    draft = await parse_task_draft(request.text)
     
     # Parse due_date string to datetime if present
     due_date_dt = None
     if draft.get("due_date"):
         try:
-             # Handle YYYY-MM-DD
-            due_date_dt = datetime.strptime(draft["due_date"], "%Y-%m-%d")
-        except:
+            # Handle YYYY-MM-DD and YYYY-MM-DDTHH:MM
+            due_date_dt = datetime.fromisoformat(draft["due_date"])
+        except (TypeError, ValueError):
             pass
 
     return AIParseResponse(
@@ -149,119 +303,256 @@ def create_task_draft(
 
 
 @app.post("/ai/chat", response_model=ChatResponse)
-def chat_ai(
+async def chat_ai(
     request: ChatRequest,
-    current_user: UserDB = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    stream: bool = Query(default=False),
+    user_id: int = Depends(get_active_user_id),
+    db: DBHandle = Depends(get_db_handle)
 ):
     """
     Chat with the AI Assistant about your tasks.
+    Pass ?stream=true to receive the reply as Server-Sent Events.
     """
-    # Fetch recent tasks for context
-    tasks = db.query(TaskDB).filter(TaskDB.user_id == current_user.id).order_by(TaskDB.id.desc()).limit(20).all()
-    
-    # Serialize tasks for the context window
-    task_list = []
-    for t in tasks:
-        task_list.append({
-            "title": t.title,
-            "status": t.status,
-            "due_date": t.due_date.strftime("%Y-%m-%d") if t.due_date else "No Date"
-        })
-    
-    reply = chat_with_task_context(request.message, task_list)
+    # Candidate tasks; the prompt keeps those most relevant to the message
+    tasks = await db.read(load_prompt_candidates, user_id)
+
+    if stream:
+        return _sse_response(
+            stream_chat_with_task_context(request.message, tasks),
+            lambda reply: ChatResponse(reply=reply).model_dump_json()
+        )
+
+    reply = await chat_with_task_context(request.message, tasks)
     return ChatResponse(reply=reply)
 
 
+async def _daily_plan_result(read: Callable, user_id: int) -> dict:
+    # Fetch only the columns the prompt needs
+    tasks = await read(load_prompt_candidates, user_id, pending_only=True)
+    return {"plan": await generate_daily_plan(tasks, cache_scope=user_id)}
+
+
 @app.get("/ai/daily-plan")
-def get_daily_plan(
-    current_user: UserDB = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_daily_plan(
+    request: Request,
+    response: Response,
+    stream: bool = Query(default=False),
+    job: bool = Query(default=False),
+    user_id: int = Depends(get_active_user_id),
+    db: DBHandle = Depends(get_db_handle)
 ):
     """
     Generate a daily planning summary combining summary + priorities.
     
     This is READ-ONLY assistance for user planning.
+    Pass ?stream=true to receive the plan as Server-Sent Events, or
+    ?job=true to get a background job id instead of waiting.
     """
-    # Fetch user's tasks
-    tasks = db.query(TaskDB).filter(TaskDB.user_id == current_user.id).all()
+    if stream:
+        # Fetch only the columns the prompt needs
+        tasks = await db.read(load_prompt_candidates, user_id, pending_only=True)
+        return _sse_response(
+            stream_daily_plan(tasks, cache_scope=user_id),
+            lambda plan: json.dumps({"plan": plan})
+        )
+
+    version = await db.run(change_version, user_id)
+    if job:
+        return await _submit_ai_job("daily_plan", user_id, version)
+
+    etag = make_etag(request, user_id, version, daily=True, weak=True)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    # Plans precomputed overnight (or by an earlier job) are reused
+    precomputed = await get_job_queue().precomputed(_ai_job_hash("daily_plan", user_id, version))
+    body = precomputed.result if precomputed else await _daily_plan_result(db.read, user_id)
     
-    # Convert to dict format
-    task_dicts = [
-        {
-            "title": task.title,
-            "status": task.status,
-            "due_date": task.due_date.isoformat() if task.due_date else None,
-            "description": task.description
-        }
-        for task in tasks
+    response.headers.update(cache_headers(etag))
+    return body
+
+
+@app.get("/ai/providers", dependencies=[Depends(require_metrics_access)], include_in_schema=False)
+async def get_ai_providers():
+    """
+    Health of the LLM providers: circuit breaker state, request counts
+    and recent latency percentiles per provider. Operator data, guarded
+    like /metrics.
+    """
+    return provider_stats()
+
+
+@app.get("/ai/coalescing", dependencies=[Depends(require_metrics_access)], include_in_schema=False)
+async def get_ai_coalescing():
+    """
+    LLM calls made (`calls`), sent upstream (`executions`) and served by
+    joining an identical call already in flight (`coalesced`). Guarded
+    like /metrics.
+    """
+    return coalescing_stats()
+
+
+# ============================================
+# BACKGROUND AI JOBS
+# ============================================
+
+def _ai_job_hash(kind: str, user_id: int, version: int) -> str:
+    # Same task data on the same (UTC) day: same answer, as for the ETags
+    return job_input_hash(kind, user_id, version, utc_today().isoformat())
+
+
+def _job_response(job: AIJob) -> AIJobResponse:
+    return AIJobResponse(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        result=job.result,
+        error=job.error,
+        created_at=datetime.fromtimestamp(job.created_at, timezone.utc),
+        finished_at=datetime.fromtimestamp(job.finished_at, timezone.utc) if job.finished_at else None
+    )
+
+
+async def _submit_ai_job(kind: str, user_id: int, version: int) -> JSONResponse:
+    job = await get_job_queue().submit(kind, user_id, _ai_job_hash(kind, user_id, version))
+    return JSONResponse(
+        status_code=200 if job.finished else 202,
+        content=jsonable_encoder(_job_response(job)),
+        headers={"Location": f"/ai/jobs/{job.id}"}
+    )
+
+
+def register_ai_jobs(queue: JobQueue):
+    queue.register("task_summary", lambda user_id: _task_summary_result(run_in_session, user_id))
+    queue.register("daily_plan", lambda user_id: _daily_plan_result(run_in_session, user_id))
+
+
+register_ai_jobs(get_job_queue())
+
+
+@app.get("/ai/jobs/{job_id}", response_model=AIJobResponse)
+async def get_ai_job(
+    job_id: str,
+    wait: float = Query(default=0, ge=0, le=30),
+    user_id: int = Depends(get_active_user_id)
+):
+    """
+    Status and, once done, result of a background AI job.
+    Pass `wait` (seconds) to hold the request until the job finishes.
+    Completion is also announced as a "job.finished" event on /ws/tasks.
+    """
+    queue = get_job_queue()
+    found = await (queue.wait(job_id, wait) if wait else queue.store.get(job_id))
+    if found is None or found.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(found)
+
+
+def _active_users(db: Session, since: datetime) -> list:
+    """(user id, change version) of users with pending tasks touched since `since`."""
+    recently_active = (
+        select(TaskDB.id)
+        .where(
+            TaskDB.user_id == UserDB.id,
+            TaskDB.status == TaskStatus.pending.value,
+            TaskDB.updated_at >= since
+        )
+        .exists()
+    )
+    return db.execute(select(UserDB.id, UserDB.task_change_seq).where(recently_active)).all()
+
+
+async def precompute_daily_plans() -> list[AIJob]:
+    """Queue the day's daily plans for recently active users."""
+    since = datetime.now(timezone.utc) - timedelta(days=AI_PRECOMPUTE_ACTIVE_DAYS)
+    users = await run_in_session(_active_users, since)
+    queue = get_job_queue()
+    jobs = [
+        await queue.submit("daily_plan", user_id, _ai_job_hash("daily_plan", user_id, version))
+        for user_id, version in users
     ]
-    
-    # Generate daily plan
-    plan = generate_daily_plan(task_dicts)
-    
-    return {"plan": plan}
+    logger.info("Queued daily plan precomputation for %d active users", len(jobs))
+    return jobs
+
+
+async def prune_task_tombstones() -> int:
+    """Drop deletion tombstones past the sync retention window."""
+    return await run_in_session(prune_expired_tombstones)
 
 
 # ---------------- TASKS ---------------- #
+# Handlers are async; the ORM work lives in plain functions taking the
+# Session, run through the request's DBHandle (thread pool or AsyncSession).
+# Writes publish a task event for /ws/tasks once committed.
+
+async def _publish_task(user_id: int, event_type: str, task):
+    await publish_task_event(
+        user_id, event_type,
+        task=TaskResponse.model_validate(task).model_dump(mode="json"),
+        change_seq=task.change_seq
+    )
 
-@app.post("/tasks/", response_model=TaskResponse)
-def create_task(
-    task: TaskCreate,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
-):
+
+def _create_task(db: Session, task: TaskCreate, user_id: int):
     try:
         now = datetime.now(timezone.utc)
 
-        db_task = TaskDB(
-            title=task.title,
-            description=task.description,
-            due_date=task.due_date,
-            status=TaskStatus.pending.value,
-            created_at=now,
-            updated_at=now,
-            user_id=current_user.id
-        )
+        db_task = insert_task_row(db, {
+            "title": task.title,
+            "description": task.description,
+            "due_date": task.due_date,
+            "status": TaskStatus.pending.value,
+            "created_at": now,
+            "updated_at": now,
+            "user_id": user_id
+        })
 
-        db.add(db_task)
+        record_change(db, user_id, total=1)
         db.commit()
-        db.refresh(db_task)
         return db_task
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to create task: {str(e)}")
 
 
-@app.get("/tasks", response_model=list[TaskResponse])
-def read_tasks(
-    overdue: Optional[bool] = Query(default=None),
-    today: Optional[bool] = Query(default=None),
-    upcoming: Optional[int] = Query(default=None),
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
-):
-    # ✅ FIX: DO NOT FILTER STATUS HERE
-    query = db.query(TaskDB).filter(
-        TaskDB.user_id == current_user.id
+def _completed_delta(previous_status: Optional[str], task) -> int:
+    return (
+        int(task.status == TaskStatus.completed.value)
+        - int(previous_status == TaskStatus.completed.value)
     )
 
-    today_date = datetime.now(timezone.utc).date()
+
+@app.post("/tasks/", response_model=TaskResponse)
+async def create_task(
+    task: TaskCreate,
+    db: DBHandle = Depends(get_db_handle),
+    user_id: int = Depends(get_active_user_id)
+):
+    db_task = await db.run(_create_task, task, user_id)
+    await _publish_task(user_id, "task.created", db_task)
+    return db_task
+
+
+def _date_filters(overdue: Optional[bool], today: Optional[bool], upcoming: Optional[int]) -> list:
+    """WHERE clauses for the overdue / today / upcoming (days) task filters."""
+    clauses = []
+
+    today_date = utc_today()
     start_of_today = datetime.combine(today_date, datetime.min.time()).replace(tzinfo=timezone.utc)
     end_of_today = datetime.combine(today_date, datetime.max.time()).replace(tzinfo=timezone.utc)
 
     if overdue:
-        query = query.filter(
+        clauses += [
             TaskDB.due_date.isnot(None),
             TaskDB.due_date < start_of_today
-        )
+        ]
 
     if today:
-        query = query.filter(
+        clauses += [
             TaskDB.due_date.isnot(None),
             TaskDB.due_date >= start_of_today,
             TaskDB.due_date <= end_of_today
-        )
+        ]
 
     if upcoming is not None:
         end_date = datetime.combine(
@@ -269,158 +560,439 @@ def read_tasks(
             datetime.max.time()
         ).replace(tzinfo=timezone.utc)
 
-        query = query.filter(
+        clauses += [
             TaskDB.due_date.isnot(None),
             TaskDB.due_date > start_of_today,
             TaskDB.due_date <= end_date
-        )
+        ]
+
+    return clauses
+
+
+def _list_tasks(
+    db: Session,
+    user_id: int,
+    overdue: Optional[bool],
+    today: Optional[bool],
+    upcoming: Optional[int],
+    limit: Optional[int],
+    cursor: Optional[str],
+    sort: str,
+    order: str,
+    fields: list[str]
+):
+    """
+    Return (rows, next_cursor); next_cursor is None on the last page.
+    Rows are column tuples starting with the `fields` columns.
+    """
+    # Always select the keyset columns so the next cursor can be built
+    selected = dict.fromkeys(list(fields) + ["id", sort])
+    query = db.query(*[getattr(TaskDB, f) for f in selected])
+
+    # ✅ FIX: DO NOT FILTER STATUS HERE
+    query = query.filter(
+        TaskDB.user_id == user_id
+    )
 
-    return query.all()
+    query = query.filter(*_date_filters(overdue, today, upcoming))
 
+    query = apply_keyset(query, sort, order, cursor)
 
-# ✅ FIX: GENERIC UPDATE MUST BE PATCH
-@app.patch("/tasks/{task_id}", response_model=TaskResponse)
-def update_task(
-    task_id: int,
-    task_update: TaskUpdate,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    if limit is None:
+        return query.all(), None
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort, order, getattr(last, sort), last.id)
+
+
+@app.get("/tasks", response_model=list[TaskResponse])
+async def read_tasks(
+    request: Request,
+    overdue: Optional[bool] = Query(default=None),
+    today: Optional[bool] = Query(default=None),
+    upcoming: Optional[int] = Query(default=None),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None),
+    sort: Literal["id", "due_date", "updated_at"] = Query(default="id"),
+    order: Literal["asc", "desc"] = Query(default="asc"),
+    fields: Optional[str] = Query(default=None),
+    db: DBHandle = Depends(get_db_handle),
+    user_id: int = Depends(get_active_user_id)
 ):
-    task = db.query(TaskDB).filter(
-        TaskDB.id == task_id,
-        TaskDB.user_id == current_user.id
-    ).first()
+    """
+    List tasks, optionally one page at a time.
+
+    Pass `limit` to paginate; the `X-Next-Cursor` response header holds the
+    `cursor` for the following page. `fields` (comma-separated) limits the
+    returned columns, e.g. `fields=id,title,status,due_date`.
+    Responses carry an ETag; send it back as `If-None-Match` to get a 304
+    while the tasks are unchanged.
+    """
+    projection = TASK_FIELDS
+    if fields:
+        projection = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        if not projection:
+            raise HTTPException(status_code=400, detail="No fields given")
+        unknown = set(projection) - set(TaskResponse.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    # Date filters make the result depend on the day as well as the data
+    date_relative = bool(overdue or today or upcoming is not None)
+    etag = make_etag(request, user_id, await db.run(change_version, user_id), daily=date_relative)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    rows, next_cursor = await db.run(
+        _list_tasks, user_id, overdue, today, upcoming, limit, cursor, sort, order, projection
+    )
+
+    headers = cache_headers(etag)
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+
+    # Trusted column rows, encoded without another round of validation
+    return task_list_response(rows, projection, headers)
+
+
+def _task_changes(db: Session, user_id: int, since: Optional[str], limit: int) -> TaskChangesResponse:
+    upserts, deleted, cursor, has_more = load_changes(db, user_id, since, limit)
+    return TaskChangesResponse(upserts=upserts, deleted=deleted, cursor=cursor, has_more=has_more)
+
+
+@app.get("/tasks/changes", response_model=TaskChangesResponse)
+async def task_changes(
+    since: Optional[str] = Query(default=None),
+    limit: int = Query(default=MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: DBHandle = Depends(get_db_handle),
+    user_id: int = Depends(get_active_user_id)
+):
+    """
+    Tasks created, updated or deleted since a sync cursor.
+
+    Omit `since` for a full initial sync, then pass the returned `cursor`;
+    keep calling while `has_more` is true. Ordering follows a per-user
+    change sequence, not timestamps. A 410 means the cursor predates the
+    deletes still on record: start over without `since`.
+    """
+    return await db.run(_task_changes, user_id, since, limit)
+
+
+def _search_tasks(db: Session, user_id: int, q: str, overdue, today, upcoming, limit: int, cursor: Optional[str]):
+    return search_tasks(db, user_id, q, _date_filters(overdue, today, upcoming), limit, cursor)
 
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
 
+@app.get("/tasks/search", response_model=list[TaskSearchResult])
+async def search_tasks_endpoint(
+    request: Request,
+    response: Response,
+    q: str = Query(min_length=1, max_length=200),
+    overdue: Optional[bool] = Query(default=None),
+    today: Optional[bool] = Query(default=None),
+    upcoming: Optional[int] = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None),
+    db: DBHandle = Depends(get_db_handle),
+    user_id: int = Depends(get_active_user_id)
+):
+    """
+    Full-text search over task titles and descriptions, best match first.
+
+    Every word must match, as a prefix. Combines with the `overdue`,
+    `today` and `upcoming` filters of GET /tasks. The `X-Next-Cursor`
+    response header holds the `cursor` for the following page.
+    """
+    date_relative = bool(overdue or today or upcoming is not None)
+    etag = make_etag(request, user_id, await db.run(change_version, user_id), daily=date_relative)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    rows, next_cursor = await db.run(_search_tasks, user_id, q, overdue, today, upcoming, limit, cursor)
+
+    response.headers.update(cache_headers(etag))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+def _update_task(db: Session, task_id: int, task_update: TaskUpdate, user_id: int):
     # Use model_dump for Pydantic v2, fallback to dict for v1
     try:
         update_data = task_update.model_dump(exclude_unset=True)
     except AttributeError:
         update_data = task_update.dict(exclude_unset=True)
 
-    for field, value in update_data.items():
-        setattr(task, field, value)
+    values = {**update_data, "updated_at": datetime.now(timezone.utc)}
+
+    # The previous status is only needed to keep the counters right
+    track_status = "status" in update_data and counters_enabled()
+    if track_status:
+        task, previous_status = update_task_row_with_status(db, task_id, user_id, values)
+    else:
+        task = update_task_row(db, task_id, user_id, values)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
 
-    task.updated_at = datetime.now(timezone.utc)
+    if track_status:
+        record_change(db, user_id, completed=_completed_delta(previous_status, task))
 
     db.commit()
-    db.refresh(task)
     return task
 
 
-@app.delete("/tasks/{task_id}")
-def delete_task(
+# ✅ FIX: GENERIC UPDATE MUST BE PATCH
+@app.patch("/tasks/{task_id}", response_model=TaskResponse)
+async def update_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    task_update: TaskUpdate,
+    db: DBHandle = Depends(get_db_handle),
+    user_id: int = Depends(get_active_user_id)
 ):
-    task = db.query(TaskDB).filter(
-        TaskDB.id == task_id,
-        TaskDB.user_id == current_user.id
-    ).first()
+    task = await db.run(_update_task, task_id, task_update, user_id)
+    await _publish_task(user_id, "task.updated", task)
+    return task
+
 
-    if not task:
+def _delete_task(db: Session, task_id: int, user_id: int):
+    status = delete_task_row(db, task_id, user_id)
+    if status is None:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    db.delete(task)
+    record_change(
+        db, user_id,
+        total=-1, completed=-int(status == TaskStatus.completed.value)
+    )
     db.commit()
-    return {"message": "Task deleted successfully"}
 
 
-@app.patch("/tasks/{task_id}/complete", response_model=TaskResponse)
-def complete_task(
+@app.delete("/tasks/{task_id}")
+async def delete_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    db: DBHandle = Depends(get_db_handle),
+    user_id: int = Depends(get_active_user_id)
 ):
-    task = db.query(TaskDB).filter(
-        TaskDB.id == task_id,
-        TaskDB.user_id == current_user.id
-    ).first()
+    await db.run(_delete_task, task_id, user_id)
+    await publish_task_event(user_id, "task.deleted", task_id=task_id)
+    return {"message": "Task deleted successfully"}
+
 
-    if not task:
+def _set_task_status(db: Session, task_id: int, user_id: int, status: TaskStatus):
+    values = {"status": status.value, "updated_at": datetime.now(timezone.utc)}
+
+    track_status = counters_enabled()
+    if track_status:
+        task, previous_status = update_task_row_with_status(db, task_id, user_id, values)
+    else:
+        task = update_task_row(db, task_id, user_id, values)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    task.status = TaskStatus.completed.value
-    task.updated_at = datetime.now(timezone.utc)
+    if track_status:
+        record_change(db, user_id, completed=_completed_delta(previous_status, task))
 
     db.commit()
-    db.refresh(task)
+    return task
+
+
+@app.patch("/tasks/{task_id}/complete", response_model=TaskResponse)
+async def complete_task(
+    task_id: int,
+    db: DBHandle = Depends(get_db_handle),
+    user_id: int = Depends(get_active_user_id)
+):
+    task = await db.run(_set_task_status, task_id, user_id, TaskStatus.completed)
+    await _publish_task(user_id, "task.completed", task)
     return task
 
 
 @app.patch("/tasks/{task_id}/reopen", response_model=TaskResponse)
-def reopen_task(
+async def reopen_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    db: DBHandle = Depends(get_db_handle),
+    user_id: int = Depends(get_active_user_id)
 ):
-    task = db.query(TaskDB).filter(
-        TaskDB.id == task_id,
-        TaskDB.user_id == current_user.id
-    ).first()
+    task = await db.run(_set_task_status, task_id, user_id, TaskStatus.pending)
+    await _publish_task(user_id, "task.reopened", task)
+    return task
 
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
 
-    task.status = TaskStatus.pending.value
-    task.updated_at = datetime.now(timezone.utc)
 
-    db.commit()
-    db.refresh(task)
-    return task
+def _bulk_tasks(db: Session, request: BulkTaskRequest, user_id: int) -> BulkTaskResponse:
+    try:
+        return apply_bulk(db, user_id, request.operations, request.mode)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Bulk operation failed: {str(e)}")
+
+
+@app.post("/tasks/bulk", response_model=BulkTaskResponse)
+async def bulk_tasks(
+    request: BulkTaskRequest,
+    db: DBHandle = Depends(get_db_handle),
+    user_id: int = Depends(get_active_user_id)
+):
+    """
+    Create, complete, reopen or delete many tasks in one transaction.
+
+    Results are reported per operation, in request order. In `atomic` mode
+    (default) one failed operation means nothing is committed; in
+    `best_effort` mode the failed operations are skipped. Malformed
+    operations fail on their own with the validation error.
+    """
+    result = await db.run(_bulk_tasks, request, user_id)
+    if result.committed and result.succeeded:
+        # One event per batch; clients fetch the details from /tasks/changes
+        changed = {}
+        for item in result.results:
+            if item.ok:
+                changed.setdefault(item.op, []).append(item.id)
+        await publish_task_event(user_id, "tasks.bulk", changed=changed)
+    return result
+
+
+# ---------------- REAL-TIME EVENTS ---------------- #
+
+@app.websocket("/ws/tasks")
+async def task_events_socket(websocket: WebSocket, token: Optional[str] = Query(default=None)):
+    """
+    Push the user's task events (task.created, task.updated, task.completed,
+    task.reopened, task.deleted, tasks.bulk, resync) as JSON messages.
+
+    Browsers cannot set headers on WebSockets, so the JWT may be passed as
+    `?token=`; an `Authorization: Bearer` header works as well. The socket
+    is closed with 1008 once the token expires or its user is gone.
+    """
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    try:
+        user_id = (await get_current_user(token or "")).id
+        expires_at = token_expiry(token)
+    except HTTPException:
+        await websocket.close(code=WS_1008_POLICY_VIOLATION)
+        return
+
+    # Subscribe before accepting, so no event after the handshake is missed
+    async with get_broker().subscribe(user_id) as events:
+        await websocket.accept()
+
+        async def forward():
+            async for event in events:
+                # Same check as a request: cached, and dropped on user writes
+                try:
+                    await get_current_user(token)
+                except HTTPException:
+                    return
+                await websocket.send_json(event)
+
+        async def until_disconnect():
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+        disconnect = asyncio.create_task(until_disconnect())
+        pumps = [asyncio.create_task(forward()), disconnect]
+        if expires_at is not None:
+            pumps.append(asyncio.create_task(asyncio.sleep(max(0.0, expires_at - time.time()))))
+        try:
+            done, _ = await asyncio.wait(pumps, return_when=asyncio.FIRST_COMPLETED)
+            if disconnect not in done:
+                await websocket.close(code=WS_1008_POLICY_VIOLATION)
+        finally:
+            for pump in pumps:
+                pump.cancel()
 
 
 # ---------------- AUTH ---------------- #
 
+HASHING_BUSY = HTTPException(
+    status_code=429,
+    detail="Too many sign-in requests in progress, please retry shortly",
+    headers={"Retry-After": "1"}
+)
+
+
+def _save_user(db: Session, user: UserCreate, password_hash: str) -> UserDB:
+    db_user = UserDB(
+        username=user.username,
+        email=user.email,
+        password_hash=password_hash,
+        created_at=datetime.now(timezone.utc)
+    )
+
+    try:
+        db.add(db_user)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(db_user)
+    return db_user
+
+
 @app.post("/register", response_model=UserResponse)
-def register_user(
+async def register_user(
     user: UserCreate,
-    db: Session = Depends(get_db)
+    db: DBHandle = Depends(get_db_handle)
 ):
     try:
-        password_hash = hash_password(user.password)
+        # bcrypt runs on the hashing pool, the DB write through the DBHandle
+        password_hash = await hash_password_async(user.password)
+        return await db.run(_save_user, user, password_hash)
 
-        db_user = UserDB(
-            username=user.username,
-            email=user.email,
-            password_hash=password_hash,
-            created_at=datetime.now(timezone.utc)
-        )
-
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
-        return db_user
+    except PasswordHashingBusy:
+        raise HASHING_BUSY
 
     except ValueError as ve:
-        db.rollback()
         raise HTTPException(status_code=400, detail=str(ve))
 
     except IntegrityError as ie:
-        db.rollback()
         raise HTTPException(status_code=400, detail="Username or email already exists")
     
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
 
+def _find_user(db: Session, username: str) -> Optional[UserDB]:
+    return db.query(UserDB).filter(
+        UserDB.username == username
+    ).first()
+
+
+def _store_password_hash(db: Session, db_user: UserDB, password_hash: str):
+    db.add(db_user)
+    db_user.password_hash = password_hash
+    db.commit()
+
+
 @app.post("/login", response_model=TokenResponse)
-def login_user(
+async def login_user(
     credentials: UserLogin,
-    db: Session = Depends(get_db)
+    db: DBHandle = Depends(get_db_handle)
 ):
-    db_user = db.query(UserDB).filter(
-        UserDB.username == credentials.username
-    ).first()
+    # Don't hold a connection while bcrypt runs
+    db_user = await db.read(_find_user, credentials.username)
 
-    if not db_user or not verify_password(credentials.password, db_user.password_hash):
+    if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    access_token = create_access_token(data={"sub": str(db_user.id)})
+    try:
+        valid, new_hash = await verify_and_update_password_async(credentials.password, db_user.password_hash)
+    except PasswordHashingBusy:
+        raise HASHING_BUSY
+
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    user_id = db_user.id
+
+    # Stored hash used outdated bcrypt parameters: upgrade it transparently
+    if new_hash:
+        await db.run(_store_password_hash, db_user, new_hash)
+
+    access_token = create_access_token(data={"sub": str(user_id)})
 
     return {
         "access_token": access_token,
@@ -431,28 +1003,27 @@ def login_user(
 # ---------------- STATS ---------------- #
 
 @app.get("/tasks/progress")
-def task_progress(
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+async def task_progress(
+    request: Request,
+    response: Response,
+    db: DBHandle = Depends(get_db_handle),
+    user_id: int = Depends(get_active_user_id)
 ):
-    total_tasks = db.query(TaskDB).filter(
-        TaskDB.user_id == current_user.id
-    ).count()
+    etag = make_etag(request, user_id, await db.run(change_version, user_id))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
 
-    completed_tasks = db.query(TaskDB).filter(
-        TaskDB.user_id == current_user.id,
-        TaskDB.status == TaskStatus.completed.value
-    ).count()
+    total_tasks, completed_tasks = await db.run(get_counts, user_id)
 
     pending = total_tasks - completed_tasks
     completion_percentage = int(
         (completed_tasks / total_tasks) * 100
     ) if total_tasks > 0 else 0
 
+    response.headers.update(cache_headers(etag))
     return {
         "total_tasks": total_tasks,
         "completed_tasks": completed_tasks,
         "pending": pending,
         "completion_percentage": completion_percentage
     }
-
@@ -0,0 +1,349 @@
+"""
+Prometheus Metrics.
+A small in-process registry rendered in the Prometheus text format at
+/metrics, without extra dependencies:
+
+- HTTP: request count, latency histogram and DB work per route template
+  (pure ASGI middleware, so streaming responses are timed to their end),
+  plus requests in flight.
+- Database: query count and duration per statement type, from engine
+  events, and connection pool usage.
+- LLM: provider attempts, latency and tokens per provider, and which
+  path answered each call (primary provider, fallback, cache, none).
+- Saturation: the thread pool running sync handlers and DB work, and
+  the password hashing pool.
+
+Updates are a lock plus a few additions, so it is cheap enough to leave
+on; gauges of pools are read only when /metrics is scraped.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+# Requests that matched no route share one label, so scanners can't blow
+# up the number of series
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Optional[list] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).append(self)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        """(suffix, labels, value) triples."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines += [f"{self.name}{suffix}{labels} {_number(value)}" for suffix, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Optional[list] = None):
+        super().__init__(name, documentation, labelnames, registry)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [("", _labels(self.labelnames, key), value) for key, value in items]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labelvalues: str, amount: float = 1):
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, value: float, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        registry: Optional[list] = None
+    ):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(buckets)
+        # labelvalues -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def count(self, *labelvalues: str) -> int:
+        state = self._values.get(labelvalues)
+        return sum(state[0]) if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        samples = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(float(bound))}"'
+                samples.append(("_bucket", _labels(self.labelnames, key, le), cumulative))
+            samples.append(("_sum", _labels(self.labelnames, key), total))
+            samples.append(("_count", _labels(self.labelnames, key), cumulative))
+        return samples
+
+
+class CallbackMetric(Metric):
+    """Values read at scrape time: fn() -> iterable of (labelvalues, value)."""
+
+    def __init__(self, name: str, documentation: str, type: str, labelnames: Sequence[str], fn: Callable):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self.fn = fn
+
+    def samples(self):
+        try:
+            values = list(self.fn())
+        except Exception as e:
+            logger.warning("Metric %s unavailable: %s", self.name, e)
+            return []
+        return [("", _labels(self.labelnames, key), value) for key, value in values]
+
+
+REGISTRY: List[Metric] = []
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+def callback(name: str, documentation: str, type: str = "gauge", labelnames: Sequence[str] = ()):
+    """Decorator registering fn as a CallbackMetric."""
+    def register(fn: Callable) -> Callable:
+        CallbackMetric(name, documentation, type, labelnames, fn)
+        return fn
+    return register
+
+
+# ============================================
+# HTTP
+# ============================================
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency, until the last body byte.", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled.")
+HTTP_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries run per HTTP request.", ("method", "route"), COUNT_BUCKETS
+)
+HTTP_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in database queries per HTTP request.", ("method", "route"), QUERY_BUCKETS
+)
+
+# [queries, seconds] of the request being handled; a mutable list, so DB
+# work on pool threads (which run in a copy of the context) adds to it
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        db_work = [0, 0.0]
+        token = _request_db.set(db_work)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            _request_db.reset(token)
+
+            # The router records the matched route in the (shared) scope
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", UNMATCHED_ROUTE))
+            HTTP_REQUESTS.inc(*labels, str(status))
+            HTTP_LATENCY.observe(elapsed, *labels)
+            HTTP_DB_QUERIES.observe(db_work[0], *labels)
+            HTTP_DB_SECONDS.observe(db_work[1], *labels)
+
+
+# ============================================
+# DATABASE
+# ============================================
+
+DB_QUERIES = Counter("db_queries_total", "Database statements executed.", ("operation",))
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "Database statement latency.", ("operation",), QUERY_BUCKETS)
+DB_ERRORS = Counter("db_query_errors_total", "Database statements that raised.", ("operation",))
+
+_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "WITH")
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip()[:8].split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in _OPERATIONS else "OTHER"
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+    operation = _operation(statement)
+    DB_QUERIES.inc(operation)
+    DB_QUERY_LATENCY.observe(elapsed, operation)
+    db_work = _request_db.get()
+    if db_work is not None:
+        db_work[0] += 1
+        db_work[1] += elapsed
+
+
+def _on_error(exception_context):
+    if exception_context.connection is not None:
+        started = exception_context.connection.info.get("metrics_started")
+        if started:
+            started.pop()
+    DB_ERRORS.inc(_operation(exception_context.statement or ""))
+
+
+def instrument_engine(engine):
+    """Time every statement on this (sync) Engine; pool usage is read at scrape time."""
+    from sqlalchemy import event
+
+    if getattr(engine, "_metrics_instrumented", False):
+        return
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    event.listen(engine, "handle_error", _on_error)
+    engine._metrics_instrumented = True
+    _ENGINES.append(engine)
+
+
+_ENGINES: list = []
+
+
+@callback("db_pool_connections", "Connections of the database pool, by state.", labelnames=("engine", "state"))
+def _pool_connections():
+    for index, engine in enumerate(_ENGINES):
+        pool = engine.pool
+        # Single-connection pools (in-memory SQLite) have no counters
+        if hasattr(pool, "checkedout"):
+            yield (str(index), "checked_out"), pool.checkedout()
+            yield (str(index), "idle"), pool.checkedin()
+            yield (str(index), "overflow"), max(0, pool.overflow())
+
+
+# ============================================
+# LLM
+# ============================================
+
+LLM_ATTEMPTS = Counter(
+    "llm_provider_requests_total",
+    "Requests sent to (or skipped for) an LLM provider, by outcome: success, error, timeout or rejected (breaker open).",
+    ("provider", "outcome")
+)
+LLM_LATENCY = Histogram("llm_provider_latency_seconds", "Latency of successful LLM provider requests (first chunk when streaming).", ("provider",), LLM_BUCKETS)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM tokens by provider and kind (prompt/completion); estimated when the provider reports no usage.",
+    ("provider", "kind")
+)
+LLM_CALLS = Counter(
+    "llm_calls_total",
+    "LLM calls by the path that answered: primary, fallback, cache or none (basic-mode reply).",
+    ("path",)
+)
+
+
+# ============================================
+# SATURATION
+# ============================================
+
+@callback("threadpool_threads", "Worker threads of the request thread pool, by state.", labelnames=("state",))
+def _thread_pool():
+    # Only meaningful on the event loop thread, which is where /metrics runs
+    from anyio import to_thread
+
+    limiter = to_thread.current_default_thread_limiter()
+    yield ("limit",), limiter.total_tokens
+    yield ("busy",), limiter.borrowed_tokens
+    yield ("waiting",), limiter.statistics().tasks_waiting
+
+
+@callback("password_hash_jobs", "Password hashing pool jobs (queued + running) and the limit before 429.", labelnames=("state",))
+def _hash_pool():
+    from security import hash_pool_pending, PASSWORD_HASH_MAX_PENDING
+
+    yield ("pending",), hash_pool_pending()
+    yield ("limit",), PASSWORD_HASH_MAX_PENDING
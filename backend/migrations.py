@@ -0,0 +1,142 @@
+"""
+Schema Migrations.
+Ordered, versioned schema changes applied at startup (or by running this
+module directly). The applied version is stored in the `schema_version`
+table, so each migration runs once per database.
+
+A brand-new database is created from the current models and stamped with
+the latest version; an existing database only runs the missing steps.
+Add new steps with the @migration decorator, using the next version number.
+"""
+import logging
+from typing import Callable, List, Tuple
+from sqlalchemy import MetaData, Table, Column, Integer, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from database import Base, engine as default_engine
+import models  # noqa: F401  (registers the tables on Base.metadata)
+from models import TaskDB, TaskCounterDB, TaskTombstoneDB, SQLITE_SEARCH_DDL, POSTGRES_SEARCH_DDL
+
+logger = logging.getLogger(__name__)
+
+# Kept off Base.metadata so drop_all/create_all never touch it
+_version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, nullable=False)
+)
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = []
+
+
+def migration(version: int, description: str):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def head_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str):
+    # Databases made by create_all without a version row may already have it
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _create_indexes(conn: Connection, table, *names: str):
+    # Only the named ones: other indexes may cover columns a later migration adds
+    for index in table.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+# ============================================
+# MIGRATIONS
+# ============================================
+
+@migration(1, "composite indexes on tasks")
+def _add_task_indexes(conn: Connection):
+    _create_indexes(
+        conn, TaskDB.__table__,
+        "ix_tasks_user_due_date", "ix_tasks_user_status", "ix_tasks_user_updated_at"
+    )
+
+
+@migration(2, "per-user task counters table")
+def _add_task_counters(conn: Connection):
+    # Rows are built lazily per user (or by `python task_counters.py --fix`)
+    TaskCounterDB.__table__.create(conn, checkfirst=True)
+
+
+@migration(3, "per-user change sequence and deletion log")
+def _add_change_tracking(conn: Connection):
+    # Existing tasks keep sequence 0, which a first sync (no cursor) includes
+    _add_column(conn, "users", "task_change_seq", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "tasks", "change_seq", "INTEGER NOT NULL DEFAULT 0")
+    _create_indexes(conn, TaskDB.__table__, "ix_tasks_user_change_seq")
+    TaskTombstoneDB.__table__.create(conn, checkfirst=True)
+
+
+@migration(4, "full-text search index on task titles and descriptions")
+def _add_task_search(conn: Connection):
+    if conn.dialect.name == "sqlite":
+        for statement in SQLITE_SEARCH_DDL:
+            conn.execute(text(statement))
+        # Index the tasks that already exist
+        conn.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+    elif conn.dialect.name == "postgresql":
+        for statement in POSTGRES_SEARCH_DDL:
+            conn.execute(text(statement))
+
+
+@migration(5, "per-user tombstone pruning horizon")
+def _add_tombstone_horizon(conn: Connection):
+    _add_column(conn, "users", "task_tombstone_horizon", "INTEGER NOT NULL DEFAULT 0")
+
+
+# ============================================
+# RUNNER
+# ============================================
+
+def _get_version(conn: Connection):
+    return conn.execute(select(schema_version.c.version)).scalar()
+
+
+def _set_version(conn: Connection, version: int):
+    conn.execute(schema_version.delete())
+    conn.execute(schema_version.insert().values(version=version))
+
+
+def upgrade(bind: Engine = default_engine) -> int:
+    """Bring the database schema up to date and return the new version."""
+    with bind.begin() as conn:
+        _version_metadata.create_all(conn)
+        current = _get_version(conn)
+
+        if current is None:
+            if not inspect(conn).has_table(TaskDB.__tablename__):
+                # Fresh database: the models already describe the latest schema
+                Base.metadata.create_all(conn)
+                _set_version(conn, head_version())
+                return head_version()
+            # Database created by create_all before migrations existed
+            current = 0
+
+        for version, description, apply in MIGRATIONS:
+            if version > current:
+                logger.info("Applying migration %d: %s", version, description)
+                apply(conn)
+                _set_version(conn, version)
+                current = version
+
+    return current
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(f"Schema at version {upgrade()}")
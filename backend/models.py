@@ -2,7 +2,7 @@
 SQLAlchemy Database Models.
 Defines the logical structure and relationships for Users and Tasks.
 """
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, DDL, event
 from datetime import datetime, timezone
 from database import Base
 from enum import Enum
@@ -24,9 +24,21 @@ class UserDB(Base):
         default=lambda: datetime.now(timezone.utc),
         nullable=False
     )
+    # Last change sequence number handed out for this user's tasks
+    task_change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+    # Tombstones below this change sequence may have been pruned
+    task_tombstone_horizon = Column(Integer, nullable=False, default=0, server_default="0")
 
 class TaskDB(Base):
     __tablename__ = "tasks"
+    # Every query is scoped to one user; the second column serves the
+    # date filters/sorts, status counts and updated_at ordering respectively.
+    __table_args__ = (
+        Index("ix_tasks_user_due_date", "user_id", "due_date"),
+        Index("ix_tasks_user_status", "user_id", "status"),
+        Index("ix_tasks_user_updated_at", "user_id", "updated_at"),
+        Index("ix_tasks_user_change_seq", "user_id", "change_seq", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -46,3 +58,80 @@ class TaskDB(Base):
     )
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Per-user sequence number of the last write to this task (see task_changes.py)
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+
+class TaskCounterDB(Base):
+    """
+    Per-user task totals maintained alongside task writes, so progress
+    reads do not have to count the tasks table. See task_counters.py.
+    """
+    __tablename__ = "task_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+
+class TaskTombstoneDB(Base):
+    """
+    Deletion log: one row per deleted task, so incremental sync clients
+    learn about deletes. See task_changes.py.
+    """
+    __tablename__ = "task_tombstones"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    change_seq = Column(Integer, primary_key=True)
+    task_id = Column(Integer, primary_key=True)
+    deleted_at = Column(DateTime, nullable=False)
+
+
+# ============================================
+# FULL-TEXT SEARCH INDEX (see task_search.py)
+# ============================================
+# SQLite: an FTS5 index over title/description, fed from a view that adds
+# an owner token ("u<user_id>") so a search only walks that user's
+# postings. Triggers keep it in sync; status-only updates skip it.
+# PostgreSQL: a generated tsvector column with a GIN index.
+SQLITE_SEARCH_DDL = [
+    """CREATE VIEW IF NOT EXISTS tasks_fts_source AS
+       SELECT id, 'u' || user_id AS owner, title, description FROM tasks""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+       owner, title, description,
+       content='tasks_fts_source', content_rowid='id',
+       tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+       INSERT INTO tasks_fts(rowid, owner, title, description)
+       VALUES (new.id, 'u' || new.user_id, new.title, new.description);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+       INSERT INTO tasks_fts(tasks_fts, rowid, owner, title, description)
+       VALUES ('delete', old.id, 'u' || old.user_id, old.title, old.description);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description, user_id ON tasks BEGIN
+       INSERT INTO tasks_fts(tasks_fts, rowid, owner, title, description)
+       VALUES ('delete', old.id, 'u' || old.user_id, old.title, old.description);
+       INSERT INTO tasks_fts(rowid, owner, title, description)
+       VALUES (new.id, 'u' || new.user_id, new.title, new.description);
+       END""",
+]
+
+SQLITE_SEARCH_DROP = [
+    "DROP TABLE IF EXISTS tasks_fts",
+    "DROP VIEW IF EXISTS tasks_fts_source",
+]
+
+POSTGRES_SEARCH_DDL = [
+    """ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector
+       GENERATED ALWAYS AS (
+           setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+           setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+       ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+]
+
+for _statement in SQLITE_SEARCH_DDL:
+    event.listen(TaskDB.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in SQLITE_SEARCH_DROP:
+    event.listen(TaskDB.__table__, "before_drop", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in POSTGRES_SEARCH_DDL:
+    event.listen(TaskDB.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
@@ -0,0 +1,77 @@
+"""
+Keyset (Cursor) Pagination Helpers.
+Cursors encode the sort key and id of the last row returned, so the next
+page is a range scan that starts after it instead of an OFFSET skip.
+"""
+import json
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import and_, or_
+from fastapi import HTTPException
+
+from models import TaskDB
+
+# Columns tasks can be sorted by; `id` is always the tie-breaker
+SORT_COLUMNS = {
+    "id": TaskDB.id,
+    "due_date": TaskDB.due_date,
+    "updated_at": TaskDB.updated_at,
+}
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(sort: str, order: str, value, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, order, value, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> Tuple[object, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, cursor_order, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if cursor_sort != sort or cursor_order != order:
+            raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+
+        if value is not None and sort != "id":
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_keyset(query, sort: str, order: str, cursor: Optional[str] = None):
+    """
+    Order the query by (sort column, id) and, given a cursor, keep only rows
+    after it. NULL due dates always sort last, whatever the direction.
+    """
+    column = SORT_COLUMNS[sort]
+    descending = order == "desc"
+
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort, order)
+        after_id = TaskDB.id < row_id if descending else TaskDB.id > row_id
+
+        if sort == "id":
+            query = query.filter(after_id)
+        elif value is None:
+            query = query.filter(column.is_(None), after_id)
+        else:
+            after_value = column < value if descending else column > value
+            query = query.filter(or_(
+                after_value,
+                and_(column == value, after_id),
+                column.is_(None)
+            ))
+
+    if sort == "id":
+        return query.order_by(TaskDB.id.desc() if descending else TaskDB.id)
+
+    sort_key = column.desc() if descending else column.asc()
+    return query.order_by(
+        sort_key.nulls_last(),
+        TaskDB.id.desc() if descending else TaskDB.id
+    )
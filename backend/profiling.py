@@ -0,0 +1,314 @@
+"""
+Request Profiling (opt-in, PROFILING_ENABLED).
+Every HTTP request collects timed spans while it runs; the trace is kept
+only if the request was slower than PROFILE_SLOW_MS or an admin flagged
+it with the X-Profile header. Kept traces go into a bounded ring buffer
+read through /admin/profiles.
+
+Span kinds: "auth" (token check and user lookup), "db" (one per SQL
+statement), "bcrypt" (password hashing pool), "upstream" (LLM provider
+HTTP calls) and "serialize" (response model serialization). Spans may
+nest (the auth span contains its DB query); `unaccounted_ms` is the
+request time covered by no span at all, i.e. handler and framework code.
+
+With PROFILE_FLAMEGRAPH, flagged requests also run a sampling profiler
+that snapshots every thread's stack each PROFILE_SAMPLE_INTERVAL_MS and
+returns them as folded stacks (flamegraph.pl / speedscope input). Stacks
+of other requests running at the same time are included too.
+"""
+import itertools
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional
+from config import (
+    PROFILE_SLOW_MS,
+    PROFILE_BUFFER_SIZE,
+    PROFILE_ADMIN_TOKEN,
+    PROFILE_FLAMEGRAPH,
+    PROFILE_SAMPLE_INTERVAL_MS,
+    PROFILE_MAX_SPANS
+)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Frames kept per sampled stack (innermost are dropped past this)
+MAX_STACK_DEPTH = 64
+
+
+class Span(NamedTuple):
+    kind: str
+    detail: str
+    start: float
+    end: float
+
+
+class Trace:
+    def __init__(self, trace_id: int, method: str, path: str, flagged: bool):
+        self.id = trace_id
+        self.method = method
+        self.path = path
+        self.flagged = flagged
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc)
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+        self.samples: Optional[Counter] = None
+
+    def add(self, kind: str, detail: str, start: float, end: float):
+        # list.append is atomic, so pool threads can add spans too
+        if len(self.spans) < PROFILE_MAX_SPANS:
+            self.spans.append(Span(kind, detail, start, end))
+        else:
+            self.dropped_spans += 1
+
+    def to_dict(self, route: str, status: int, duration: float) -> dict:
+        breakdown: Dict[str, dict] = {}
+        for item in self.spans:
+            entry = breakdown.setdefault(item.kind, {"count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += (item.end - item.start) * 1000
+        for entry in breakdown.values():
+            entry["total_ms"] = round(entry["total_ms"], 3)
+
+        # Time covered by at least one span (they can nest or overlap)
+        covered, reach = 0.0, self.started
+        for item in sorted(self.spans, key=lambda s: s.start):
+            if item.end > reach:
+                covered += item.end - max(item.start, reach)
+                reach = item.end
+
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": route,
+            "status": status,
+            "reason": "flagged" if self.flagged else "slow",
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(duration * 1000, 3),
+            "unaccounted_ms": round(max(0.0, duration - covered) * 1000, 3),
+            "breakdown": breakdown,
+            "spans": [
+                {
+                    "kind": item.kind,
+                    "detail": item.detail,
+                    "start_ms": round((item.start - self.started) * 1000, 3),
+                    "duration_ms": round((item.end - item.start) * 1000, 3),
+                }
+                for item in self.spans
+            ],
+            "dropped_spans": self.dropped_spans,
+            "flamegraph": _folded(self.samples) if self.samples is not None else None,
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("profile_trace", default=None)
+
+
+class _SpanContext:
+    __slots__ = ("trace", "kind", "detail", "start")
+
+    def __init__(self, trace: Trace, kind: str, detail: str):
+        self.trace = trace
+        self.kind = kind
+        self.detail = detail
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.trace.add(self.kind, self.detail, self.start, time.perf_counter())
+        return False
+
+
+_NO_SPAN = nullcontext()
+
+
+def span(kind: str, detail: str = ""):
+    """Context manager timing a span of the current request; a no-op outside one."""
+    trace = _current.get()
+    if trace is None:
+        return _NO_SPAN
+    return _SpanContext(trace, kind, detail)
+
+
+# ============================================
+# SAMPLING PROFILER
+# ============================================
+
+def _folded(samples: Counter) -> str:
+    return "\n".join(f"{stack} {count}" for stack, count in samples.most_common())
+
+
+def _fold_stack(thread_name: str, frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """One background thread sampling all stacks while any collector is registered."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._collectors: List[Counter] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, collector: Counter):
+        with self._lock:
+            self._collectors.append(collector)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, collector: Counter):
+        with self._lock:
+            self._collectors.remove(collector)
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._collectors:
+                    self._thread = None
+                    return
+                collectors = list(self._collectors)
+
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = [
+                _fold_stack(names.get(ident, str(ident)), frame)
+                for ident, frame in sys._current_frames().items()
+                if ident != me
+            ]
+            for collector in collectors:
+                collector.update(stacks)
+
+
+_sampler = StackSampler(PROFILE_SAMPLE_INTERVAL_MS / 1000)
+
+
+# ============================================
+# MIDDLEWARE AND STORAGE
+# ============================================
+
+_profiles: deque = deque(maxlen=PROFILE_BUFFER_SIZE)
+_trace_ids = itertools.count(1)
+
+
+def is_admin_token(value: Optional[str]) -> bool:
+    return bool(PROFILE_ADMIN_TOKEN) and value is not None and secrets.compare_digest(value, PROFILE_ADMIN_TOKEN)
+
+
+def _header(scope, name: str) -> Optional[str]:
+    key = name.encode("latin-1")
+    for header, value in scope["headers"]:
+        if header == key:
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware recording a Trace for every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _current.get() is not None:
+            return await self.app(scope, receive, send)
+
+        flagged = is_admin_token(_header(scope, PROFILE_HEADER))
+        trace = Trace(next(_trace_ids), scope["method"], scope["path"], flagged)
+        token = _current.set(trace)
+        if flagged and PROFILE_FLAMEGRAPH:
+            trace.samples = Counter()
+            _sampler.add(trace.samples)
+
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if flagged:
+                    headers = list(message.get("headers", []))
+                    headers.append((PROFILE_ID_HEADER.lower().encode(), str(trace.id).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration = time.perf_counter() - trace.started
+            _current.reset(token)
+            if trace.samples is not None:
+                _sampler.remove(trace.samples)
+            if flagged or duration * 1000 >= PROFILE_SLOW_MS:
+                route = getattr(scope.get("route"), "path", None)
+                _profiles.append(trace.to_dict(route, status, duration))
+
+
+def list_profiles() -> List[dict]:
+    """Kept traces, newest first, without their spans and flamegraph."""
+    return [
+        {key: value for key, value in profile.items() if key not in ("spans", "flamegraph")}
+        for profile in reversed(_profiles)
+    ]
+
+
+def get_profile(trace_id: int) -> Optional[dict]:
+    for profile in _profiles:
+        if profile["id"] == trace_id:
+            return profile
+    return None
+
+
+def clear_profiles():
+    _profiles.clear()
+
+
+# ============================================
+# DATABASE SPANS
+# ============================================
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current.get()
+    started = conn.info.get("profile_started")
+    if trace is not None and started:
+        trace.add("db", " ".join(statement.split())[:200], started.pop(), time.perf_counter())
+
+
+def _on_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("profile_started"):
+        connection.info["profile_started"].pop()
+
+
+def instrument_engine(engine):
+    """Record a "db" span for every statement run on this (sync) Engine."""
+    from sqlalchemy import event
+
+    if getattr(engine, "_profiling_instrumented", False):
+        return
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    event.listen(engine, "handle_error", _on_error)
+    engine._profiling_instrumented = True
@@ -0,0 +1,152 @@
+"""
+Prompt Context Builder.
+Chooses which of a user's tasks go into an AI prompt and packs them into
+a token budget. Tasks are ranked by urgency (overdue, due soon, recently
+updated) plus word overlap with the user's message, then added in rank
+order while they fit; whatever is left out is mentioned as a count.
+
+Token counts are a local estimate (no tokenizer download): roughly one
+token per four characters of a word, which errs on the high side for
+English, so packed prompts stay under the budget.
+"""
+import re
+from datetime import datetime, timezone
+from typing import List, Optional, Set, Tuple
+from config import AI_CONTEXT_TOKEN_BUDGET
+from models import TaskStatus
+from task_context import TaskContext
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+_KEYWORD = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from have how i if in is it
+me my of on or so that the this to was what when where which who why will
+with you your about any all should could would today tomorrow note notes
+task tasks please help
+""".split())
+
+# Urgency weights. A task the message is about outranks one that is
+# merely urgent, hence the larger keyword weight.
+OVERDUE = 3.0
+DUE_WITHIN_DAY = 2.5
+DUE_WITHIN_3_DAYS = 1.5
+DUE_WITHIN_WEEK = 1.0
+RECENT_UPDATE = 1.0
+RECENT_HALF_LIFE_DAYS = 3.0
+KEYWORD_WEIGHT = 5.0
+
+# Descriptions are only quoted for tasks the message is about
+DESCRIPTION_CHARS = 120
+
+EMPTY_CONTEXT = "(no notes)"
+
+
+def estimate_tokens(text: str) -> int:
+    return sum(-(-len(piece) // 4) for piece in _WORD.findall(text))
+
+
+def keywords(text: Optional[str]) -> Set[str]:
+    words = set()
+    for word in _KEYWORD.findall((text or "").lower()):
+        if len(word) < 3 or word in STOPWORDS:
+            continue
+        # Crude stemming so "reports" matches "report"
+        words.add(word[:-1] if len(word) > 4 and word.endswith("s") else word)
+    return words
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes; they are stored as UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def urgency(task: TaskContext, now: datetime) -> float:
+    score = 0.0
+    due = _utc(task.due_date)
+    if task.status == TaskStatus.pending.value and due is not None:
+        days_left = (due - now).total_seconds() / 86400
+        if days_left < 0:
+            score += OVERDUE
+        elif days_left <= 1:
+            score += DUE_WITHIN_DAY
+        elif days_left <= 3:
+            score += DUE_WITHIN_3_DAYS
+        elif days_left <= 7:
+            score += DUE_WITHIN_WEEK
+
+    updated = _utc(task.updated_at)
+    if updated is not None:
+        age_days = max(0.0, (now - updated).total_seconds() / 86400)
+        score += RECENT_UPDATE * 0.5 ** (age_days / RECENT_HALF_LIFE_DAYS)
+    if task.status != TaskStatus.pending.value:
+        score /= 2
+    return score
+
+
+def relevance(task: TaskContext, query_words: Set[str]) -> float:
+    """0..1 keyword overlap with the query; two title hits count as a full match."""
+    if not query_words:
+        return 0.0
+    hits = len(query_words & keywords(task.title)) + 0.5 * len(query_words & keywords(task.description))
+    return min(1.0, hits / min(len(query_words), 2))
+
+
+def rank_tasks(tasks: List[TaskContext], query: str = "", now: Optional[datetime] = None) -> List[Tuple[TaskContext, float]]:
+    """(task, relevance) pairs, most useful first."""
+    now = now or datetime.now(timezone.utc)
+    query_words = keywords(query)
+    scored = []
+    for position, task in enumerate(tasks):
+        match = relevance(task, query_words)
+        # Ties keep the loader's order
+        scored.append((urgency(task, now) + KEYWORD_WEIGHT * match, -position, task, match))
+    scored.sort(key=lambda item: item[:2], reverse=True)
+    return [(task, match) for _, _, task, match in scored]
+
+
+def format_task(task: TaskContext, now: datetime, with_description: bool = False) -> str:
+    details = [task.status]
+    due = _utc(task.due_date)
+    if due is not None:
+        details.append(f"due {due:%Y-%m-%d %H:%M}")
+        if task.status == TaskStatus.pending.value and due < now:
+            details.append("overdue")
+    line = f"- {task.title} ({', '.join(details)})"
+    if with_description and task.description:
+        description = " ".join(task.description.split())
+        if len(description) > DESCRIPTION_CHARS:
+            description = description[:DESCRIPTION_CHARS].rstrip() + "..."
+        line += f": {description}"
+    return line
+
+
+def build_task_context(
+    tasks: List[TaskContext],
+    query: str = "",
+    budget: int = AI_CONTEXT_TOKEN_BUDGET,
+    now: Optional[datetime] = None
+) -> str:
+    """Bullet list of the most useful tasks that fits in `budget` tokens."""
+    if not tasks:
+        return EMPTY_CONTEXT
+    now = now or datetime.now(timezone.utc)
+
+    lines, used = [], 0
+    # Room for the "N more" line, so adding it never breaks the budget
+    reserve = estimate_tokens(f"(+{len(tasks)} more notes not shown)")
+    for task, match in rank_tasks(tasks, query, now):
+        line = format_task(task, now, with_description=match > 0)
+        cost = estimate_tokens(line)
+        if used + cost + reserve > budget:
+            # Smaller tasks further down may still fit
+            continue
+        lines.append(line)
+        used += cost
+
+    omitted = len(tasks) - len(lines)
+    if omitted:
+        lines.append(f"(+{omitted} more notes not shown)")
+    return "\n".join(lines)
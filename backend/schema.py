@@ -1,7 +1,8 @@
-from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+from typing import Any, Dict, Optional, List, Literal
 from datetime import datetime
 from models import TaskStatus
+from config import BULK_MAX_OPERATIONS
 
 class UserCreate(BaseModel):
     username: str
@@ -62,6 +63,64 @@ class TaskResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class BulkTaskOperation(BaseModel):
+    op: Literal["create", "complete", "reopen", "delete"]
+    id: Optional[int] = None
+    task: Optional[TaskCreate] = None
+
+    @model_validator(mode="after")
+    def validate_target(self):
+        if self.op == "create" and self.task is None:
+            raise ValueError("'create' operations need a 'task'")
+        if self.op != "create" and self.id is None:
+            raise ValueError(f"'{self.op}' operations need an 'id'")
+        return self
+
+class BulkTaskRequest(BaseModel):
+    # Each item is a BulkTaskOperation, validated one by one in task_bulk.py
+    # so a bad item fails on its own instead of rejecting the whole batch
+    operations: List[Dict[str, Any]] = Field(min_length=1, max_length=BULK_MAX_OPERATIONS)
+    # atomic: any failed operation rolls back the whole batch
+    # best_effort: failed operations are skipped, the rest are committed
+    mode: Literal["atomic", "best_effort"] = "atomic"
+
+class BulkItemResult(BaseModel):
+    index: int
+    op: str
+    ok: bool
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkTaskResponse(BaseModel):
+    committed: bool
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+class TaskSearchResult(TaskResponse):
+    # Higher is better; only comparable within one search
+    score: float
+    # HTML: the task text, escaped, with matched words wrapped in <mark>...</mark>
+    title_highlight: str
+    snippet: Optional[str]
+
+class TaskChangesResponse(BaseModel):
+    upserts: List[TaskResponse]
+    deleted: List[int]
+    # Pass back as `since` to get the following changes
+    cursor: str
+    has_more: bool
+
+class AIJobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    # The use case's response body once status is "done"
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
 class AIParseRequest(BaseModel):
     text: str
 
@@ -81,3 +140,6 @@ class ChatRequest(BaseModel):
 
 class ChatResponse(BaseModel):
     reply: str
+
+class ChatStreamChunk(BaseModel):
+    delta: str
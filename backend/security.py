@@ -1,7 +1,16 @@
 """
 Security Utilities for Authentication.
 Provides functions for password hashing, validation, and JWT creation.
+
+bcrypt is CPU-bound, so the async helpers run it on a dedicated worker
+pool (processes by default) instead of the request thread pool. The pool
+accepts a bounded number of pending jobs; beyond that callers get
+PasswordHashingBusy and the API answers 429.
 """
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from jose import jwt
@@ -10,10 +19,27 @@ from config import (
     ALGORITHM,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     MIN_PASSWORD_LENGTH,
-    MAX_PASSWORD_LENGTH
+    MAX_PASSWORD_LENGTH,
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING
+)
+from profiling import span
+
+# min/max rounds pin the cost: hashes made with any other cost are
+# reported by verify_and_update and rehashed on the next login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
 )
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing pool already has its maximum of pending jobs."""
 
 
 def validate_password(password:str):
@@ -31,11 +57,71 @@ def hash_password(password:str):
 def verify_password(plain_password:str,hashed_password:str):
     return pwd_context.verify(plain_password,hashed_password)
 
+def verify_and_update_password(plain_password:str,hashed_password:str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also return a new hash if the stored one uses outdated parameters."""
+    return pwd_context.verify_and_update(plain_password,hashed_password)
+
+
+# ============================================
+# HASHING WORKER POOL
+# ============================================
+
+_pool: Optional[Executor] = None
+_pool_lock = threading.Lock()
+_pending = 0
+
+
+def _get_pool() -> Executor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if PASSWORD_HASH_EXECUTOR == "thread":
+                _pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+            else:
+                _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        return _pool
+
+
+def shutdown_hash_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def hash_pool_pending() -> int:
+    """Hashing jobs queued or running, for /metrics."""
+    return _pending
+
+
+async def _run_in_pool(fn, *args):
+    global _pending
+    with _pool_lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            raise PasswordHashingBusy()
+        _pending += 1
+    try:
+        with span("bcrypt", fn.__name__):
+            return await asyncio.get_running_loop().run_in_executor(_get_pool(), fn, *args)
+    finally:
+        with _pool_lock:
+            _pending -= 1
+
+
+async def hash_password_async(password:str) -> str:
+    validate_password(password)
+    return await _run_in_pool(hash_password, password)
+
+
+async def verify_and_update_password_async(plain_password:str,hashed_password:str) -> Tuple[bool, Optional[str]]:
+    return await _run_in_pool(verify_and_update_password, plain_password, hashed_password)
+
+
 def create_access_token(data:dict):
-    
+
     to_encode = data.copy()
     expire= datetime.now(timezone.utc) + timedelta(minutes = ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp":int(expire.timestamp())})
     encoded_jwt = jwt.encode(to_encode,SECRET_KEY,algorithm = ALGORITHM)
     return encoded_jwt
-
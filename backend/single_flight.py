@@ -0,0 +1,77 @@
+"""
+Single-Flight Request Coalescing.
+Concurrent callers asking for the same key share one execution: the first
+starts it and the rest wait for its result (or exception). Nothing is
+kept once it finishes; caching finished results is ai_cache.py's job.
+
+The shared call runs as its own task, so one caller going away (e.g. a
+client disconnect) does not cancel it for the others; it is cancelled
+only when every caller waiting on it has gone.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._loop = None
+        self.calls = 0
+        # Calls that ran the function / that joined one already in flight
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Tasks from another event loop can't be awaited here
+            self._flights.clear()
+            self._loop = loop
+
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            self.executions += 1
+            flight = _Flight(asyncio.create_task(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Nobody else wants it: stop it, and let the next caller start afresh
+                flight.task.cancel()
+                self._forget(key, flight)
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _finish(self, key: str, flight: _Flight):
+        self._forget(key, flight)
+        if not flight.task.cancelled():
+            # Mark the exception retrieved even if every waiter has gone
+            flight.task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+        }
@@ -0,0 +1,190 @@
+"""
+Bulk Task Operations.
+Applies a batch of create/complete/reopen/delete operations for one user in
+a single transaction with set-based statements: one multi-row INSERT for
+the creates, one SELECT for the tasks the batch refers to, then one UPDATE
+per resulting status and one DELETE (IN lists are chunked).
+
+Operations are resolved in order against the SELECTed state, so e.g.
+"complete 5, then delete 5" behaves as it would one request at a time.
+Malformed operations are reported like any other failed one. All changes
+of a batch share one change sequence number, taken before the SELECT: its
+user-row lock keeps concurrent writes from changing the statuses the batch
+resolves against until it commits.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.orm import Session
+
+from models import TaskDB, TaskStatus
+from schema import BulkTaskOperation, BulkItemResult, BulkTaskResponse
+from task_counters import record_change
+from ai_cache import invalidate_on_commit
+from task_changes import next_change_seq, record_tombstones
+
+# Bound parameters per IN (...) list, well under every driver's limit
+CHUNK_SIZE = 500
+
+TARGET_STATUS = {
+    "complete": TaskStatus.completed.value,
+    "reopen": TaskStatus.pending.value,
+}
+
+
+def _chunks(items: List[int], size: int = CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _load_statuses(db: Session, user_id: int, task_ids: List[int]) -> Dict[int, str]:
+    """id -> status for the given tasks that exist and belong to the user."""
+    statuses = {}
+    for chunk in _chunks(task_ids):
+        statuses.update(db.execute(
+            select(TaskDB.id, TaskDB.status).where(
+                TaskDB.user_id == user_id,
+                TaskDB.id.in_(chunk)
+            )
+        ).all())
+    return statuses
+
+
+def _insert_tasks(db: Session, rows: List[dict]) -> List[int]:
+    """Insert rows in one executemany and return their ids, in order."""
+    dialect = db.get_bind().dialect
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(db.scalars(
+            insert(TaskDB).returning(TaskDB.id, sort_by_parameter_order=True),
+            rows
+        ))
+
+    # No ordered RETURNING on this dialect: let the ORM fetch each new id
+    db.bulk_insert_mappings(TaskDB, rows, return_defaults=True)
+    return [row["id"] for row in rows]
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" if item["loc"] else item["msg"]
+        for item in error.errors()
+    )
+
+
+def _parse(raw: Dict[str, Any]) -> Tuple[Optional[BulkTaskOperation], Optional[str]]:
+    try:
+        return BulkTaskOperation.model_validate(raw), None
+    except ValidationError as e:
+        return None, _validation_message(e)
+
+
+def apply_bulk(db: Session, user_id: int, raw_operations: List[Dict[str, Any]], mode: str) -> BulkTaskResponse:
+    """
+    Validate and apply a batch, reporting a result per operation. In atomic
+    mode nothing is written if any operation fails.
+    """
+    now = datetime.now(timezone.utc)
+    results: List[BulkItemResult] = []
+
+    parsed = [_parse(raw) for raw in raw_operations]
+    operations = [op for op, _ in parsed]
+
+    seq = next_change_seq(db, user_id) if any(op is not None for op in operations) else None
+    initial = _load_statuses(db, user_id, sorted({op.id for op in operations if op is not None and op.op != "create"}))
+    state = dict(initial)
+    create_indexes = []
+
+    for index, (op, error) in enumerate(parsed):
+        if op is None:
+            raw_op = raw_operations[index].get("op")
+            results.append(BulkItemResult(
+                index=index, op=raw_op if isinstance(raw_op, str) else "", ok=False, error=error
+            ))
+        elif op.op == "create":
+            create_indexes.append(index)
+            results.append(BulkItemResult(index=index, op=op.op, ok=True))
+        elif op.id not in state:
+            results.append(BulkItemResult(index=index, op=op.op, ok=False, id=op.id, error="Task not found"))
+        else:
+            if op.op == "delete":
+                del state[op.id]
+            else:
+                state[op.id] = TARGET_STATUS[op.op]
+            results.append(BulkItemResult(index=index, op=op.op, ok=True, id=op.id))
+
+    failed = sum(1 for result in results if not result.ok)
+    if failed and mode == "atomic":
+        for result in results:
+            if result.ok:
+                result.ok = False
+                result.error = "Not applied: another operation in the batch failed"
+        db.rollback()
+        return BulkTaskResponse(committed=False, succeeded=0, failed=len(results), results=results)
+
+    touched = {result.id for result in results if result.ok and result.op in TARGET_STATUS}
+    deleted = sorted(initial.keys() - state.keys())
+    if not (create_indexes or touched or deleted):
+        # Nothing to write: drop the sequence bump
+        db.rollback()
+        return BulkTaskResponse(committed=True, succeeded=len(results) - failed, failed=failed, results=results)
+
+    if create_indexes:
+        rows = [
+            {
+                "title": operations[index].task.title,
+                "description": operations[index].task.description,
+                "due_date": operations[index].task.due_date,
+                "status": TaskStatus.pending.value,
+                "created_at": now,
+                "updated_at": now,
+                "user_id": user_id,
+                "change_seq": seq,
+            }
+            for index in create_indexes
+        ]
+        for index, task_id in zip(create_indexes, _insert_tasks(db, rows)):
+            results[index].id = task_id
+
+    # Every task a status operation touched gets its final status and a new
+    # updated_at, grouped into one UPDATE per status
+    by_status: Dict[str, List[int]] = {}
+    for task_id in sorted(touched & state.keys()):
+        by_status.setdefault(state[task_id], []).append(task_id)
+
+    for status, task_ids in by_status.items():
+        for chunk in _chunks(task_ids):
+            db.execute(
+                update(TaskDB)
+                .where(TaskDB.user_id == user_id, TaskDB.id.in_(chunk))
+                .values(status=status, updated_at=now, change_seq=seq)
+                .execution_options(synchronize_session=False)
+            )
+
+    for chunk in _chunks(deleted):
+        db.execute(
+            delete(TaskDB)
+            .where(TaskDB.user_id == user_id, TaskDB.id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+    record_tombstones(db, user_id, deleted, seq, now)
+
+    completed = TaskStatus.completed.value
+    record_change(
+        db, user_id,
+        total=len(create_indexes) - len(deleted),
+        completed=(
+            sum(1 for status in state.values() if status == completed)
+            - sum(1 for status in initial.values() if status == completed)
+        )
+    )
+    invalidate_on_commit(db, user_id)
+
+    db.commit()
+    return BulkTaskResponse(
+        committed=True,
+        succeeded=len(results) - failed,
+        failed=failed,
+        results=results
+    )
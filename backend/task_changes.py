@@ -0,0 +1,209 @@
+"""
+Incremental Task Sync.
+Every task write takes the next number of a per-user change sequence
+(users.task_change_seq) and stores it on the task, or, for deletes, in the
+task_tombstones log. Clients then ask for everything after the last
+(sequence, task id) they saw instead of refetching all tasks; wall clocks
+are never compared.
+
+The sequence is bumped before the task row is written, so on databases
+with row locks a user's writers are serialized and commit in sequence
+order.
+
+Tombstones are pruned after TASK_TOMBSTONE_RETENTION_DAYS. Each user keeps
+a horizon below which tombstones may be gone; a cursor from before it can
+no longer be continued and the client has to sync from scratch.
+"""
+import sys
+import json
+import base64
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, update, insert, delete, func, tuple_, literal
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+
+from models import UserDB, TaskDB, TaskTombstoneDB
+from config import TASK_TOMBSTONE_RETENTION_DAYS
+
+users_table = UserDB.__table__
+tasks_table = TaskDB.__table__
+tombstones_table = TaskTombstoneDB.__table__
+
+
+def next_change_seq(db: Session, user_id: int) -> int:
+    """Advance and return the user's change sequence (in the current transaction)."""
+    seq = users_table.c.task_change_seq
+    stmt = update(users_table).where(users_table.c.id == user_id).values(task_change_seq=seq + 1)
+    if db.get_bind().dialect.update_returning:
+        return db.execute(stmt.returning(seq)).scalar_one()
+
+    db.execute(stmt)
+    return db.execute(select(seq).where(users_table.c.id == user_id)).scalar_one()
+
+
+def change_version(db: Session, user_id: int) -> int:
+    """The user's current change sequence: it moves whenever any of their tasks does."""
+    return db.execute(
+        select(users_table.c.task_change_seq).where(users_table.c.id == user_id)
+    ).scalar_one()
+
+
+def record_tombstones(db: Session, user_id: int, task_ids: List[int], seq: int, deleted_at: datetime):
+    """Log deleted tasks so sync clients can drop them."""
+    if task_ids:
+        db.execute(insert(tombstones_table), [
+            {"user_id": user_id, "change_seq": seq, "task_id": task_id, "deleted_at": deleted_at}
+            for task_id in task_ids
+        ])
+
+
+def prune_tombstones(db: Session, older_than: datetime) -> int:
+    """
+    Drop tombstones logged before `older_than` and return how many went.
+    Each user's horizon moves up to their newest expired sequence number;
+    the tombstones of that number itself are kept, so a cursor taken right
+    after it stays usable.
+    """
+    expired = (
+        select(func.max(tombstones_table.c.change_seq))
+        .where(
+            tombstones_table.c.user_id == users_table.c.id,
+            tombstones_table.c.deleted_at < older_than
+        )
+        .scalar_subquery()
+    )
+    db.execute(
+        update(users_table)
+        .where(expired > users_table.c.task_tombstone_horizon)
+        .values(task_tombstone_horizon=expired)
+    )
+
+    horizon = (
+        select(users_table.c.task_tombstone_horizon)
+        .where(users_table.c.id == tombstones_table.c.user_id)
+        .scalar_subquery()
+    )
+    pruned = db.execute(delete(tombstones_table).where(tombstones_table.c.change_seq < horizon)).rowcount
+    db.commit()
+    return pruned
+
+
+def prune_expired_tombstones(db: Session) -> int:
+    """prune_tombstones for everything past TASK_TOMBSTONE_RETENTION_DAYS (0 keeps all)."""
+    if TASK_TOMBSTONE_RETENTION_DAYS <= 0:
+        return 0
+    return prune_tombstones(db, datetime.now(timezone.utc) - timedelta(days=TASK_TOMBSTONE_RETENTION_DAYS))
+
+
+# ============================================
+# CHANGE FEED
+# ============================================
+
+def encode_change_cursor(seq: int, task_id: int, until: Optional[int] = None) -> str:
+    position = [seq, task_id] if until is None else [seq, task_id, until]
+    raw = json.dumps(position).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_change_cursor(cursor: str) -> Tuple[int, int, Optional[int]]:
+    """(seq, task_id, until); `until` is only set while paging an initial sync."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        seq, task_id, *rest = json.loads(base64.urlsafe_b64decode(padded))
+        until, = rest or [None]
+        return int(seq), int(task_id), None if until is None else int(until)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after(seq_column, id_column, seq: int, task_id: int):
+    # Row-value comparison, so the (user_id, change_seq, id) index drives the range
+    return tuple_(seq_column, id_column) > tuple_(literal(seq), literal(task_id))
+
+
+def load_changes(db: Session, user_id: int, since: Optional[str], limit: int):
+    """
+    Changes after the `since` cursor, oldest first, as
+    (upserts, deleted_ids, next_cursor, has_more). Upserts carry the task's
+    current state.
+
+    Without a cursor (an initial sync) every task is returned and no
+    deletes. Its cursors remember the change sequence it started at and
+    the last one continues from there, so deletes made while paging still
+    arrive. A cursor from before the user's tombstone horizon gets a 410.
+    """
+    if since is None:
+        # Read before the tasks: anything written later comes again, never less
+        seq, task_id, until = -1, 0, change_version(db, user_id)
+    else:
+        seq, task_id, until = decode_change_cursor(since)
+
+    upserts = db.execute(
+        select(*tasks_table.c)
+        .where(
+            tasks_table.c.user_id == user_id,
+            _after(tasks_table.c.change_seq, tasks_table.c.id, seq, task_id)
+        )
+        .order_by(tasks_table.c.change_seq, tasks_table.c.id)
+        .limit(limit + 1)
+    ).all()
+
+    deletes = [] if until is not None else db.execute(
+        select(tombstones_table.c.change_seq, tombstones_table.c.task_id)
+        .where(
+            tombstones_table.c.user_id == user_id,
+            _after(tombstones_table.c.change_seq, tombstones_table.c.task_id, seq, task_id)
+        )
+        .order_by(tombstones_table.c.change_seq, tombstones_table.c.task_id)
+        .limit(limit + 1)
+    ).all()
+
+    # Checked after reading the tombstones, so a prune cannot slip in between.
+    # Continuing needs every tombstone from this sequence number on (from
+    # the one after `until` for an initial sync).
+    if since is not None:
+        needed = until + 1 if until is not None else seq
+        horizon = db.execute(
+            select(users_table.c.task_tombstone_horizon).where(users_table.c.id == user_id)
+        ).scalar_one()
+        if needed < horizon:
+            raise HTTPException(status_code=410, detail="Sync cursor expired, sync again without `since`")
+
+    # Merge both streams in (sequence, task id) order and keep one page
+    merged = sorted(
+        [((row.change_seq, row.id), row) for row in upserts]
+        + [((row.change_seq, row.task_id), None) for row in deletes],
+        key=lambda item: item[0]
+    )
+    has_more = len(merged) > limit
+    page = merged[:limit]
+
+    if until is not None and not has_more:
+        # Initial sync done: continue after every change up to `until`
+        # (task ids start at 1)
+        next_cursor = encode_change_cursor(until + 1, 0)
+    elif page:
+        next_cursor = encode_change_cursor(*page[-1][0], until)
+    else:
+        next_cursor = since
+
+    live = {key[1] for key, row in page if row is not None}
+    changed = [row for _, row in page if row is not None]
+    # A task id that still exists was re-created after its tombstone
+    deleted = [key[1] for key, row in page if row is None and key[1] not in live]
+    return changed, deleted, next_cursor, has_more
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    if "--prune" not in sys.argv:
+        sys.exit("usage: python task_changes.py --prune")
+    db = SessionLocal()
+    try:
+        pruned = prune_expired_tombstones(db)
+    finally:
+        db.close()
+    print(f"Pruned {pruned} tombstone(s) older than {TASK_TOMBSTONE_RETENTION_DAYS} days")
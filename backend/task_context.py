@@ -0,0 +1,70 @@
+"""
+Task Context Loader for AI Prompts.
+Selects only the columns the AI use cases read, with filtering, ordering
+and LIMIT done in SQL, so prompts never hydrate full TaskDB objects.
+"""
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from models import TaskDB, TaskStatus
+from config import AI_CONTEXT_CANDIDATES
+
+
+class TaskContext(NamedTuple):
+    """Lightweight read-only view of a task as seen by the AI assistant."""
+    title: str
+    status: str
+    due_date: Optional[datetime]
+    description: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+
+_CONTEXT_COLUMNS = (TaskDB.title, TaskDB.status, TaskDB.due_date, TaskDB.description, TaskDB.updated_at)
+
+
+def load_task_context(
+    db: Session,
+    user_id: int,
+    limit: int,
+    pending_only: bool = False
+) -> List[TaskContext]:
+    query = select(*_CONTEXT_COLUMNS).where(TaskDB.user_id == user_id)
+    if pending_only:
+        query = query.where(TaskDB.status == TaskStatus.pending.value)
+
+    query = query.order_by(TaskDB.id).limit(limit)
+    return [TaskContext._make(row) for row in db.execute(query)]
+
+
+def load_prompt_candidates(
+    db: Session,
+    user_id: int,
+    limit: int = AI_CONTEXT_CANDIDATES,
+    pending_only: bool = False
+) -> List[TaskContext]:
+    """
+    Tasks for prompt_context.build_task_context to rank. When a user has
+    more than `limit`, pending tasks with the nearest due dates are kept,
+    then the most recently updated.
+    """
+    query = select(*_CONTEXT_COLUMNS).where(TaskDB.user_id == user_id)
+    if pending_only:
+        query = query.where(TaskDB.status == TaskStatus.pending.value)
+
+    query = query.order_by(
+        TaskDB.status != TaskStatus.pending.value,
+        TaskDB.due_date.is_(None),
+        TaskDB.due_date,
+        TaskDB.updated_at.desc()
+    ).limit(limit)
+    return [TaskContext._make(row) for row in db.execute(query)]
+
+
+def count_pending(db: Session, user_id: int) -> int:
+    return db.execute(
+        select(func.count()).select_from(TaskDB).where(
+            TaskDB.user_id == user_id,
+            TaskDB.status == TaskStatus.pending.value
+        )
+    ).scalar_one()
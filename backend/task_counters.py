@@ -0,0 +1,134 @@
+"""
+Task Progress Counters.
+Computes per-user total/completed task counts, either with one grouped
+aggregate over the tasks table or, when TASK_COUNTERS_ENABLED is set, from
+the task_counters table that task writes keep up to date in the same
+transaction.
+"""
+import sys
+from typing import List, Optional, Tuple
+from sqlalchemy import select, update, func, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import TaskDB, TaskCounterDB, TaskStatus
+from config import TASK_COUNTERS_ENABLED
+
+_completed_count = func.coalesce(
+    func.sum(case((TaskDB.status == TaskStatus.completed.value, 1), else_=0)),
+    0
+)
+
+
+def aggregate_counts(db: Session, user_id: int) -> Tuple[int, int]:
+    """(total, completed) for a user in a single query over their tasks."""
+    total, completed = db.execute(
+        select(func.count(), _completed_count).where(TaskDB.user_id == user_id)
+    ).one()
+    return total, completed
+
+
+def _insert_counts(db: Session, user_id: int) -> Optional[Tuple[int, int]]:
+    """Create a user's counters from their tasks; None if the row already exists."""
+    total, completed = aggregate_counts(db, user_id)
+    try:
+        with db.begin_nested():
+            db.add(TaskCounterDB(user_id=user_id, total=total, completed=completed))
+    except IntegrityError:
+        # A concurrent request created the row first
+        return None
+    return total, completed
+
+
+def _apply_delta(db: Session, user_id: int, total: int, completed: int) -> bool:
+    result = db.execute(
+        update(TaskCounterDB)
+        .where(TaskCounterDB.user_id == user_id)
+        .values(
+            total=TaskCounterDB.total + total,
+            completed=TaskCounterDB.completed + completed
+        )
+    )
+    return result.rowcount > 0
+
+
+def counters_enabled() -> bool:
+    """Whether writes must report their effect on the counters."""
+    return TASK_COUNTERS_ENABLED
+
+
+def get_counts(db: Session, user_id: int) -> Tuple[int, int]:
+    """(total, completed) for a user, from the counters table when enabled."""
+    if not TASK_COUNTERS_ENABLED:
+        return aggregate_counts(db, user_id)
+
+    row = db.execute(
+        select(TaskCounterDB.total, TaskCounterDB.completed).where(TaskCounterDB.user_id == user_id)
+    ).first()
+    if row is not None:
+        return tuple(row)
+
+    counts = _insert_counts(db, user_id)
+    db.commit()
+    return counts if counts is not None else get_counts(db, user_id)
+
+
+def record_change(db: Session, user_id: int, total: int = 0, completed: int = 0):
+    """
+    Apply a task write's effect on the user's counters. Call it before the
+    write is committed so both land in the same transaction.
+    """
+    if not TASK_COUNTERS_ENABLED or (total == 0 and completed == 0):
+        return
+
+    db.flush()
+    if not _apply_delta(db, user_id, total, completed):
+        # No counters yet: build them from the tasks, which include this write
+        if _insert_counts(db, user_id) is None:
+            _apply_delta(db, user_id, total, completed)
+
+
+def check_consistency(db: Session, fix: bool = False) -> List[Tuple[int, Tuple[int, int], Tuple[int, int]]]:
+    """
+    Rebuild every user's counters from the tasks table and report the rows
+    that disagree as (user_id, stored, actual). With fix=True the stored
+    counters are overwritten with the actual values.
+    """
+    actual = {
+        user_id: (total, completed)
+        for user_id, total, completed in db.execute(
+            select(TaskDB.user_id, func.count(), _completed_count).group_by(TaskDB.user_id)
+        )
+    }
+    stored = {
+        row.user_id: (row.total, row.completed)
+        for row in db.execute(select(TaskCounterDB.user_id, TaskCounterDB.total, TaskCounterDB.completed))
+    }
+
+    mismatches = []
+    for user_id in sorted(set(actual) | set(stored)):
+        expected = actual.get(user_id, (0, 0))
+        current = stored.get(user_id)
+        if current != expected:
+            mismatches.append((user_id, current, expected))
+            if fix:
+                db.merge(TaskCounterDB(user_id=user_id, total=expected[0], completed=expected[1]))
+
+    if fix:
+        db.commit()
+    return mismatches
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    fix = "--fix" in sys.argv
+    db = SessionLocal()
+    try:
+        mismatches = check_consistency(db, fix=fix)
+    finally:
+        db.close()
+
+    for user_id, current, expected in mismatches:
+        print(f"user {user_id}: stored={current} actual={expected}")
+    print(f"{len(mismatches)} mismatched counter row(s){' fixed' if fix and mismatches else ''}")
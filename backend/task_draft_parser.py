@@ -0,0 +1,225 @@
+"""
+Rule-Based Task Draft Parser.
+Turns short phrases like "Buy milk tomorrow at 5pm" or "Dinner with John
+next Friday" into a draft (title, due date, confidence) locally, without an
+LLM round trip. Phrases it cannot fully account for (leftover date words,
+long free text) get a low confidence, and parse_task_draft then asks the
+LLM instead.
+
+Due dates are "YYYY-MM-DD", or "YYYY-MM-DDTHH:MM" when a time was given,
+relative to the server's local date like the LLM prompt.
+"""
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+# Confidence of a draft whose whole text was understood
+CONFIDENT = 0.9
+# A date was found but unexplained date-like words are left over, or the
+# text reads like prose rather than a task: let the LLM look at it
+UNSURE = 0.4
+
+MAX_TASK_WORDS = 12
+TONIGHT = (20, 0)
+
+_MONTH_NAMES = [
+    ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"),
+    ("may",), ("june", "jun"), ("july", "jul"), ("august", "aug"),
+    ("september", "sep", "sept"), ("october", "oct"), ("november", "nov"), ("december", "dec"),
+]
+MONTHS = {name: number for number, names in enumerate(_MONTH_NAMES, start=1) for name in names}
+WEEKDAYS = {
+    name: number
+    for number, names in enumerate([
+        # No "wed", "sat" or "sun": they are ordinary words too
+        ("monday", "mon"), ("tuesday", "tue", "tues"), ("wednesday",), ("thursday", "thu", "thur", "thurs"),
+        ("friday", "fri"), ("saturday",), ("sunday",),
+    ])
+    for name in names
+}
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+_WEEKDAY = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+_COUNT = r"\d{1,3}|" + "|".join(NUMBER_WORDS)
+_ORDINAL = r"(?:st|nd|rd|th)?"
+
+# Words that introduce a date or time and go with it when it is removed
+_LEAD = r"(?:(?:on|by|at|due|before|for|until|till|in)\s+)?"
+
+DATE_PATTERNS = [
+    ("iso", rf"{_LEAD}(?P<year>\d{{4}})-(?P<month>\d{{1,2}})-(?P<day>\d{{1,2}})"),
+    ("month_day", rf"{_LEAD}(?:the\s+)?(?P<month>{_MONTH})\.?\s+(?P<day>\d{{1,2}}){_ORDINAL}(?:,?\s+(?P<year>\d{{4}}))?"),
+    ("day_month", rf"{_LEAD}(?:the\s+)?(?P<day>\d{{1,2}}){_ORDINAL}\s+(?:of\s+)?(?P<month>{_MONTH})\.?(?:,?\s+(?P<year>\d{{4}}))?"),
+    ("day_after_tomorrow", rf"{_LEAD}(?:the\s+)?day\s+after\s+tomorrow"),
+    ("offset", rf"(?:(?:due|by)\s+)?(?:in|within)\s+(?P<count>{_COUNT})\s+(?P<unit>day|week|month)s?"),
+    ("offset", rf"{_LEAD}(?P<count>{_COUNT})\s+(?P<unit>day|week|month)s?\s+from\s+(?:now|today)"),
+    ("today", rf"{_LEAD}today"),
+    ("tonight", rf"{_LEAD}tonight"),
+    ("tomorrow", rf"{_LEAD}(?:tomorrow|tmrw|tmr)"),
+    ("next_weekday", rf"{_LEAD}next\s+(?P<weekday>{_WEEKDAY})"),
+    ("weekday", rf"{_LEAD}(?:this\s+|coming\s+)?(?P<weekday>{_WEEKDAY})"),
+    ("next_week", rf"{_LEAD}next\s+week"),
+    ("next_month", rf"{_LEAD}next\s+month"),
+    ("weekend", rf"{_LEAD}(?:this\s+)?weekend"),
+    ("end_of_week", rf"{_LEAD}(?:the\s+)?end\s+of\s+(?:the\s+)?week"),
+    ("end_of_month", rf"{_LEAD}(?:the\s+)?end\s+of\s+(?:the\s+)?month"),
+]
+TIME_PATTERNS = [
+    ("clock", rf"(?:at\s+|@\s*)?(?P<hour>\d{{1,2}})(?::(?P<minute>\d{{2}}))?\s*(?P<meridiem>am|pm|a\.m\.|p\.m\.)"),
+    ("clock24", r"(?:at\s+|@\s*)?(?P<hour>[01]?\d|2[0-3]):(?P<minute>[0-5]\d)"),
+    ("noon", r"(?:at\s+)?noon|midday"),
+    ("midnight", r"(?:at\s+)?midnight"),
+]
+
+_DATE_RES = [(kind, re.compile(rf"\b{pattern}\b", re.IGNORECASE)) for kind, pattern in DATE_PATTERNS]
+_TIME_RES = [(kind, re.compile(rf"\b{pattern}(?!\w)", re.IGNORECASE)) for kind, pattern in TIME_PATTERNS]
+
+# Date-like words that should not be left in a title: if they are, some
+# phrase was not understood
+_FULL_NAMES = "|".join([names[0] for names in _MONTH_NAMES] + [name for name in WEEKDAYS if name.endswith("day")])
+_LEFTOVER = re.compile(
+    rf"\b(?:{_FULL_NAMES}|today|tomorrow|yesterday|tonight|morning|afternoon|evening|"
+    r"days?|weeks?|months?|years?|hours?|minutes?|daily|weekly|monthly|every|later|soon|"
+    r"am|pm|\d{1,2}[:/.]\d{1,2}|"
+    # "on the 1st", a bare hour ("at 3", "by 5") and end-of-day shorthands
+    r"\d{1,2}(?:st|nd|rd|th)|(?:at|by|before|until|till)\s+\d{1,2}|eod|eow|eom|cob|eob)\b",
+    re.IGNORECASE
+)
+_TRAILING_WORDS = re.compile(r"(?:\s+(?:on|by|at|due|before|for|until|till|in|and))+$", re.IGNORECASE)
+
+
+def _number(value: str) -> int:
+    return int(value) if value.isdigit() else NUMBER_WORDS[value.lower()]
+
+
+def _add_months(day: date, months: int) -> date:
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    for candidate in (day.day, 30, 29, 28):
+        try:
+            return date(year, month, candidate)
+        except ValueError:
+            continue
+
+
+def _month_end(day: date) -> date:
+    return _add_months(day.replace(day=1), 1) - timedelta(days=1)
+
+
+def _calendar_date(today: date, month: int, day: int, year: Optional[str]) -> Optional[date]:
+    try:
+        if year:
+            return date(int(year), month, day)
+        candidate = date(today.year, month, day)
+        # A date without a year that has already passed means next year's
+        return candidate if candidate >= today else date(today.year + 1, month, day)
+    except ValueError:
+        return None
+
+
+def _resolve_date(kind: str, groups: Dict[str, str], today: date) -> Optional[date]:
+    if kind == "iso":
+        return _calendar_date(today, int(groups["month"]), int(groups["day"]), groups["year"])
+    if kind in ("month_day", "day_month"):
+        return _calendar_date(today, MONTHS[groups["month"].lower()], int(groups["day"]), groups["year"])
+    if kind in ("today", "tonight"):
+        return today
+    if kind == "tomorrow":
+        return today + timedelta(days=1)
+    if kind == "day_after_tomorrow":
+        return today + timedelta(days=2)
+    if kind == "offset":
+        count, unit = _number(groups["count"]), groups["unit"].lower()
+        if unit == "month":
+            return _add_months(today, count)
+        return today + timedelta(days=count * (7 if unit == "week" else 1))
+    if kind == "weekday":
+        # The coming one; today's weekday means a week from today
+        ahead = (WEEKDAYS[groups["weekday"].lower()] - today.weekday()) % 7 or 7
+        return today + timedelta(days=ahead)
+    if kind == "next_weekday":
+        # That weekday in next calendar week (weeks start on Monday)
+        next_monday = today + timedelta(days=7 - today.weekday())
+        return next_monday + timedelta(days=WEEKDAYS[groups["weekday"].lower()])
+    if kind == "next_week":
+        return today + timedelta(days=7 - today.weekday())
+    if kind == "next_month":
+        return _add_months(today.replace(day=1), 1)
+    if kind == "weekend":
+        return today + timedelta(days=(5 - today.weekday()) % 7)
+    if kind == "end_of_week":
+        return today + timedelta(days=(4 - today.weekday()) % 7)
+    if kind == "end_of_month":
+        return _month_end(today)
+    return None
+
+
+def _resolve_time(kind: str, groups: Dict[str, str]) -> Optional[Tuple[int, int]]:
+    if kind == "noon":
+        return 12, 0
+    if kind == "midnight":
+        # "by midnight": the end of that day
+        return 23, 59
+    hour, minute = int(groups["hour"]), int(groups["minute"] or 0)
+    if kind == "clock":
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if groups["meridiem"].lower().startswith("p") else 0)
+    return hour, minute
+
+
+def _take(patterns, text: str, resolve):
+    """First pattern that matches and resolves: (kind, value, text without the match)."""
+    for kind, regex in patterns:
+        for match in regex.finditer(text):
+            value = resolve(kind, match.groupdict())
+            if value is not None:
+                return kind, value, f"{text[:match.start()]} {text[match.end():]}"
+    return None, None, text
+
+
+def _clean_title(text: str) -> str:
+    title = re.sub(r"\s+", " ", text).strip(" ,;:-")
+    title = _TRAILING_WORDS.sub("", title).strip(" ,;:-")
+    return title[:1].upper() + title[1:]
+
+
+def parse_draft_locally(text: str, now: Optional[datetime] = None) -> Dict[str, object]:
+    """
+    Parse a task phrase into {"title", "description", "due_date", "confidence"}
+    without calling the LLM. `now` defaults to the current local time.
+    """
+    now = now or datetime.now()
+    today = now.date()
+
+    date_kind, due_date, rest = _take(_DATE_RES, text, lambda kind, groups: _resolve_date(kind, groups, today))
+    _, due_time, rest = _take(_TIME_RES, rest, _resolve_time)
+    title = _clean_title(rest)
+
+    if date_kind == "tonight" and due_time is None:
+        due_time = TONIGHT
+    if due_time is not None and due_date is None:
+        # A bare time is today's, or tomorrow's once it has passed
+        passed = (now.hour, now.minute) >= due_time
+        due_date = today + timedelta(days=1) if passed else today
+
+    due = None
+    if due_date is not None:
+        due = due_date.isoformat()
+        if due_time is not None:
+            due += "T%02d:%02d" % due_time
+
+    confidence = CONFIDENT
+    if not title or _LEFTOVER.search(title) or len(title.split()) > MAX_TASK_WORDS or re.search(r"[.!?]\s", title):
+        confidence = UNSURE
+
+    return {
+        "title": title or text.strip()[:50],
+        "description": None,
+        "due_date": due,
+        "confidence": confidence,
+    }
@@ -0,0 +1,154 @@
+"""
+Task Change Events (pub/sub).
+Write endpoints publish an event per committed task change; /ws/tasks
+subscribers receive their own user's events. The broker is pluggable:
+the in-process one fans out within a single worker, the Redis one across
+workers (set TASK_EVENTS_URL).
+
+Each subscriber has a bounded queue. A subscriber that falls behind gets
+its backlog replaced by a single {"type": "resync"} event, after which
+the client should catch up through /tasks/changes.
+"""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Set
+
+from config import TASK_EVENTS_URL, TASK_EVENTS_QUEUE_SIZE
+
+RESYNC_EVENT = {"type": "resync"}
+
+logger = logging.getLogger(__name__)
+
+
+class EventBroker:
+    """Interface for task event fan-out."""
+
+    async def publish(self, user_id: int, event: dict):
+        raise NotImplementedError
+
+    def subscribe(self, user_id: int):
+        """Async context manager yielding an async iterator of the user's events."""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class _Subscription:
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def push(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind to be useful: tell the client to resync instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_EVENT)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        return await self.queue.get()
+
+
+class InProcessBroker(EventBroker):
+    """Fan-out to subscribers in this process (single-worker deployments)."""
+
+    def __init__(self, queue_size: int = TASK_EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[_Subscription]] = {}
+
+    async def publish(self, user_id: int, event: dict):
+        for subscription in tuple(self._subscribers.get(user_id, ())):
+            subscription.push(event)
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[_Subscription]:
+        subscription = _Subscription(self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def subscriber_count(self, user_id: int) -> int:
+        return len(self._subscribers.get(user_id, ()))
+
+
+class RedisBroker(EventBroker):
+    """
+    Fan-out across workers through Redis pub/sub: publishes go to the
+    user's channel and every subscriber, in any worker, listens on it.
+    Requires the optional `redis` package.
+    """
+
+    def __init__(self, url: str, prefix: str = "notepad:tasks:", queue_size: int = TASK_EVENTS_QUEUE_SIZE):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("TASK_EVENTS_URL is set but the 'redis' package is not installed") from e
+        self.prefix = prefix
+        self.queue_size = queue_size
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    async def publish(self, user_id: int, event: dict):
+        await self._redis.publish(f"{self.prefix}{user_id}", json.dumps(event))
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int):
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(f"{self.prefix}{user_id}")
+
+        subscription = _Subscription(self.queue_size)
+
+        async def relay():
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    subscription.push(json.loads(message["data"]))
+
+        relay_task = asyncio.create_task(relay())
+        try:
+            yield subscription
+        finally:
+            relay_task.cancel()
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def _build_broker() -> EventBroker:
+    if TASK_EVENTS_URL:
+        return RedisBroker(TASK_EVENTS_URL)
+    return InProcessBroker()
+
+
+_broker: EventBroker = _build_broker()
+
+
+def get_broker() -> EventBroker:
+    return _broker
+
+
+def set_broker(broker: EventBroker):
+    """Swap the broker (e.g. to a shared backend)."""
+    global _broker
+    _broker = broker
+
+
+async def publish_task_event(user_id: int, event_type: str, **payload):
+    """Publish a committed change; delivery problems never fail the write."""
+    try:
+        await _broker.publish(user_id, {"type": event_type, **payload})
+    except Exception as e:
+        logger.warning("Task event publish failed: %s", e)
@@ -0,0 +1,46 @@
+"""
+Task List JSON Encoding.
+GET /tasks selects plain column rows (no ORM objects) and encodes them
+straight to JSON with pydantic-core's Rust encoder. The rows come from
+our own tasks table, so they are not validated again through
+TaskResponse, which stays the documented response_model; the bytes are
+the same TaskResponse would produce.
+
+Lists of TASK_STREAM_MIN_ROWS rows or more are sent as a chunked stream
+of TASK_STREAM_CHUNK_ROWS rows at a time, so the encoded body is never
+held in memory whole.
+"""
+from typing import Iterator, Sequence
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from config import TASK_STREAM_MIN_ROWS, TASK_STREAM_CHUNK_ROWS
+from models import TaskDB
+from profiling import span
+from schema import TaskResponse
+
+TASK_FIELDS = list(TaskResponse.model_fields)
+TASK_COLUMNS = [getattr(TaskDB, field) for field in TASK_FIELDS]
+
+
+def encode_rows(rows: Sequence, fields: Sequence[str]) -> bytes:
+    """JSON array of rows whose leading columns are `fields` (extra columns are left out)."""
+    return to_json([dict(zip(fields, row)) for row in rows])
+
+
+def _stream_rows(rows: Sequence, fields: Sequence[str]) -> Iterator[bytes]:
+    yield b"["
+    for start in range(0, len(rows), TASK_STREAM_CHUNK_ROWS):
+        with span("serialize", "tasks chunk"):
+            # Each chunk is encoded as an array; drop its brackets
+            chunk = encode_rows(rows[start:start + TASK_STREAM_CHUNK_ROWS], fields)[1:-1]
+        yield b"," + chunk if start else chunk
+    yield b"]"
+
+
+def task_list_response(rows: Sequence, fields: Sequence[str], headers: dict) -> Response:
+    if len(rows) >= TASK_STREAM_MIN_ROWS:
+        return StreamingResponse(_stream_rows(rows, fields), media_type="application/json", headers=headers)
+    with span("serialize", "tasks"):
+        content = encode_rows(rows, fields)
+    return Response(content=content, media_type="application/json", headers=headers)
@@ -0,0 +1,158 @@
+"""
+Task Full-Text Search.
+Queries the search index defined in models.py: FTS5 on SQLite, a tsvector
+column with a GIN index on PostgreSQL. Every word of the query must match
+the title or description as a prefix ("meet" finds "meeting"); results are
+ranked (title hits weigh more than description hits) and carry a
+highlighted title and a description snippet. The database marks matches
+with sentinel characters; the text is then HTML-escaped and only the
+sentinels become <mark> tags, so task text never reaches a page as markup.
+
+Ranked results have to be scored in full before the first page can be
+returned whatever the paging scheme, so the cursor is a plain offset,
+tied to the query it was issued for.
+"""
+import re
+import html
+import json
+import base64
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, func, literal_column, table, column
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+
+from models import TaskDB
+
+tasks_table = TaskDB.__table__
+tasks_fts = table("tasks_fts", column("rowid"), column("tasks_fts"))
+
+# Title matches count ten times as much as description matches
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+SNIPPET_TOKENS = 12
+
+# Private-use characters the database wraps matches in
+_START_SENTINEL = "\ue000"
+_END_SENTINEL = "\ue001"
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def query_terms(q: str) -> List[str]:
+    """The words of a search query; operators and punctuation are ignored."""
+    return _WORD.findall(q.lower())
+
+
+def encode_search_cursor(q: str, offset: int) -> str:
+    raw = json.dumps([q, offset]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_search_cursor(cursor: str, q: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_q, offset = json.loads(base64.urlsafe_b64decode(padded))
+        offset = int(offset)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if cursor_q != q or offset < 0:
+        raise HTTPException(status_code=400, detail="Cursor does not match query")
+    return offset
+
+
+def _sqlite_search(user_id: int, terms: List[str], filters: list):
+    # Quoting every term keeps user input out of the FTS5 query syntax; the
+    # owner token restricts the match to this user's postings
+    phrases = " ".join(f'"{term}"*' for term in terms)
+    match = f"owner:u{user_id} AND {{title description}}:({phrases})"
+
+    score = -func.bm25(tasks_fts.c.tasks_fts, 0.0, TITLE_WEIGHT, DESCRIPTION_WEIGHT)
+    return (
+        select(
+            *tasks_table.c,
+            score.label("score"),
+            func.highlight(tasks_fts.c.tasks_fts, 1, _START_SENTINEL, _END_SENTINEL).label("title_highlight"),
+            func.snippet(
+                tasks_fts.c.tasks_fts, 2, _START_SENTINEL, _END_SENTINEL, "…", SNIPPET_TOKENS
+            ).label("snippet"),
+        )
+        .select_from(tasks_fts.join(tasks_table, tasks_table.c.id == tasks_fts.c.rowid))
+        .where(tasks_fts.c.tasks_fts.match(match), tasks_table.c.user_id == user_id, *filters)
+        .order_by(score.desc(), tasks_table.c.id)
+    )
+
+
+def _postgres_search(user_id: int, terms: List[str], filters: list):
+    vector = literal_column("tasks.search_vector")
+    # Terms are \w+ words, so they are safe inside to_tsquery
+    query = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+    headline_options = f'StartSel="{_START_SENTINEL}", StopSel="{_END_SENTINEL}"'
+
+    score = func.ts_rank(vector, query)
+    return (
+        select(
+            *tasks_table.c,
+            score.label("score"),
+            func.ts_headline("simple", tasks_table.c.title, query,
+                             f"{headline_options}, HighlightAll=true").label("title_highlight"),
+            func.ts_headline("simple", tasks_table.c.description, query,
+                             f"{headline_options}, MaxWords={SNIPPET_TOKENS}, MinWords=3").label("snippet"),
+        )
+        .where(vector.op("@@")(query), tasks_table.c.user_id == user_id, *filters)
+        .order_by(score.desc(), tasks_table.c.id)
+    )
+
+
+def _markup(text: Optional[str]) -> Optional[str]:
+    """HTML-escape highlighted text, then turn the sentinels into <mark> tags."""
+    if text is None:
+        return None
+    return (
+        html.escape(text)
+        .replace(_START_SENTINEL, HIGHLIGHT_START)
+        .replace(_END_SENTINEL, HIGHLIGHT_END)
+    )
+
+
+def _with_markup(row) -> dict:
+    result = dict(row._mapping)
+    result["title_highlight"] = _markup(row.title_highlight)
+    result["snippet"] = _markup(row.snippet)
+    return result
+
+
+def search_tasks(
+    db: Session,
+    user_id: int,
+    q: str,
+    filters: list,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[list, Optional[str]]:
+    """
+    Return (rows, next_cursor) for a user's tasks matching `q`, best match
+    first; `filters` are extra WHERE clauses on the tasks table.
+    """
+    terms = query_terms(q)
+    if not terms:
+        return [], None
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = _sqlite_search(user_id, terms, filters)
+    elif dialect == "postgresql":
+        stmt = _postgres_search(user_id, terms, filters)
+    else:
+        raise HTTPException(status_code=501, detail="Search is not supported on this database")
+
+    offset = decode_search_cursor(cursor, q) if cursor else 0
+    rows = db.execute(stmt.offset(offset).limit(limit + 1)).all()
+    page = [_with_markup(row) for row in rows[:limit]]
+    if len(rows) <= limit:
+        return page, None
+    return page, encode_search_cursor(q, offset + limit)
@@ -0,0 +1,96 @@
+"""
+Task Writes Without Read Round Trips.
+Each write is one INSERT / UPDATE / DELETE ... RETURNING scoped by id and
+user_id, so there is no SELECT before the write and no refresh after it.
+Dialects without RETURNING fall back to write-then-read. Before writing,
+the user's change sequence is advanced (one UPDATE ... RETURNING) and
+stored on the row for incremental sync; see task_changes.py.
+
+Rows come back as plain Row objects (not ORM instances), so they stay
+readable after commit without being reloaded.
+"""
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from models import TaskDB
+from ai_cache import invalidate_on_commit
+from task_changes import next_change_seq, record_tombstones
+
+tasks_table = TaskDB.__table__
+TASK_COLUMNS = tuple(tasks_table.c)
+
+
+def _owned(task_id: int, user_id: int):
+    return tasks_table.c.id == task_id, tasks_table.c.user_id == user_id
+
+
+def _select_task(db: Session, task_id: int, user_id: int) -> Optional[Row]:
+    return db.execute(select(*TASK_COLUMNS).where(*_owned(task_id, user_id))).first()
+
+
+def task_status(db: Session, task_id: int, user_id: int) -> Optional[str]:
+    """Current status of a user's task, or None if there is no such task."""
+    return db.execute(
+        select(tasks_table.c.status).where(*_owned(task_id, user_id))
+    ).scalar()
+
+
+def insert_task_row(db: Session, values: dict) -> Row:
+    seq = next_change_seq(db, values["user_id"])
+    stmt = insert(tasks_table).values(**values, change_seq=seq)
+    invalidate_on_commit(db, values["user_id"])
+    if db.get_bind().dialect.insert_returning:
+        return db.execute(stmt.returning(*TASK_COLUMNS)).one()
+
+    task_id = db.execute(stmt).inserted_primary_key[0]
+    return _select_task(db, task_id, values["user_id"])
+
+
+def _update_row(db: Session, task_id: int, user_id: int, values: dict, seq: int) -> Optional[Row]:
+    stmt = update(tasks_table).where(*_owned(task_id, user_id)).values(**values, change_seq=seq)
+    if db.get_bind().dialect.update_returning:
+        row = db.execute(stmt.returning(*TASK_COLUMNS)).first()
+    else:
+        row = _select_task(db, task_id, user_id) if db.execute(stmt).rowcount else None
+
+    if row is not None:
+        invalidate_on_commit(db, user_id)
+    return row
+
+
+def update_task_row(db: Session, task_id: int, user_id: int, values: dict) -> Optional[Row]:
+    """Update a user's task; None if there is no such task."""
+    return _update_row(db, task_id, user_id, values, next_change_seq(db, user_id))
+
+
+def update_task_row_with_status(db: Session, task_id: int, user_id: int, values: dict) -> Tuple[Optional[Row], Optional[str]]:
+    """
+    update_task_row that also returns the status the task had before. The
+    status is read after next_change_seq has locked the user's row (the
+    whole database on SQLite), so a concurrent write cannot change it
+    between the read and the update.
+    """
+    seq = next_change_seq(db, user_id)
+    previous_status = task_status(db, task_id, user_id)
+    return _update_row(db, task_id, user_id, values, seq), previous_status
+
+
+def delete_task_row(db: Session, task_id: int, user_id: int) -> Optional[str]:
+    """Delete a user's task and return the status it had; None if there was no such task."""
+    seq = next_change_seq(db, user_id)
+    stmt = delete(tasks_table).where(*_owned(task_id, user_id))
+    if db.get_bind().dialect.delete_returning:
+        status = db.execute(stmt.returning(tasks_table.c.status)).scalar()
+    else:
+        status = task_status(db, task_id, user_id)
+        if status is not None:
+            db.execute(stmt)
+
+    if status is not None:
+        record_tombstones(db, user_id, [task_id], seq, datetime.now(timezone.utc))
+        invalidate_on_commit(db, user_id)
+    return status
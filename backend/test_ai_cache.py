@@ -0,0 +1,38 @@
+import time
+from datetime import datetime, timezone
+from ai_cache import InMemoryCache, response_key, store_response, get_response
+from database import SessionLocal
+from models import TaskDB, UserDB
+
+
+def test_lru_eviction_and_ttl():
+    cache = InMemoryCache(max_entries=2)
+    cache.set("a", "1", ttl=60)
+    cache.set("b", "2", ttl=60)
+    cache.get("a")              # "a" is now most recently used
+    cache.set("c", "3", ttl=60)  # evicts "b"
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+
+    cache.set("short", "x", ttl=0)
+    time.sleep(0.01)
+    assert cache.get("short") is None
+
+
+def test_task_write_invalidates_user_entries():
+    db = SessionLocal()
+    user = UserDB(username="u1", email="u1@test.com", password_hash="x")
+    db.add(user)
+    db.commit()
+
+    key = response_key("model", "system", "prompt", scope=user.id)
+    store_response(key, "cached answer")
+    assert get_response(response_key("model", "system", "prompt", scope=user.id)) == "cached answer"
+
+    now = datetime.now(timezone.utc)
+    db.add(TaskDB(title="New", user_id=user.id, created_at=now, updated_at=now))
+    db.commit()
+
+    assert get_response(response_key("model", "system", "prompt", scope=user.id)) is None
+    db.close()
@@ -1,13 +1,17 @@
 import sys
 import os
+import asyncio
 from datetime import datetime
 
 # Add the current directory to the path so we can import ai_assistant
 sys.path.append(os.path.join(os.getcwd(), 'backend'))
 
-from ai_assistant import parse_task_draft
+from ai_assistant import parse_task_draft, close_llm_client
 
 def test_date_parsing():
+    asyncio.run(_run_date_parsing())
+
+async def _run_date_parsing():
     print("--- AI DATE LOGIC TEST ---")
     today = datetime.now().strftime("%Y-%m-%d (%A)")
     print(f"System Today: {today}")
@@ -22,12 +26,14 @@ def test_date_parsing():
     for text in test_cases:
         print(f"\nInput: \"{text}\"")
         try:
-            draft = parse_task_draft(text)
+            draft = await parse_task_draft(text)
             print(f"Result Title: {draft.get('title')}")
             print(f"Result Date:  {draft.get('due_date')} (Extracted)")
             
         except Exception as e:
             print(f"Error: {e}")
 
+    await close_llm_client()
+
 if __name__ == "__main__":
     test_date_parsing()
@@ -0,0 +1,135 @@
+import pytest
+from datetime import datetime
+from httpx import AsyncClient, ASGITransport
+import ai_assistant
+import ai_jobs
+import main
+from main import app
+from ai_jobs import JobQueue, InMemoryJobStore, SqliteJobStore, set_job_queue, seconds_until
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(InMemoryJobStore(), workers=2)
+    main.register_ai_jobs(queue)
+    previous = ai_jobs.get_job_queue()
+    set_job_queue(queue)
+    yield queue
+    set_job_queue(previous)
+
+
+@pytest.mark.asyncio
+async def test_job_mode_dedupes_and_feeds_sync_endpoint(queue, llm_calls, login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client, "u1")
+        other = await login(client, "u2")
+        await client.post("/tasks/", json={"title": "Write report"}, headers=headers)
+
+        r = await client.get("/ai/daily-plan", params={"job": True}, headers=headers)
+        assert r.status_code == 202 and r.json()["status"] in ("queued", "running")
+        job_id = r.json()["id"]
+        assert r.headers["Location"] == f"/ai/jobs/{job_id}"
+
+        # Same inputs while queued: the same job
+        r = await client.get("/ai/daily-plan", params={"job": True}, headers=headers)
+        assert r.json()["id"] == job_id
+
+        r = await client.get(f"/ai/jobs/{job_id}", params={"wait": 5}, headers=headers)
+        body = r.json()
+        assert body["status"] == "done" and body["result"] == {"plan": "reply #1"}
+        assert body["finished_at"] is not None
+
+        # Jobs are private to their owner
+        r = await client.get(f"/ai/jobs/{job_id}", headers=other)
+        assert r.status_code == 404
+
+        # The synchronous endpoint answers from the finished job
+        r = await client.get("/ai/daily-plan", headers=headers)
+        assert r.json() == {"plan": "reply #1"}
+        assert len(llm_calls) == 1
+
+        # New task data: new job
+        await client.post("/tasks/", json={"title": "Call bank"}, headers=headers)
+        r = await client.get("/ai/daily-plan", params={"job": True}, headers=headers)
+        assert r.json()["id"] != job_id
+
+        r = await client.get("/ai/task-summary", params={"job": True}, headers=headers)
+        r = await client.get(f"/ai/jobs/{r.json()['id']}", params={"wait": 5}, headers=headers)
+        assert r.json()["kind"] == "task_summary" and r.json()["result"]["summary"].startswith("reply #")
+
+    await queue.stop()
+    await ai_assistant.close_llm_client()
+
+
+@pytest.mark.asyncio
+async def test_failed_job_reports_error_and_can_be_resubmitted(queue, caplog):
+    attempts = []
+
+    async def flaky(user_id):
+        attempts.append(user_id)
+        if len(attempts) == 1:
+            raise RuntimeError("provider exploded")
+        return {"ok": True}
+
+    queue.register("flaky", flaky)
+    job = await queue.submit("flaky", 1, "hash-1")
+    job = await queue.wait(job.id, 5)
+    assert job.status == "failed" and "provider exploded" in job.error
+    assert any(r.name == "ai_jobs" and "provider exploded" in r.getMessage() for r in caplog.records)
+
+    job = await queue.submit("flaky", 1, "hash-1")
+    job = await queue.wait(job.id, 5)
+    assert job.status == "done" and job.result == {"ok": True}
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_nightly_precomputation_covers_active_users(queue, llm_calls, login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        active = await login(client, "active")
+        await login(client, "idle")
+        await client.post("/tasks/", json={"title": "Plan trip"}, headers=active)
+
+        jobs = await main.precompute_daily_plans()
+        assert len(jobs) == 1
+        assert (await queue.wait(jobs[0].id, 5)).status == "done"
+
+        r = await client.get("/ai/daily-plan", headers=active)
+        assert r.json() == {"plan": "reply #1"}
+        assert len(llm_calls) == 1
+
+    await queue.stop()
+    await ai_assistant.close_llm_client()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_is_durable_and_reclaims_expired_leases(tmp_path, monkeypatch):
+    path = str(tmp_path / "jobs.db")
+    store = SqliteJobStore(path)
+
+    job, created = await store.enqueue("daily_plan", 7, "h")
+    assert created
+    assert (await store.enqueue("daily_plan", 7, "h")) == (job, False)
+
+    # A second process sees the same queue
+    other_process = SqliteJobStore(path)
+    claimed = await other_process.claim()
+    assert claimed.id == job.id and claimed.status == "running"
+    assert await store.claim() is None
+
+    # The claiming worker died: once the lease is over the job is handed out again
+    monkeypatch.setattr(ai_jobs, "AI_JOB_LEASE_SECONDS", 0)
+    assert (await store.claim()).id == job.id
+
+    await store.finish(job.id, result={"plan": "p"})
+    done = await other_process.get(job.id)
+    assert done.status == "done" and done.result == {"plan": "p"}
+    assert (await store.enqueue("daily_plan", 7, "h"))[1] is False
+
+    await store.purge(finished_before=done.finished_at + 1)
+    assert await store.get(job.id) is None
+
+
+def test_seconds_until_next_run():
+    assert seconds_until(4, datetime(2026, 10, 17, 3, 30)) == 1800
+    assert seconds_until(4, datetime(2026, 10, 17, 4, 0)) == 24 * 3600
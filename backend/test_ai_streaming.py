@@ -0,0 +1,95 @@
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from httpx import AsyncClient, ASGITransport
+import ai_assistant
+from main import app
+
+TOKENS = ["Start ", "with ", "the ", "report."]
+
+
+class FakeStreamingProvider(BaseHTTPRequestHandler):
+    """OpenAI-compatible streaming chat/completions plus a chunked free endpoint."""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        if self.path.endswith("/chat/completions"):
+            if self.server.fail_api:
+                self.send_response(500)
+                self.end_headers()
+                return
+            assert json.loads(body)["stream"] is True
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for token in TOKENS:
+                event = {"choices": [{"delta": {"content": token}}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            for token in TOKENS:
+                self.wfile.write(token.encode())
+                self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeStreamingProvider)
+    server.fail_api = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(ai_assistant, "AI_API_KEY", "test-key")
+    monkeypatch.setattr(ai_assistant, "AI_BASE_URL", f"{base}/v1/")
+    monkeypatch.setattr(ai_assistant, "FREE_AI_URL", f"{base}/free")
+    yield server
+    server.shutdown()
+
+
+def parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        event = {"event": "message"}
+        for line in block.split("\n"):
+            field, _, value = line.partition(": ")
+            event[field] = value
+        events.append(event)
+    return events
+
+
+@pytest.mark.asyncio
+async def test_chat_streams_provider_tokens(provider, login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client)
+        r = await client.post("/ai/chat?stream=true", json={"message": "What first?"}, headers=headers)
+
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(r.text)
+    assert [json.loads(e["data"])["delta"] for e in events[:-1]] == TOKENS
+    assert events[-1]["event"] == "done"
+    assert json.loads(events[-1]["data"]) == {"reply": "Start with the report."}
+    await ai_assistant.close_llm_client()
+
+
+@pytest.mark.asyncio
+async def test_daily_plan_streams_free_fallback(provider, login):
+    provider.fail_api = True
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client)
+        r = await client.get("/ai/daily-plan?stream=true", headers=headers)
+
+    events = parse_sse(r.text)
+    assert "".join(json.loads(e["data"])["delta"] for e in events[:-1]) == "".join(TOKENS)
+    assert json.loads(events[-1]["data"]) == {"plan": "Start with the report."}
+    assert ai_assistant.provider_stats()["api"]["last_error"].startswith("HTTP 500")
+    await ai_assistant.close_llm_client()
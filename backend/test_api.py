@@ -1,16 +1,11 @@
 import pytest
 from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event
 from main import app
-from database import Base, engine
-
-
-# 🔁 Reset DB before & after each test
-@pytest.fixture(autouse=True)
-def reset_db():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
+from pagination import encode_cursor
+from database import request_engine, SessionLocal
+from models import UserDB
+from auth import principal_cache
 
 
 @pytest.mark.asyncio
@@ -85,3 +80,94 @@ async def test_complete_app_flow():
         assert data["completed_tasks"] == 0
         assert data["pending"] == 0
         assert data["completion_percentage"] == 0
+
+
+@pytest.mark.asyncio
+async def test_tasks_keyset_pagination(login):
+    transport = ASGITransport(app=app)
+
+    async with AsyncClient(
+        transport=transport,
+        base_url="http://test"
+    ) as client:
+
+        headers = await login(client)
+
+        # Duplicate and missing due dates exercise the (due_date, id) tie-break
+        due_dates = ["2030-01-02T00:00:00", None, "2030-01-01T00:00:00", "2030-01-02T00:00:00", None, "2030-01-03T00:00:00", "2030-01-01T00:00:00"]
+        for i, due in enumerate(due_dates):
+            await client.post("/tasks/", json={
+                "title": f"Task {i}",
+                "description": "long text",
+                "due_date": due
+            }, headers=headers)
+
+        r = await client.get("/tasks", params={"sort": "due_date"}, headers=headers)
+        expected = [t["id"] for t in r.json()]
+        assert len(expected) == len(due_dates)
+        assert "X-Next-Cursor" not in r.headers
+
+        # ---------- WALK PAGES ----------
+        seen = []
+        params = {"sort": "due_date", "limit": 2, "fields": "id,title,due_date"}
+        while True:
+            r = await client.get("/tasks", params=params, headers=headers)
+            assert r.status_code == 200
+            page = r.json()
+            assert all(set(t) == {"id", "title", "due_date"} for t in page)
+            seen.extend(t["id"] for t in page)
+            if "X-Next-Cursor" not in r.headers:
+                break
+            params["cursor"] = r.headers["X-Next-Cursor"]
+
+        assert seen == expected
+        assert [due_dates[i - 1] for i in seen][-2:] == [None, None]
+
+        # ---------- BAD INPUT ----------
+        r = await client.get("/tasks", params={"fields": "id,secret"}, headers=headers)
+        assert r.status_code == 400
+        r = await client.get("/tasks", params={"fields": ","}, headers=headers)
+        assert r.status_code == 400
+        r = await client.get("/tasks", params={"sort": "updated_at", "cursor": params["cursor"]}, headers=headers)
+        assert r.status_code == 400
+        for tampered in (["due_date", "asc", "garbage", 1], ["due_date", "asc", None, "x"], ["due_date", "asc", 5, 1]):
+            r = await client.get("/tasks", params={"sort": "due_date", "cursor": encode_cursor(*tampered)}, headers=headers)
+            assert r.status_code == 400 and r.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.asyncio
+async def test_authenticated_user_cache(login):
+    principal_cache.clear()
+    transport = ASGITransport(app=app)
+
+    async with AsyncClient(
+        transport=transport,
+        base_url="http://test"
+    ) as client:
+
+        headers = await login(client)
+
+        user_lookups = []
+
+        def count_user_lookups(conn, cursor, statement, parameters, context, executemany):
+            # The principal lookup (not the task data-version read, which also hits users)
+            if statement.lstrip().startswith("SELECT") and "users.username" in statement:
+                user_lookups.append(statement)
+
+        event.listen(request_engine, "before_cursor_execute", count_user_lookups)
+        try:
+            for _ in range(3):
+                r = await client.get("/tasks", headers=headers)
+                assert r.status_code == 200
+        finally:
+            event.remove(request_engine, "before_cursor_execute", count_user_lookups)
+        assert len(user_lookups) == 1
+
+        # ---------- DELETING THE USER DROPS THE CACHED PRINCIPAL ----------
+        db = SessionLocal()
+        db.delete(db.query(UserDB).filter(UserDB.username == "u1").one())
+        db.commit()
+        db.close()
+
+        r = await client.get("/tasks", headers=headers)
+        assert r.status_code == 401
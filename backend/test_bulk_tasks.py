@@ -0,0 +1,177 @@
+import threading
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient, ASGITransport
+import task_bulk
+import task_counters
+from main import app, _delete_task
+from database import SessionLocal
+from models import TaskDB, TaskTombstoneDB, UserDB
+from schema import BulkTaskRequest
+
+
+pytestmark = pytest.mark.usefixtures("enable_counters")
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_then_update_and_delete(login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client, "u1")
+
+        r = await client.post("/tasks/bulk", json={
+            "operations": [{"op": "create", "task": {"title": f"Task {i}"}} for i in range(1200)]
+        }, headers=headers)
+        assert r.status_code == 200
+        body = r.json()
+        assert body["committed"] and body["succeeded"] == 1200
+        ids = [item["id"] for item in body["results"]]
+        assert len(set(ids)) == 1200
+
+        r = await client.get("/tasks", params={"limit": 1}, headers=headers)
+        assert r.json()[0]["id"] == ids[0] and r.json()[0]["title"] == "Task 0"
+
+        r = await client.post("/tasks/bulk", json={"operations": [
+            {"op": "complete", "id": ids[0]},
+            {"op": "complete", "id": ids[1]},
+            {"op": "reopen", "id": ids[1]},
+            {"op": "complete", "id": ids[2]},
+            {"op": "delete", "id": ids[2]},
+            {"op": "delete", "id": ids[3]},
+        ]}, headers=headers)
+        assert r.json()["committed"] and r.json()["failed"] == 0
+
+        r = await client.get("/tasks", params={"limit": 3}, headers=headers)
+        assert [(t["id"], t["status"]) for t in r.json()] == [
+            (ids[0], "completed"), (ids[1], "pending"), (ids[4], "pending")
+        ]
+
+        r = await client.get("/tasks/progress", headers=headers)
+        assert r.json()["total_tasks"] == 1198
+        assert r.json()["completed_tasks"] == 1
+
+    db = SessionLocal()
+    assert task_counters.check_consistency(db) == []
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_bulk_modes_on_failed_operations(login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        other = await login(client, "u2")
+        r = await client.post("/tasks/", json={"title": "Not yours"}, headers=other)
+        foreign_id = r.json()["id"]
+
+        headers = await login(client, "u1")
+        r = await client.post("/tasks/", json={"title": "Mine"}, headers=headers)
+        own_id = r.json()["id"]
+
+        operations = [
+            {"op": "create", "task": {"title": "New"}},
+            {"op": "complete", "id": own_id},
+            {"op": "delete", "id": foreign_id},
+        ]
+
+        r = await client.post("/tasks/bulk", json={"operations": operations}, headers=headers)
+        body = r.json()
+        assert not body["committed"] and body["failed"] == 3
+        assert body["results"][2]["error"] == "Task not found"
+        r = await client.get("/tasks", headers=headers)
+        assert [(t["title"], t["status"]) for t in r.json()] == [("Mine", "pending")]
+
+        r = await client.post("/tasks/bulk", json={"operations": operations, "mode": "best_effort"}, headers=headers)
+        body = r.json()
+        assert body["committed"] and body["succeeded"] == 2 and body["failed"] == 1
+        assert [item["ok"] for item in body["results"]] == [True, True, False]
+        r = await client.get("/tasks", headers=headers)
+        assert sorted((t["title"], t["status"]) for t in r.json()) == [("Mine", "completed"), ("New", "pending")]
+
+        r = await client.get("/tasks", headers=other)
+        assert len(r.json()) == 1
+
+        r = await client.post("/tasks/bulk", json={"operations": [{"op": "delete"}]}, headers=headers)
+        assert r.status_code == 200 and not r.json()["committed"]
+        assert "need an 'id'" in r.json()["results"][0]["error"]
+
+        r = await client.post("/tasks/bulk", json={"operations": []}, headers=headers)
+        assert r.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_best_effort_skips_malformed_operations(login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client, "u1")
+        r = await client.post("/tasks/", json={"title": "Mine"}, headers=headers)
+        own_id = r.json()["id"]
+
+        operations = [
+            {"op": "create", "task": {"title": "Good"}},
+            {"op": "create", "task": {"title": "   "}},
+            {"op": "complete", "id": "not-a-number"},
+            {"op": "archive", "id": own_id},
+            {"op": "complete", "id": own_id},
+            {"op": "create", "task": {"title": "Late", "due_date": "someday"}},
+        ]
+        r = await client.post("/tasks/bulk", json={"operations": operations, "mode": "best_effort"}, headers=headers)
+        assert r.status_code == 200
+        body = r.json()
+        assert body["committed"] and body["succeeded"] == 2 and body["failed"] == 4
+        results = body["results"]
+        assert [item["ok"] for item in results] == [True, False, False, False, True, False]
+        assert results[1]["op"] == "create" and "task.title" in results[1]["error"]
+        assert results[2]["error"].startswith("id:")
+        assert results[3]["op"] == "archive" and results[3]["error"].startswith("op:")
+        assert results[5]["error"].startswith("task.due_date:")
+
+        r = await client.get("/tasks", headers=headers)
+        assert sorted((t["title"], t["status"]) for t in r.json()) == [("Good", "pending"), ("Mine", "completed")]
+
+        # Atomic: the malformed items keep the good ones from being applied
+        r = await client.post("/tasks/bulk", json={"operations": operations}, headers=headers)
+        assert not r.json()["committed"] and r.json()["failed"] == 6
+
+
+def test_bulk_reads_statuses_under_the_user_lock(monkeypatch):
+    db = SessionLocal()
+    user = UserDB(username="u", email="u@test.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    task = TaskDB(user_id=user.id, title="A")
+    db.add(task)
+    db.commit()
+    user_id, task_id = user.id, task.id
+    assert task_counters.get_counts(db, user_id) == (1, 0)
+    db.close()
+
+    # A single delete of the same task starts just before the batch reads
+    # its statuses; it has to wait for the batch instead of slipping in
+    def delete_single():
+        session = SessionLocal()
+        try:
+            _delete_task(session, task_id, user_id)
+        except HTTPException:
+            pass
+        finally:
+            session.close()
+
+    thread = threading.Thread(target=delete_single)
+    load_statuses = task_bulk._load_statuses
+
+    def load_after_racing_delete(*args):
+        thread.start()
+        thread.join(timeout=0.5)
+        return load_statuses(*args)
+
+    monkeypatch.setattr(task_bulk, "_load_statuses", load_after_racing_delete)
+
+    db = SessionLocal()
+    request = BulkTaskRequest(operations=[{"op": "delete", "id": task_id}])
+    response = task_bulk.apply_bulk(db, user_id, request.operations, request.mode)
+    db.close()
+    thread.join()
+
+    assert response.committed and response.results[0].ok
+    db = SessionLocal()
+    assert task_counters.get_counts(db, user_id) == (0, 0)
+    assert task_counters.check_consistency(db) == []
+    assert db.query(TaskTombstoneDB).count() == 1
+    db.close()
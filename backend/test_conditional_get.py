@@ -0,0 +1,49 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from main import app
+
+
+@pytest.mark.asyncio
+async def test_task_reads_revalidate_with_etags(login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client)
+        await client.post("/tasks/", json={"title": "A"}, headers=headers)
+
+        for path, params in [("/tasks", {}), ("/tasks", {"limit": 1}), ("/tasks/progress", {})]:
+            r = await client.get(path, params=params, headers=headers)
+            assert r.status_code == 200
+            etag = r.headers["ETag"]
+            assert etag.startswith('"') and r.headers["Cache-Control"] == "private, no-cache"
+
+            r = await client.get(path, params=params, headers={**headers, "If-None-Match": etag})
+            assert r.status_code == 304 and r.content == b""
+            assert r.headers["ETag"] == etag
+
+        r = await client.get("/tasks", headers=headers)
+        first = r.headers["ETag"]
+        r = await client.get("/tasks", params={"limit": 1}, headers=headers)
+        assert r.headers["ETag"] != first
+
+        # Any task write changes the data version
+        await client.post("/tasks/", json={"title": "B"}, headers=headers)
+        r = await client.get("/tasks", headers={**headers, "If-None-Match": first})
+        assert r.status_code == 200 and len(r.json()) == 2
+        assert r.headers["ETag"] != first
+
+
+@pytest.mark.asyncio
+async def test_ai_endpoints_skip_llm_when_not_modified(llm_calls, login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client)
+        await client.post("/tasks/", json={"title": "A"}, headers=headers)
+
+        for path in ["/ai/task-summary", "/ai/priorities", "/ai/daily-plan"]:
+            r = await client.get(path, headers=headers)
+            assert r.status_code == 200
+            etag = r.headers["ETag"]
+            assert etag.startswith('W/"')
+            calls = len(llm_calls)
+
+            r = await client.get(path, headers={**headers, "If-None-Match": etag})
+            assert r.status_code == 304
+            assert len(llm_calls) == calls
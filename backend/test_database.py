@@ -0,0 +1,51 @@
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+import database
+from main import app
+
+
+@pytest_asyncio.fixture(params=["sync", "async"])
+async def db_mode(request, monkeypatch):
+    """Serve requests through each DBHandle, whatever DB_MODE the suite runs under."""
+    monkeypatch.setattr(database, "DB_MODE", request.param)
+    if request.param == "sync":
+        yield request.param
+        return
+
+    async_engine = database.create_async_db_engine()
+    monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(async_engine, expire_on_commit=False))
+    yield request.param
+    await async_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_task_round_trip_in_each_db_mode(db_mode, login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client)
+
+        r = await client.post("/tasks/", json={"title": f"Written in {db_mode} mode"}, headers=headers)
+        assert r.status_code == 200
+        task_id = r.json()["id"]
+
+        r = await client.patch(f"/tasks/{task_id}/complete", headers=headers)
+        assert r.json()["status"] == "completed"
+
+        r = await client.get("/tasks", headers=headers)
+        assert [(t["id"], t["title"], t["status"]) for t in r.json()] == [
+            (task_id, f"Written in {db_mode} mode", "completed")
+        ]
+
+
+def test_sqlite_pragmas_on_a_fresh_connection(tmp_path, monkeypatch):
+    expected = {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000}  # synchronous=NORMAL
+    for pragma in expected:
+        monkeypatch.delenv(f"SQLITE_{pragma.upper()}", raising=False)
+    bind = database.create_db_engine(f"sqlite:///{tmp_path / 'fresh.db'}", "tuned")
+    try:
+        with bind.connect() as conn:
+            assert {pragma: conn.execute(text(f"PRAGMA {pragma}")).scalar() for pragma in expected} == expected
+    finally:
+        bind.dispose()
@@ -0,0 +1,197 @@
+import json
+import time
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import ai_assistant
+from ai_assistant import close_llm_client, PROVIDER_ERROR_REPLY
+from llm_router import CircuitBreaker
+
+
+class FaultyHandler(BaseHTTPRequestHandler):
+    """Chat/completions (JSON) or free-API (plain text) stub with injectable faults."""
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server.hits += 1
+        time.sleep(server.delay)
+
+        status = server.status
+        if server.fail_times > 0:
+            server.fail_times -= 1
+            status = 503
+        if self.path.endswith("/chat/completions"):
+            body = json.dumps({"choices": [{"message": {"content": server.reply}}]})
+        else:
+            body = server.reply
+
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubProvider(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, reply):
+        super().__init__(("127.0.0.1", 0), FaultyHandler)
+        self.reply = reply
+        self.status = 200
+        self.delay = 0.0
+        self.fail_times = 0
+        self.hits = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def handle_error(self, request, client_address):
+        # Hedged requests that lost get cancelled mid-response
+        pass
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    api, free = StubProvider("from api"), StubProvider("from free")
+    monkeypatch.setattr(ai_assistant, "AI_API_KEY", "test-key")
+    monkeypatch.setattr(ai_assistant, "AI_BASE_URL", api.url + "v1/")
+    monkeypatch.setattr(ai_assistant, "FREE_AI_URL", free.url)
+    yield api, free
+    api.shutdown()
+    free.shutdown()
+
+
+@pytest.fixture
+def use_router(monkeypatch):
+    def build(**settings):
+        settings = {"deadline": 3, "retries": 0, "retry_backoff": 0.01, **settings}
+        router = ai_assistant._build_router(**settings)
+        monkeypatch.setattr(ai_assistant, "_router", router)
+        return router
+    return build
+
+
+@pytest.mark.asyncio
+async def test_breaker_skips_failing_provider_until_it_recovers(stubs, use_router, caplog):
+    api, free = stubs
+    router = use_router(failure_threshold=2, reset_timeout=0.3)
+    api.status = 500
+
+    for _ in range(2):
+        assert await ai_assistant._call_llm("hi") == "from free"
+    assert api.hits == 2
+    failures = [r for r in caplog.records if r.name == "llm_router" and r.levelname == "WARNING"]
+    assert len(failures) == 2 and "'api' failed: HTTP 500" in failures[0].getMessage()
+    assert ai_assistant.provider_stats()["api"]["state"] == "open"
+
+    # Open: the failing provider is not even tried
+    assert await ai_assistant._call_llm("hi") == "from free"
+    assert api.hits == 2
+    assert ai_assistant.provider_stats()["api"]["rejected"] == 1
+
+    # After the cool-down the next request is a trial; its success closes it
+    api.status = 200
+    time.sleep(0.3)
+    assert router.providers["api"].breaker.state == "half_open"
+    assert await ai_assistant._call_llm("hi") == "from api"
+    stats = ai_assistant.provider_stats()["api"]
+    assert stats["state"] == "closed"
+    assert stats["successes"] == 1 and stats["failures"] == 2
+    assert stats["latency_ms"]["p50"] > 0
+
+    await close_llm_client()
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    # Concurrent requests wait for the trial; its failure opens the breaker again
+    now[0] = 10
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    # A trial that never reports back stops blocking after another cool-down
+    now[0] = 20
+    assert breaker.allow()
+    now[0] = 25
+    assert not breaker.allow()
+    now[0] = 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried_others_are_not(stubs, use_router):
+    api, free = stubs
+    use_router(retries=2)
+
+    api.fail_times = 1
+    assert await ai_assistant._call_llm("hi") == "from api"
+    assert api.hits == 2
+    assert ai_assistant.provider_stats()["api"]["retries"] == 1
+
+    # A rejected key will not get better by retrying
+    api.status = 401
+    assert await ai_assistant._call_llm("hi") == "from free"
+    assert api.hits == 3
+
+    await close_llm_client()
+
+
+@pytest.mark.asyncio
+async def test_timeout_leaves_budget_for_the_next_provider(stubs, use_router):
+    api, free = stubs
+    use_router(api_timeout=0.3, retries=2)
+    api.delay = 2
+
+    started = time.perf_counter()
+    assert await ai_assistant._call_llm("hi") == "from free"
+    assert time.perf_counter() - started < 1.5
+    # Timeouts are not retried on the same provider
+    assert api.hits == 1
+    assert ai_assistant.provider_stats()["api"]["timeouts"] == 1
+
+    await close_llm_client()
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_the_whole_call(stubs, use_router):
+    api, free = stubs
+    use_router(deadline=0.5)
+    api.delay = free.delay = 2
+
+    started = time.perf_counter()
+    assert await ai_assistant._call_llm("hi") == PROVIDER_ERROR_REPLY
+    assert time.perf_counter() - started < 1.5
+
+    await close_llm_client()
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_over_slow_provider(stubs, use_router):
+    api, free = stubs
+    use_router(hedge_after=0.1)
+    api.delay = 1.5
+
+    started = time.perf_counter()
+    assert await ai_assistant._call_llm("hi") == "from free"
+    assert time.perf_counter() - started < 1.0
+
+    stats = ai_assistant.provider_stats()
+    assert stats["free"]["hedges"] == 1
+    # The cancelled loser is not counted against the slow provider
+    assert stats["api"]["failures"] == 0 and stats["api"]["state"] == "closed"
+
+    await close_llm_client()
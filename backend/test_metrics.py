@@ -0,0 +1,128 @@
+import re
+import pytest
+from httpx import AsyncClient, ASGITransport
+import main
+from main import app
+from llm_router import ProviderRouter, ProviderError
+from metrics import Histogram, render
+
+
+@pytest.fixture
+def scrape(monkeypatch):
+    """Headers of an authorized Prometheus scrape."""
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-token")
+    return {"Authorization": "Bearer scrape-token"}
+
+
+def sample(text, name, **labels):
+    """Value of one series in a /metrics payload (0 if absent)."""
+    selector = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = "^" + re.escape(name + ("{" + selector + "}" if selector else "")) + r" (\S+)$"
+    match = re.search(pattern, text, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_latency_seconds", "Test.", ("route",), buckets=(0.1, 1.0), registry=[])
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value, "/x")
+    text = histogram.render()
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert sample(text, "test_latency_seconds_bucket", route="/x", le="0.1") == 1
+    assert sample(text, "test_latency_seconds_bucket", route="/x", le="1.0") == 3
+    assert sample(text, "test_latency_seconds_bucket", route="/x", le="+Inf") == 4
+    assert sample(text, "test_latency_seconds_count", route="/x") == 4
+    assert sample(text, "test_latency_seconds_sum", route="/x") == pytest.approx(4.25)
+
+
+@pytest.mark.asyncio
+async def test_requests_are_counted_per_route_template_with_db_work(scrape, login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client)
+        before = (await client.get("/metrics", headers=scrape)).text
+
+        r = await client.post("/tasks/", json={"title": "A"}, headers=headers)
+        await client.patch(f"/tasks/{r.json()['id']}", json={"title": "B"}, headers=headers)
+        await client.patch("/tasks/999999", json={"title": "B"}, headers=headers)
+        await client.get("/no/such/page")
+
+        r = await client.get("/metrics", headers=scrape)
+        assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+        after = r.text
+
+    def delta(name, **labels):
+        return sample(after, name, **labels) - sample(before, name, **labels)
+
+    route = {"method": "PATCH", "route": "/tasks/{task_id}"}
+    assert delta("http_requests_total", **route, status="200") == 1
+    assert delta("http_requests_total", **route, status="404") == 1
+    assert delta("http_request_duration_seconds_count", **route) == 2
+    assert delta("http_requests_total", method="GET", route="<unmatched>", status="404") == 1
+
+    # Both updates ran queries, and they were timed
+    assert delta("http_request_db_queries_count", **route) == 2
+    assert delta("http_request_db_queries_sum", **route) >= 2
+    assert delta("db_queries_total", operation="INSERT") >= 1
+    assert sample(after, "http_requests_in_flight") == 1  # the /metrics request itself
+    assert sample(after, "threadpool_threads", state="limit") > 0
+
+
+@pytest.mark.asyncio
+async def test_llm_provider_outcomes_and_fallback_path():
+    async def failing(request, timeout):
+        raise ProviderError("HTTP 503", retryable=False)
+
+    async def working(request, timeout):
+        return "ok"
+
+    router = ProviderRouter(deadline=2, failure_threshold=1, reset_timeout=60)
+    router.register("metrics-a", failing, timeout=1)
+    router.register("metrics-b", working, timeout=1)
+    before = render()
+
+    assert await router.call("hi", ["metrics-a", "metrics-b"]) == "ok"
+    # The breaker is open now: a is skipped outright
+    assert await router.call("hi", ["metrics-a", "metrics-b"]) == "ok"
+    assert await router.call("hi", ["metrics-a"]) is None
+
+    after = render()
+
+    def delta(name, **labels):
+        return sample(after, name, **labels) - sample(before, name, **labels)
+
+    assert delta("llm_provider_requests_total", provider="metrics-a", outcome="error") == 1
+    assert delta("llm_provider_requests_total", provider="metrics-a", outcome="rejected") == 2
+    assert delta("llm_provider_requests_total", provider="metrics-b", outcome="success") == 2
+    assert delta("llm_provider_latency_seconds_count", provider="metrics-b") == 2
+    assert delta("llm_calls_total", path="fallback") == 2
+    assert delta("llm_calls_total", path="none") == 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_need_a_token_unless_made_public(monkeypatch):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        # Neither a token nor METRICS_PUBLIC: not served
+        assert (await client.get("/metrics")).status_code == 404
+
+        monkeypatch.setattr(main, "METRICS_PUBLIC", True)
+        assert (await client.get("/metrics")).status_code == 200
+
+        monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-token")
+        assert (await client.get("/metrics")).status_code == 401
+        assert (await client.get("/metrics", headers={"Authorization": "Bearer guess"})).status_code == 401
+        r = await client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+        assert r.status_code == 200 and "http_requests_total" in r.text
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/ai/providers", "/ai/coalescing"])
+async def test_ai_operator_endpoints_are_guarded_like_metrics(path, monkeypatch, login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        user = await login(client)
+        assert (await client.get(path, headers=user)).status_code == 404
+
+        monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-token")
+        # A user's session token is not the metrics token
+        assert (await client.get(path, headers=user)).status_code == 401
+        r = await client.get(path, headers={"Authorization": "Bearer scrape-token"})
+        assert r.status_code == 200 and isinstance(r.json(), dict)
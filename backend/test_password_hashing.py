@@ -0,0 +1,47 @@
+import pytest
+from datetime import datetime, timezone
+from httpx import AsyncClient, ASGITransport
+from passlib.hash import bcrypt
+import security
+from main import app
+from database import SessionLocal
+from models import UserDB
+from config import BCRYPT_ROUNDS
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password_hash():
+    old_rounds = 4 if BCRYPT_ROUNDS != 4 else 5
+    db = SessionLocal()
+    db.add(UserDB(
+        username="u1",
+        email="u1@test.com",
+        password_hash=bcrypt.using(rounds=old_rounds).hash("StrongPass123"),
+        created_at=datetime.now(timezone.utc)
+    ))
+    db.commit()
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        r = await client.post("/login", json={"username": "u1", "password": "StrongPass123"})
+        assert r.status_code == 200
+
+    db.expire_all()
+    new_hash = db.query(UserDB.password_hash).filter(UserDB.username == "u1").scalar()
+    db.close()
+    assert bcrypt.from_string(new_hash).rounds == BCRYPT_ROUNDS
+    assert security.verify_password("StrongPass123", new_hash)
+
+
+@pytest.mark.asyncio
+async def test_saturated_hashing_pool_returns_429(monkeypatch):
+    monkeypatch.setattr(security, "PASSWORD_HASH_MAX_PENDING", 0)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        r = await client.post("/register", json={
+            "username": "u1",
+            "email": "u1@test.com",
+            "password": "StrongPass123"
+        })
+
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == "1"
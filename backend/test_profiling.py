@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+from httpx import AsyncClient, ASGITransport
+import ai_assistant
+import main
+import profiling
+from main import app
+from database import request_engine
+from llm_router import ProviderRouter
+from profiling import ProfilingMiddleware
+
+ADMIN = {"X-Admin-Token": "s3cret"}
+
+
+@pytest.fixture
+def profiled(monkeypatch):
+    """The app behind the profiling middleware, as with PROFILING_ENABLED=true."""
+    monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(profiling, "PROFILE_SLOW_MS", 10_000)
+    profiling.instrument_engine(request_engine)
+    profiling.clear_profiles()
+    yield AsyncClient(transport=ASGITransport(app=ProfilingMiddleware(app)), base_url="http://test")
+    profiling.clear_profiles()
+
+
+@pytest.mark.asyncio
+async def test_flagged_request_records_span_breakdown(profiled, login):
+    async with profiled as client:
+        headers = await login(client)
+        await client.post("/tasks/", json={"title": "A"}, headers=headers)
+
+        # Fast requests are not kept unless flagged
+        assert (await client.get("/admin/profiles", headers=ADMIN)).json() == []
+
+        r = await client.get("/tasks", headers={**headers, "X-Profile": "s3cret"})
+        assert r.status_code == 200 and r.json()[0]["title"] == "A"
+        profile_id = r.headers["X-Profile-Id"]
+
+        # A wrong token neither flags the request nor opens the admin API
+        r = await client.get("/tasks", headers={**headers, "X-Profile": "guess"})
+        assert "X-Profile-Id" not in r.headers
+        assert (await client.get("/admin/profiles", headers={"X-Admin-Token": "guess"})).status_code == 401
+
+        summaries = (await client.get("/admin/profiles", headers=ADMIN)).json()
+        assert [p["id"] for p in summaries] == [int(profile_id)]
+        assert "spans" not in summaries[0]
+
+        profile = (await client.get(f"/admin/profiles/{profile_id}", headers=ADMIN)).json()
+
+    assert profile["route"] == "/tasks" and profile["status"] == 200 and profile["reason"] == "flagged"
+    assert {"auth", "db", "serialize"} <= set(profile["breakdown"])
+    assert profile["breakdown"]["serialize"]["count"] == 1
+    assert any(s["kind"] == "db" and s["detail"].startswith("SELECT") for s in profile["spans"])
+    assert 0 <= profile["unaccounted_ms"] <= profile["duration_ms"]
+    assert profile["flamegraph"] is None
+
+
+@pytest.mark.asyncio
+async def test_slow_requests_are_kept_with_upstream_and_bcrypt_spans(profiled, monkeypatch, login):
+    async def slow_provider(request, timeout):
+        await asyncio.sleep(0.2)
+        return "hello"
+
+    router = ProviderRouter(deadline=5)
+    router.register("free", slow_provider, timeout=5)
+    monkeypatch.setattr(ai_assistant, "_router", router)
+    monkeypatch.setattr(profiling, "PROFILE_SLOW_MS", 150)
+
+    async with profiled as client:
+        headers = await login(client)
+        r = await client.post("/ai/chat", json={"message": "hi"}, headers=headers)
+        assert r.json()["reply"] == "hello"
+        summaries = (await client.get("/admin/profiles", headers=ADMIN)).json()
+
+    chat = next(p for p in summaries if p["route"] == "/ai/chat")
+    assert chat["reason"] == "slow"
+    assert chat["breakdown"]["upstream"]["total_ms"] >= 200
+    # The bcrypt logins may or may not have been slow enough to keep
+    for p in summaries:
+        if p["route"] == "/login":
+            assert p["breakdown"]["bcrypt"]["count"] == 1
+    await ai_assistant.close_llm_client()
+
+
+@pytest.mark.asyncio
+async def test_flamegraph_is_sampled_for_flagged_requests(profiled, monkeypatch, login):
+    monkeypatch.setattr(profiling, "PROFILE_FLAMEGRAPH", True)
+    monkeypatch.setattr(profiling._sampler, "interval", 0.001)
+
+    async with profiled as client:
+        headers = await login(client)
+        for i in range(200):
+            await client.post("/tasks/", json={"title": f"T{i}"}, headers=headers)
+        r = await client.get("/tasks", headers={**headers, "X-Profile": "s3cret"})
+        profile_id = r.headers["X-Profile-Id"]
+
+        r = await client.get(f"/admin/profiles/{profile_id}", params={"format": "folded"}, headers=ADMIN)
+        assert r.status_code == 200
+        lines = r.text.splitlines()
+        assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert any(line.startswith("MainThread;") for line in lines)
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoints_are_hidden_without_a_token(profiled, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "")
+    async with profiled as client:
+        assert (await client.get("/admin/profiles", headers={"X-Admin-Token": ""})).status_code == 404
@@ -0,0 +1,90 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from httpx import AsyncClient, ASGITransport
+import ai_assistant
+from main import app
+from prompt_context import build_task_context, estimate_tokens, rank_tasks
+from task_context import TaskContext
+
+NOW = datetime(2026, 10, 17, 9, 0, tzinfo=timezone.utc)
+
+
+def task(title, status="pending", due_in_days=None, updated_days_ago=30, description=None):
+    due = NOW + timedelta(days=due_in_days) if due_in_days is not None else None
+    # Naive UTC, as SQLite returns them
+    return TaskContext(
+        title, status,
+        due.replace(tzinfo=None) if due else None,
+        description,
+        (NOW - timedelta(days=updated_days_ago)).replace(tzinfo=None)
+    )
+
+
+def test_urgent_tasks_rank_first():
+    tasks = [
+        task("Someday: learn piano"),
+        task("Renew passport", due_in_days=-2),
+        task("Dentist", due_in_days=0.5),
+        task("Water plants", updated_days_ago=0),
+        task("Pay rent", status="completed", due_in_days=-1),
+        task("Book flights", due_in_days=5),
+    ]
+    ranked = [t.title for t, _ in rank_tasks(tasks, now=NOW)]
+    assert ranked[:4] == ["Renew passport", "Dentist", "Book flights", "Water plants"]
+    # Finished tasks matter least
+    assert ranked[-2:] == ["Someday: learn piano", "Pay rent"]
+
+
+def test_keyword_overlap_beats_urgency_and_quotes_description():
+    tasks = [
+        task("Renew passport", due_in_days=-2),
+        task("Quarterly reports", description="Numbers for the board meeting"),
+    ]
+    ranked = rank_tasks(tasks, query="What should I put in the report for the board?", now=NOW)
+    assert ranked[0][0].title == "Quarterly reports" and ranked[0][1] > 0
+
+    context = build_task_context(tasks, query="report for the board", now=NOW)
+    assert context.splitlines()[0] == "- Quarterly reports (pending): Numbers for the board meeting"
+    assert "- Renew passport (pending, due 2026-10-15 09:00, overdue)" in context
+
+
+def test_context_fits_the_token_budget():
+    tasks = [task(f"Task number {i} with a moderately long title") for i in range(100)]
+    tasks.append(task("Call mom", due_in_days=-1))
+
+    context = build_task_context(tasks, budget=120, now=NOW)
+    lines = context.splitlines()
+    assert estimate_tokens(context) <= 120
+    assert lines[0].startswith("- Call mom")
+    assert lines[-1] == f"(+{len(tasks) - len(lines) + 1} more notes not shown)"
+
+    assert build_task_context([], now=NOW) == "(no notes)"
+
+
+def test_estimate_tokens_errs_high():
+    # Typical BPE tokenizers need ~10 tokens for this sentence
+    assert 10 <= estimate_tokens("Summarize these notes for me, please.") <= 16
+    assert estimate_tokens("") == 0
+
+
+@pytest.mark.asyncio
+async def test_chat_prompt_includes_the_relevant_task(monkeypatch, login):
+    prompts = []
+
+    async def fake_llm(prompt, system_message="", **kwargs):
+        prompts.append(prompt)
+        return "ok"
+    monkeypatch.setattr(ai_assistant, "_call_llm", fake_llm)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client)
+
+        await client.post("/tasks/", json={"title": "Plan garden layout"}, headers=headers)
+        for i in range(30):
+            await client.post("/tasks/", json={"title": f"Errand {i}"}, headers=headers)
+
+        await client.post("/ai/chat", json={"message": "Ideas for my garden?"}, headers=headers)
+        assert prompts[0].splitlines()[1] == "- Plan garden layout (pending)"
+
+        await client.get("/ai/daily-plan", headers=headers)
+        assert "MY PENDING NOTES:\n- " in prompts[1]
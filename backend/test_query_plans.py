@@ -0,0 +1,78 @@
+import re
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event
+import ai_assistant
+from main import app
+from database import engine, request_engine
+
+pytestmark = pytest.mark.skipif(
+    engine.dialect.name != "sqlite",
+    reason="EXPLAIN QUERY PLAN is SQLite specific"
+)
+
+# A plan step that walks a whole table (or a whole index of it)
+FULL_SCAN = re.compile(r"^SCAN (tasks|users)\b")
+
+
+@pytest.fixture
+def captured_statements(monkeypatch):
+    async def fake_llm(prompt, system_message="", **kwargs):
+        return "ok"
+    monkeypatch.setattr(ai_assistant, "_call_llm", fake_llm)
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and re.match(r"\s*(SELECT|UPDATE|DELETE)", statement, re.I):
+            statements.append((statement, parameters))
+
+    event.listen(request_engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(request_engine, "before_cursor_execute", capture)
+
+
+def explain(statement, parameters):
+    with engine.connect() as conn:
+        cursor = conn.connection.driver_connection.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[3] for row in cursor.fetchall()]
+
+
+@pytest.mark.asyncio
+async def test_endpoint_queries_use_indexes(captured_statements, login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client)
+
+        r = await client.post("/tasks/", json={"title": "A", "due_date": "2030-01-01T00:00:00"}, headers=headers)
+        task_id = r.json()["id"]
+        await client.post("/tasks/", json={"title": "B"}, headers=headers)
+
+        await client.get("/tasks", headers=headers)
+        await client.get("/tasks", params={"overdue": True}, headers=headers)
+        await client.get("/tasks", params={"today": True}, headers=headers)
+        await client.get("/tasks", params={"upcoming": 7, "sort": "due_date", "limit": 1}, headers=headers)
+        r = await client.get("/tasks", params={"sort": "updated_at", "order": "desc", "limit": 1}, headers=headers)
+        await client.get("/tasks", params={
+            "sort": "updated_at", "order": "desc", "limit": 1, "cursor": r.headers["X-Next-Cursor"]
+        }, headers=headers)
+        await client.get("/tasks/progress", headers=headers)
+
+        await client.patch(f"/tasks/{task_id}", json={"title": "A2"}, headers=headers)
+        await client.patch(f"/tasks/{task_id}/complete", headers=headers)
+        await client.patch(f"/tasks/{task_id}/reopen", headers=headers)
+
+        await client.get("/ai/task-summary", headers=headers)
+        await client.get("/ai/priorities", headers=headers)
+        await client.get("/ai/daily-plan", headers=headers)
+        await client.post("/ai/chat", json={"message": "hi"}, headers=headers)
+
+        await client.delete(f"/tasks/{task_id}", headers=headers)
+
+        r = await client.get("/tasks/changes", params={"limit": 1}, headers=headers)
+        await client.get("/tasks/changes", params={"since": r.json()["cursor"]}, headers=headers)
+
+    assert captured_statements
+    for statement, parameters in captured_statements:
+        for step in explain(statement, parameters):
+            assert not FULL_SCAN.match(step), f"Full scan ({step}) in:\n{statement}"
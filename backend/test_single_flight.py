@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+import ai_assistant
+from single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution():
+    flights = SingleFlight()
+    runs = []
+
+    async def work(value):
+        runs.append(value)
+        await asyncio.sleep(0.05)
+        return value
+
+    results = await asyncio.gather(
+        flights.do("a", lambda: work("A")),
+        flights.do("a", lambda: work("A")),
+        flights.do("a", lambda: work("A")),
+        flights.do("b", lambda: work("B")),
+    )
+    assert results == ["A", "A", "A", "B"]
+    assert sorted(runs) == ["A", "B"]
+    assert flights.stats() == {"calls": 4, "executions": 2, "coalesced": 2, "in_flight": 0}
+
+    # Finished calls are not reused
+    assert await flights.do("a", lambda: work("again")) == "again"
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    results = await asyncio.gather(flights.do("k", fail), flights.do("k", fail), return_exceptions=True)
+    assert [type(r) for r in results] == [ValueError, ValueError]
+    assert flights.stats()["executions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_the_others():
+    flights = SingleFlight()
+    started = asyncio.Event()
+
+    async def work():
+        started.set()
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.create_task(flights.do("k", work))
+    await started.wait()
+    second = asyncio.create_task(flights.do("k", work))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    assert await second == "done"
+
+    # With every waiter gone the shared call itself is cancelled
+    lonely = asyncio.create_task(flights.do("k", work))
+    await asyncio.sleep(0.01)
+    lonely.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await lonely
+    assert flights.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_call_llm_coalesces_identical_prompts(monkeypatch):
+    upstream = []
+
+    async def fake_providers(prompt, system_message):
+        upstream.append(prompt)
+        await asyncio.sleep(0.05)
+        return f"reply to {prompt}"
+
+    monkeypatch.setattr(ai_assistant, "_call_providers", fake_providers)
+    monkeypatch.setattr(ai_assistant, "_llm_flights", SingleFlight())
+
+    replies = await asyncio.gather(
+        *[ai_assistant._call_llm("summarize", "system") for _ in range(5)],
+        ai_assistant._call_llm("summarize", "another system message"),
+    )
+    assert replies == ["reply to summarize"] * 6
+    assert len(upstream) == 2
+    assert ai_assistant.coalescing_stats()["coalesced"] == 4
@@ -0,0 +1,107 @@
+import re
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event
+import task_counters
+from main import app
+from database import request_engine
+
+
+@pytest.fixture
+def statements():
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not re.match(r"\s*PRAGMA", statement, re.I):
+            captured.append(statement)
+
+    event.listen(request_engine, "before_cursor_execute", capture)
+    yield captured
+    event.remove(request_engine, "before_cursor_execute", capture)
+
+
+async def _signed_in(client, login):
+    headers = await login(client)
+    # Warm the authenticated-user cache so only the endpoint's own work is counted
+    await client.get("/tasks/progress", headers=headers)
+    return headers
+
+
+def _is_sequence_bump(statement):
+    return statement.startswith("UPDATE users SET task_change_seq")
+
+
+async def _count(statements, request):
+    """Response and task statements of one request; every write also takes a change sequence number."""
+    statements.clear()
+    r = await request
+    if r.request.method != "GET":
+        assert sum(map(_is_sequence_bump, statements)) == 1
+    return r, [s for s in statements if not _is_sequence_bump(s)]
+
+
+@pytest.mark.asyncio
+async def test_task_write_statement_counts(statements, monkeypatch, login):
+    # The counts below are without counters, whatever the environment says
+    monkeypatch.setattr(task_counters, "TASK_COUNTERS_ENABLED", False)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await _signed_in(client, login)
+
+        r, sql = await _count(statements, client.post("/tasks/", json={"title": "A"}, headers=headers))
+        assert r.status_code == 200 and r.json()["title"] == "A"
+        assert len(sql) == 1 and "RETURNING" in sql[0]
+        task_id = r.json()["id"]
+
+        r, sql = await _count(statements, client.patch(f"/tasks/{task_id}", json={"title": "B"}, headers=headers))
+        assert r.status_code == 200 and r.json()["title"] == "B"
+        assert len(sql) == 1
+
+        r, sql = await _count(statements, client.patch(f"/tasks/{task_id}/complete", headers=headers))
+        assert r.status_code == 200 and r.json()["status"] == "completed"
+        assert len(sql) == 1
+
+        r, sql = await _count(statements, client.patch(f"/tasks/{task_id}/reopen", headers=headers))
+        assert r.status_code == 200 and r.json()["status"] == "pending"
+        assert len(sql) == 1
+
+        r, sql = await _count(statements, client.patch("/tasks/999999/complete", headers=headers))
+        assert r.status_code == 404
+        assert len(sql) == 1
+
+        r, sql = await _count(statements, client.delete(f"/tasks/{task_id}", headers=headers))
+        assert r.status_code == 200
+        assert len(sql) == 2  # delete + tombstone
+
+        r, sql = await _count(statements, client.get("/tasks", headers=headers))
+        assert r.json() == []
+        assert len(sql) == 2  # data version (for the ETag) + list
+
+        r, sql = await _count(statements, client.get("/tasks", headers={**headers, "If-None-Match": r.headers["ETag"]}))
+        assert r.status_code == 304
+        assert len(sql) == 1
+
+
+@pytest.mark.asyncio
+async def test_counted_writes_add_only_counter_statements(statements, monkeypatch, login):
+    monkeypatch.setattr(task_counters, "TASK_COUNTERS_ENABLED", True)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await _signed_in(client, login)
+
+        r, sql = await _count(statements, client.post("/tasks/", json={"title": "A"}, headers=headers))
+        task_id = r.json()["id"]
+        assert len(sql) == 2  # insert + counters update
+
+        # Status changes read the previous status to compute the delta
+        r, sql = await _count(statements, client.patch(f"/tasks/{task_id}/complete", headers=headers))
+        assert len(sql) == 3
+
+        r, sql = await _count(statements, client.patch(f"/tasks/{task_id}", json={"title": "B"}, headers=headers))
+        assert len(sql) == 1
+
+        r, sql = await _count(statements, client.delete(f"/tasks/{task_id}", headers=headers))
+        assert len(sql) == 3  # delete + tombstone + counters update
+
+        r = await client.get("/tasks/progress", headers=headers)
+        assert r.json()["total_tasks"] == 0 and r.json()["completed_tasks"] == 0
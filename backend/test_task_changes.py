@@ -0,0 +1,143 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import create_engine, inspect, text, update
+from main import app
+import migrations
+from database import Base, SessionLocal
+from models import TaskTombstoneDB
+from task_changes import prune_tombstones
+
+
+@pytest.mark.asyncio
+async def test_changes_since_cursor(login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client, "u1")
+        other = await login(client, "u2")
+
+        ids = []
+        for title in ["A", "B", "C"]:
+            r = await client.post("/tasks/", json={"title": title}, headers=headers)
+            ids.append(r.json()["id"])
+        await client.post("/tasks/", json={"title": "Other"}, headers=other)
+
+        # Initial sync: everything, no deletes
+        r = await client.get("/tasks/changes", headers=headers)
+        body = r.json()
+        assert [t["title"] for t in body["upserts"]] == ["A", "B", "C"]
+        assert body["deleted"] == [] and not body["has_more"]
+        cursor = body["cursor"]
+
+        # Nothing new yet: same cursor back
+        r = await client.get("/tasks/changes", params={"since": cursor}, headers=headers)
+        assert r.json()["upserts"] == [] and r.json()["cursor"] == cursor
+
+        await client.patch(f"/tasks/{ids[0]}/complete", headers=headers)
+        await client.delete(f"/tasks/{ids[1]}", headers=headers)
+        await client.post("/tasks/bulk", json={"operations": [
+            {"op": "create", "task": {"title": "D"}},
+            {"op": "delete", "id": ids[2]},
+        ]}, headers=headers)
+
+        r = await client.get("/tasks/changes", params={"since": cursor}, headers=headers)
+        body = r.json()
+        assert [(t["title"], t["status"]) for t in body["upserts"]] == [("A", "completed"), ("D", "pending")]
+        assert sorted(body["deleted"]) == [ids[1], ids[2]]
+
+        # Paging one change at a time sees the same changes, in sequence order
+        seen, cursor_page = [], cursor
+        while True:
+            r = await client.get("/tasks/changes", params={"since": cursor_page, "limit": 1}, headers=headers)
+            page = r.json()
+            seen += [("upsert", t["id"]) for t in page["upserts"]] + [("delete", i) for i in page["deleted"]]
+            cursor_page = page["cursor"]
+            if not page["has_more"]:
+                break
+        assert seen[:2] == [("upsert", ids[0]), ("delete", ids[1])]
+        assert len(seen) == 4
+
+        r = await client.get("/tasks/changes", params={"since": "not-a-cursor"}, headers=headers)
+        assert r.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_initial_sync_skips_tombstones_and_continues_from_its_start(login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client, "u1")
+
+        ids = []
+        for title in ["A", "B", "C", "D"]:
+            r = await client.post("/tasks/", json={"title": title}, headers=headers)
+            ids.append(r.json()["id"])
+        await client.delete(f"/tasks/{ids[3]}", headers=headers)
+
+        r = await client.get("/tasks/changes", params={"limit": 2}, headers=headers)
+        first = r.json()
+        assert [t["title"] for t in first["upserts"]] == ["A", "B"]
+        assert first["deleted"] == [] and first["has_more"]
+
+        # Deleted while paging: the rest of the initial sync leaves it out,
+        # the first incremental sync after it reports it
+        await client.delete(f"/tasks/{ids[0]}", headers=headers)
+        r = await client.get("/tasks/changes", params={"since": first["cursor"]}, headers=headers)
+        rest = r.json()
+        assert [t["title"] for t in rest["upserts"]] == ["C"]
+        assert rest["deleted"] == [] and not rest["has_more"]
+
+        r = await client.get("/tasks/changes", params={"since": rest["cursor"]}, headers=headers)
+        assert r.json()["upserts"] == [] and r.json()["deleted"] == [ids[0]]
+
+
+@pytest.mark.asyncio
+async def test_cursors_from_before_pruned_tombstones_must_resync(login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client, "u1")
+
+        ids = []
+        for title in ["A", "B", "C"]:
+            r = await client.post("/tasks/", json={"title": title}, headers=headers)
+            ids.append(r.json()["id"])
+        old_cursor = (await client.get("/tasks/changes", headers=headers)).json()["cursor"]
+
+        await client.delete(f"/tasks/{ids[0]}", headers=headers)
+        await client.delete(f"/tasks/{ids[1]}", headers=headers)
+        recent_cursor = (await client.get("/tasks/changes", params={"since": old_cursor}, headers=headers)).json()["cursor"]
+
+        db = SessionLocal()
+        db.execute(update(TaskTombstoneDB).values(deleted_at=datetime.now(timezone.utc) - timedelta(days=60)))
+        db.commit()
+        # The newest expired delete's tombstone stays behind as the horizon
+        assert prune_tombstones(db, datetime.now(timezone.utc) - timedelta(days=30)) == 1
+        assert prune_tombstones(db, datetime.now(timezone.utc) - timedelta(days=30)) == 0
+        db.close()
+
+        r = await client.get("/tasks/changes", params={"since": old_cursor}, headers=headers)
+        assert r.status_code == 410
+
+        # A cursor taken after the pruned deletes carries on
+        await client.delete(f"/tasks/{ids[2]}", headers=headers)
+        r = await client.get("/tasks/changes", params={"since": recent_cursor}, headers=headers)
+        assert r.status_code == 200 and r.json()["deleted"] == [ids[2]]
+
+        # Starting over works, including paging past the horizon
+        r = await client.post("/tasks/", json={"title": "D"}, headers=headers)
+        r = await client.get("/tasks/changes", params={"limit": 1}, headers=headers)
+        assert r.status_code == 200 and [t["title"] for t in r.json()["upserts"]] == ["D"]
+
+
+def test_change_tracking_migration_skips_existing_columns(tmp_path):
+    # create_all already made users.task_change_seq and tasks.change_seq,
+    # but left no version row, so migration 3 runs against them
+    bind = create_engine(f"sqlite:///{tmp_path / 'created.db'}")
+    Base.metadata.create_all(bind=bind)
+    assert migrations.upgrade(bind) == migrations.head_version()
+
+    # An older database gains the columns
+    bind = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=bind)
+    migrations.schema_version.create(bind)
+    with bind.begin() as conn:
+        conn.execute(text("ALTER TABLE users DROP COLUMN task_change_seq"))
+        conn.execute(migrations.schema_version.insert().values(version=2))
+    assert migrations.upgrade(bind) == migrations.head_version()
+    assert "task_change_seq" in {c["name"] for c in inspect(bind).get_columns("users")}
@@ -0,0 +1,85 @@
+import threading
+import pytest
+from httpx import AsyncClient, ASGITransport
+import task_counters
+from main import app, _set_task_status
+from database import SessionLocal
+from models import TaskCounterDB, TaskDB, TaskStatus, UserDB
+
+
+pytestmark = pytest.mark.usefixtures("enable_counters")
+
+
+@pytest.mark.asyncio
+async def test_counters_follow_task_writes(login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client)
+
+        ids = []
+        for title in ["A", "B", "C"]:
+            r = await client.post("/tasks/", json={"title": title}, headers=headers)
+            ids.append(r.json()["id"])
+
+        await client.patch(f"/tasks/{ids[0]}/complete", headers=headers)
+        await client.patch(f"/tasks/{ids[0]}/complete", headers=headers)  # no-op
+        await client.patch(f"/tasks/{ids[1]}", json={"status": "completed"}, headers=headers)
+        await client.patch(f"/tasks/{ids[1]}/reopen", headers=headers)
+        await client.delete(f"/tasks/{ids[0]}", headers=headers)
+
+        r = await client.get("/tasks/progress", headers=headers)
+        assert r.json() == {
+            "total_tasks": 2,
+            "completed_tasks": 0,
+            "pending": 2,
+            "completion_percentage": 0
+        }
+
+    db = SessionLocal()
+    assert task_counters.check_consistency(db) == []
+    db.close()
+
+
+def test_consistency_checker_repairs_drift():
+    db = SessionLocal()
+    db.add(TaskCounterDB(user_id=42, total=5, completed=1))
+    db.commit()
+
+    assert task_counters.check_consistency(db, fix=True) == [(42, (5, 1), (0, 0))]
+    assert task_counters.check_consistency(db) == []
+    db.close()
+
+
+def test_concurrent_status_changes_count_once():
+    db = SessionLocal()
+    user = UserDB(username="u", email="u@test.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    task = TaskDB(user_id=user.id, title="A")
+    db.add(task)
+    db.commit()
+    user_id, task_id = user.id, task.id
+    assert task_counters.get_counts(db, user_id) == (1, 0)
+    db.close()
+
+    # Every thread reads the previous status; only the first to take the
+    # user's lock may see "pending" and count the task as completed
+    barrier = threading.Barrier(8)
+
+    def complete():
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            _set_task_status(session, task_id, user_id, TaskStatus.completed)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=complete) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = SessionLocal()
+    assert task_counters.get_counts(db, user_id) == (1, 1)
+    assert task_counters.check_consistency(db) == []
+    db.close()
@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from datetime import datetime
+import ai_assistant
+from task_draft_parser import parse_draft_locally, CONFIDENT
+
+# A Saturday morning
+NOW = datetime(2026, 10, 17, 10, 0)
+
+
+@pytest.mark.parametrize("text, title, due_date", [
+    ("Buy milk tomorrow", "Buy milk", "2026-10-18"),
+    ("Dinner with John next Friday", "Dinner with John", "2026-10-23"),
+    ("Meeting on Jan 5th", "Meeting", "2027-01-05"),
+    ("Project deadline in 2 days", "Project deadline", "2026-10-19"),
+    ("Report due Friday", "Report", "2026-10-23"),
+    ("Dentist at 5:30pm on Monday", "Dentist", "2026-10-19T17:30"),
+    ("Call mom tonight", "Call mom", "2026-10-17T20:00"),
+    ("Pick up kids at 3pm", "Pick up kids", "2026-10-17T15:00"),
+    ("Breakfast meeting 9:00", "Breakfast meeting", "2026-10-18T09:00"),
+    ("Team sync in a week at 9am", "Team sync", "2026-10-24T09:00"),
+    ("Pay rent by the end of the month", "Pay rent", "2026-10-31"),
+    ("Visit grandma on 24th of December", "Visit grandma", "2026-12-24"),
+    ("Submit taxes 2027-04-15", "Submit taxes", "2027-04-15"),
+    ("tomorrow, water the plants", "Water the plants", "2026-10-18"),
+    ("Buy milk", "Buy milk", None),
+    ("Go out in the sun", "Go out in the sun", None),
+])
+def test_local_parser_understands_simple_phrases(text, title, due_date):
+    draft = parse_draft_locally(text, now=NOW)
+    assert (draft["title"], draft["due_date"]) == (title, due_date)
+    assert draft["confidence"] == CONFIDENT
+
+
+@pytest.mark.parametrize("text", [
+    "Call Bob every Monday morning",
+    "Plan a month of meals",
+    "tomorrow",
+    "Pay rent on the 1st",
+    "Meeting at 3",
+    "Submit report by 5",
+    "Finish slides by EOD",
+    "Send invoice by COB Friday",
+    "I need to remember that the car needs an oil change soon, maybe next week or so",
+])
+def test_local_parser_is_unsure_about_the_rest(text):
+    assert parse_draft_locally(text, now=NOW)["confidence"] < CONFIDENT
+
+
+def test_parse_task_draft_only_calls_llm_when_unsure(monkeypatch):
+    prompts = []
+
+    async def fake_llm(prompt, system_message=None):
+        prompts.append(prompt)
+        return '{"title": "Call Bob", "description": "Weekly check-in", "due_date": "2026-10-19"}'
+
+    monkeypatch.setattr(ai_assistant, "_call_llm", fake_llm)
+
+    draft = asyncio.run(ai_assistant.parse_task_draft("Buy milk tomorrow"))
+    assert draft["title"] == "Buy milk" and prompts == []
+
+    draft = asyncio.run(ai_assistant.parse_task_draft("Call Bob every Monday morning"))
+    assert len(prompts) == 1
+    assert draft == {"title": "Call Bob", "description": "Weekly check-in", "due_date": "2026-10-19", "confidence": 0.9}
+
+
+def test_parse_task_draft_keeps_local_draft_when_llm_reply_is_unusable(monkeypatch):
+    async def fake_llm(prompt, system_message=None):
+        return "Sorry, I can't help with that."
+
+    monkeypatch.setattr(ai_assistant, "_call_llm", fake_llm)
+
+    draft = asyncio.run(ai_assistant.parse_task_draft("Call Bob every Monday morning"))
+    assert draft["title"] == "Call Bob every morning"
+    assert draft["due_date"] is not None and draft["confidence"] < CONFIDENT
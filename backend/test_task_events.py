@@ -0,0 +1,86 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from starlette.websockets import WebSocketDisconnect
+from config import SECRET_KEY, ALGORITHM
+from database import SessionLocal
+from main import app
+from models import UserDB
+from task_events import InProcessBroker, RESYNC_EVENT, get_broker
+
+
+def test_write_endpoints_push_events(access_token):
+    with TestClient(app) as client:
+        token = access_token(client, "u1")
+        other_token = access_token(client, "u2")
+        headers = {"Authorization": f"Bearer {token}"}
+
+        with client.websocket_connect(f"/ws/tasks?token={token}") as ws:
+            client.post("/tasks/", json={"title": "Other"}, headers={"Authorization": f"Bearer {other_token}"})
+
+            task_id = client.post("/tasks/", json={"title": "A"}, headers=headers).json()["id"]
+            client.patch(f"/tasks/{task_id}", json={"title": "B"}, headers=headers)
+            client.patch(f"/tasks/{task_id}/complete", headers=headers)
+            client.patch(f"/tasks/{task_id}/reopen", headers=headers)
+            client.delete(f"/tasks/{task_id}", headers=headers)
+            client.post("/tasks/bulk", json={"operations": [
+                {"op": "create", "task": {"title": "C"}}
+            ]}, headers=headers)
+
+            events = [ws.receive_json() for _ in range(6)]
+
+    assert [e["type"] for e in events] == [
+        "task.created", "task.updated", "task.completed", "task.reopened", "task.deleted", "tasks.bulk"
+    ]
+    assert events[0]["task"]["title"] == "A"
+    assert events[1]["task"]["title"] == "B"
+    assert events[2]["task"]["status"] == "completed"
+    assert events[4] == {"type": "task.deleted", "task_id": task_id}
+    assert list(events[5]["changed"]) == ["create"]
+    seqs = [e["change_seq"] for e in events[:4]]
+    assert seqs == sorted(seqs)
+
+
+def test_socket_requires_valid_token():
+    with TestClient(app) as client:
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with client.websocket_connect("/ws/tasks?token=bad") as ws:
+                ws.receive_json()
+        assert exc.value.code == 1008
+
+
+def test_socket_closes_when_the_token_expires(access_token):
+    with TestClient(app) as client:
+        user_id = jwt.get_unverified_claims(access_token(client))["sub"]
+        token = jwt.encode({"sub": user_id, "exp": int(time.time()) + 2}, SECRET_KEY, algorithm=ALGORITHM)
+
+        with client.websocket_connect(f"/ws/tasks?token={token}") as ws:
+            assert ws.receive() == {"type": "websocket.close", "code": 1008, "reason": ""}
+
+
+def test_socket_closes_once_its_user_is_deleted(access_token):
+    with TestClient(app) as client:
+        token = access_token(client)
+        user_id = int(jwt.get_unverified_claims(token)["sub"])
+
+        with client.websocket_connect(f"/ws/tasks?token={token}") as ws:
+            db = SessionLocal()
+            db.delete(db.get(UserDB, user_id))
+            db.commit()
+            db.close()
+
+            client.portal.call(get_broker().publish, user_id, {"type": "task.created"})
+            assert ws.receive() == {"type": "websocket.close", "code": 1008, "reason": ""}
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_gets_resync():
+    broker = InProcessBroker(queue_size=2)
+    async with broker.subscribe(1) as events:
+        for n in range(3):
+            await broker.publish(1, {"type": "task.created", "n": n})
+        await broker.publish(2, {"type": "task.created"})
+        assert await events.__anext__() == RESYNC_EVENT
+        assert events.queue.empty()
+    assert broker.subscriber_count(1) == 0
@@ -0,0 +1,62 @@
+import json
+import pytest
+from datetime import datetime
+from httpx import AsyncClient, ASGITransport
+from pydantic import TypeAdapter
+import task_json
+from main import app
+from database import SessionLocal
+from models import TaskDB, UserDB
+from schema import TaskResponse
+from task_json import TASK_COLUMNS, TASK_FIELDS, encode_rows
+
+
+def test_encoded_rows_match_task_response_bytes():
+    db = SessionLocal()
+    try:
+        user = UserDB(username="u", email="u@test.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        db.add_all([
+            TaskDB(user_id=user.id, title="Plain"),
+            TaskDB(
+                user_id=user.id, title="Ünïcödé \"quoted\" \\ 📝", description="line\nbreak",
+                status="completed", due_date=datetime(2026, 10, 17, 9, 30, 15, 123456)
+            ),
+        ])
+        db.commit()
+
+        orm_rows = db.query(TaskDB).order_by(TaskDB.id).all()
+        column_rows = db.query(*TASK_COLUMNS).order_by(TaskDB.id).all()
+        adapter = TypeAdapter(list[TaskResponse])
+        expected = adapter.dump_json(adapter.validate_python(orm_rows, from_attributes=True))
+        assert encode_rows(column_rows, TASK_FIELDS) == expected
+    finally:
+        db.close()
+
+
+@pytest.mark.asyncio
+async def test_long_lists_are_streamed_in_chunks(monkeypatch, login):
+    monkeypatch.setattr(task_json, "TASK_STREAM_MIN_ROWS", 3)
+    monkeypatch.setattr(task_json, "TASK_STREAM_CHUNK_ROWS", 2)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client)
+
+        for i in range(5):
+            await client.post("/tasks/", json={"title": f"T{i}"}, headers=headers)
+
+        # Below the threshold: a plain response with a length
+        r = await client.get("/tasks", params={"limit": 2}, headers=headers)
+        assert "content-length" in r.headers and len(r.json()) == 2
+
+        r = await client.get("/tasks", headers=headers)
+        assert r.headers["content-type"] == "application/json"
+        assert "content-length" not in r.headers
+        tasks = json.loads(r.content)
+        assert [t["title"] for t in tasks] == [f"T{i}" for i in range(5)]
+        assert list(tasks[0]) == TASK_FIELDS
+        assert "ETag" in r.headers
+
+        r = await client.get("/tasks", params={"fields": "title,title,status"}, headers=headers)
+        assert r.json()[4] == {"title": "T4", "status": "pending"}
@@ -0,0 +1,116 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from httpx import AsyncClient, ASGITransport
+from main import app
+
+
+def _titles(r):
+    return [t["title"] for t in r.json()]
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_prefix_matches_for_the_user_only(login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client, "u1")
+        other = await login(client, "u2")
+
+        await client.post("/tasks/", json={"title": "Call plumber", "description": "About the meeting room sink"}, headers=headers)
+        await client.post("/tasks/", json={"title": "Team meeting notes", "description": "Share with everyone"}, headers=headers)
+        await client.post("/tasks/", json={"title": "Buy milk"}, headers=headers)
+        await client.post("/tasks/", json={"title": "Meeting with landlord"}, headers=other)
+
+        r = await client.get("/tasks/search", params={"q": "meet"}, headers=headers)
+        assert r.status_code == 200
+        # Title matches rank above description matches; u2's task is not visible
+        assert _titles(r) == ["Team meeting notes", "Call plumber"]
+        top, second = r.json()
+        assert top["score"] > second["score"]
+        assert top["title_highlight"] == "Team <mark>meeting</mark> notes"
+        assert "<mark>meeting</mark>" in second["snippet"]
+
+        # Every word has to match
+        r = await client.get("/tasks/search", params={"q": "meeting room"}, headers=headers)
+        assert _titles(r) == ["Call plumber"]
+
+        # Query syntax is treated as plain words
+        r = await client.get("/tasks/search", params={"q": 'milk" OR owner:u2'}, headers=headers)
+        assert r.status_code == 200 and _titles(r) == []
+        r = await client.get("/tasks/search", params={"q": "-- !!"}, headers=headers)
+        assert r.json() == []
+
+
+@pytest.mark.asyncio
+async def test_search_index_follows_task_writes(login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client, "u1")
+
+        r = await client.post("/tasks/", json={"title": "Draft report"}, headers=headers)
+        task_id = r.json()["id"]
+
+        await client.patch(f"/tasks/{task_id}", json={"title": "Final invoice"}, headers=headers)
+        r = await client.get("/tasks/search", params={"q": "report"}, headers=headers)
+        assert r.json() == []
+        r = await client.get("/tasks/search", params={"q": "invoice"}, headers=headers)
+        assert _titles(r) == ["Final invoice"]
+
+        # Status changes leave the index alone but show up in results
+        await client.patch(f"/tasks/{task_id}/complete", headers=headers)
+        r = await client.get("/tasks/search", params={"q": "invoice"}, headers=headers)
+        assert r.json()[0]["status"] == "completed"
+
+        await client.delete(f"/tasks/{task_id}", headers=headers)
+        r = await client.get("/tasks/search", params={"q": "invoice"}, headers=headers)
+        assert r.json() == []
+
+
+@pytest.mark.asyncio
+async def test_search_filters_and_pagination(login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client, "u1")
+
+        now = datetime.now(timezone.utc)
+        await client.post("/tasks/", json={"title": "Review old", "due_date": (now - timedelta(days=3)).isoformat()}, headers=headers)
+        await client.post("/tasks/", json={"title": "Review soon", "due_date": (now + timedelta(days=2)).isoformat()}, headers=headers)
+        for i in range(5):
+            await client.post("/tasks/", json={"title": f"Review item {i}"}, headers=headers)
+
+        r = await client.get("/tasks/search", params={"q": "review", "overdue": True}, headers=headers)
+        assert _titles(r) == ["Review old"]
+        r = await client.get("/tasks/search", params={"q": "review", "upcoming": 7}, headers=headers)
+        assert _titles(r) == ["Review soon"]
+
+        seen = []
+        params = {"q": "review", "limit": 3}
+        while True:
+            r = await client.get("/tasks/search", params=params, headers=headers)
+            seen += _titles(r)
+            if "X-Next-Cursor" not in r.headers:
+                break
+            params["cursor"] = r.headers["X-Next-Cursor"]
+        assert len(seen) == 7 and len(set(seen)) == 7
+
+        # A cursor only continues the query it came from
+        r = await client.get("/tasks/search", params={"q": "item", "cursor": params["cursor"]}, headers=headers)
+        assert r.status_code == 400
+
+        # Conditional requests work as for GET /tasks
+        r = await client.get("/tasks/search", params={"q": "review"}, headers=headers)
+        r = await client.get("/tasks/search", params={"q": "review"}, headers={**headers, "If-None-Match": r.headers["ETag"]})
+        assert r.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_highlights_escape_task_text(login):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = await login(client, "u1")
+        await client.post("/tasks/", json={
+            "title": "<img src=x onerror=alert(1)> report",
+            "description": "Send the <b>report</b> & <script>steal()</script>"
+        }, headers=headers)
+
+        r = await client.get("/tasks/search", params={"q": "report"}, headers=headers)
+        task, = r.json()
+        assert task["title"] == "<img src=x onerror=alert(1)> report"
+        assert task["title_highlight"] == "&lt;img src=x onerror=alert(1)&gt; <mark>report</mark>"
+        assert "<b>" not in task["snippet"] and "<script>" not in task["snippet"]
+        assert "&lt;b&gt;<mark>report</mark>&lt;/b&gt; &amp; &lt;script&gt;" in task["snippet"]